@@ -0,0 +1,96 @@
+"""
+Persistent TTL cache for Apollo lookups (`apollo_cache` table).
+
+Org enrichments are keyed by normalized domain, name searches by
+(normalized name, state). A definitive "no match" is cached too (response
+NULL) with its own, shorter TTL, so re-running a backfill over donors that
+still have no website does not spend credits again. Transport errors and
+exhausted 429 retries are never cached.
+
+Env:
+  APOLLO_CACHE               0 disables the cache (default 1)
+  APOLLO_CACHE_TTL           seconds a found org stays valid (default 30 days)
+  APOLLO_CACHE_NEGATIVE_TTL  seconds a "no match" stays valid (default 7 days)
+"""
+from __future__ import annotations
+import os
+from collections import Counter
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import async_engine
+from app.sites import to_domain
+
+ENABLED = os.getenv("APOLLO_CACHE", "1") != "0"
+TTL = float(os.getenv("APOLLO_CACHE_TTL", str(30 * 86400)))
+NEGATIVE_TTL = float(os.getenv("APOLLO_CACHE_NEGATIVE_TTL", str(7 * 86400)))
+
+_MISS = object()
+_counts: Counter = Counter()
+
+
+def domain_key(domain: str) -> str:
+    return to_domain(domain) or domain.strip().lower()
+
+
+def name_key(name: str, state: str | None) -> str:
+    return f"{' '.join(name.lower().split())}|{(state or '').upper()}"
+
+
+async def get(kind: str, key: str):
+    """Cached response (a dict, or None for a cached no-match), or _MISS."""
+    if not ENABLED:
+        return _MISS
+    try:
+        async with async_engine.connect() as conn:
+            row = (await conn.execute(text("""
+                SELECT response FROM apollo_cache
+                WHERE kind = :kind AND key = :key AND expires_at > NOW()
+            """), {"kind": kind, "key": key})).first()
+    except SQLAlchemyError as e:
+        _counts[f"{kind}.errors"] += 1
+        print(f"[apollo_cache] read failed: {e.__class__.__name__}")
+        return _MISS
+    if row is None:
+        _counts[f"{kind}.misses"] += 1
+        return _MISS
+    _counts[f"{kind}.{'hits' if row[0] is not None else 'negative_hits'}"] += 1
+    return row[0]
+
+
+async def put(kind: str, key: str, response: dict | None) -> None:
+    if not ENABLED:
+        return
+    ttl = TTL if response is not None else NEGATIVE_TTL
+    try:
+        async with async_engine.begin() as conn:
+            await conn.execute(text("""
+                INSERT INTO apollo_cache (kind, key, response, fetched_at, expires_at)
+                VALUES (:kind, :key, :response, NOW(), NOW() + make_interval(secs => :ttl))
+                ON CONFLICT (kind, key) DO UPDATE SET
+                    response = EXCLUDED.response,
+                    fetched_at = EXCLUDED.fetched_at,
+                    expires_at = EXCLUDED.expires_at
+            """).bindparams(bindparam("response", type_=JSONB(none_as_null=True))), {
+                "kind": kind, "key": key, "response": response, "ttl": ttl,
+            })
+        _counts[f"{kind}.writes"] += 1
+    except SQLAlchemyError as e:
+        _counts[f"{kind}.errors"] += 1
+        print(f"[apollo_cache] write failed: {e.__class__.__name__}")
+
+
+def is_miss(value) -> bool:
+    return value is _MISS
+
+
+def stats() -> dict:
+    out = {"enabled": ENABLED, "ttl_s": TTL, "negative_ttl_s": NEGATIVE_TTL}
+    for kind in sorted({k.split(".", 1)[0] for k in _counts}):
+        c = {name: _counts[f"{kind}.{name}"] for name in ("hits", "negative_hits", "misses", "writes", "errors")}
+        lookups = c["hits"] + c["negative_hits"] + c["misses"]
+        c["hit_rate"] = round((c["hits"] + c["negative_hits"]) / lookups, 4) if lookups else None
+        out[kind] = c
+    return out
@@ -0,0 +1,284 @@
+"""
+Multi-donor Firecrawl crawls as asynchronous batch-scrape jobs.
+
+Candidate pages for many donors are submitted as a few /batch/scrape jobs
+(up to FIRECRAWL_BATCH_MAX_URLS URLs each). Job ids, the url -> donor map and
+the URLs already written are persisted in `firecrawl_jobs`, so polling can
+resume after a restart. Each poll writes newly finished pages to
+`enrichments` as 'page_markdown' rows.
+
+Every API process resumes unfinished jobs on start-up, so a job is only
+polled by the process holding its lease (`poller`, `lease_until`, renewed on
+every poll); a lease that is not renewed for FIRECRAWL_LEASE_S lets another
+process take the job over.
+
+submit / poll_job / resume take an AsyncSession; list_jobs / get_job are
+sync for the plain `def` routes.
+
+Env:
+  FIRECRAWL_BATCH_MAX_URLS  URLs per submitted job (default 1000)
+  FIRECRAWL_POLL_MIN_S      first / post-progress poll interval (default 2)
+  FIRECRAWL_POLL_MAX_S      backoff ceiling (default 30)
+  FIRECRAWL_LEASE_S         polling lease length (default 300)
+"""
+from __future__ import annotations
+import asyncio
+import os
+import random
+import socket
+from typing import Dict, List
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.apollo_batch import insert_enrichments
+from app.db import AsyncSessionLocal
+from app.services.firecrawl import batch_scrape_status, batch_scrape_submit
+
+MAX_URLS = int(os.getenv("FIRECRAWL_BATCH_MAX_URLS", "1000"))
+POLL_MIN_S = float(os.getenv("FIRECRAWL_POLL_MIN_S", "2"))
+POLL_MAX_S = float(os.getenv("FIRECRAWL_POLL_MAX_S", "30"))
+LEASE_S = float(os.getenv("FIRECRAWL_LEASE_S", "300"))
+MAX_POLL_ERRORS = 10
+TERMINAL = ("completed", "failed", "cancelled")
+
+# job id -> polling task in this process
+_pollers: Dict[str, asyncio.Task] = {}
+POLLER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _key(url: str) -> str:
+    return url.rstrip("/")
+
+
+async def submit(session, targets: Dict[int, List[str]], max_urls: int = MAX_URLS) -> List[str]:
+    """
+    targets: {donor_id: [page urls]}. Submits the URLs in chunks of `max_urls`
+    and records each job before returning the Firecrawl job ids.
+    """
+    url_map: Dict[str, List[int]] = {}
+    for donor_id, urls in targets.items():
+        for url in urls:
+            url_map.setdefault(url, []).append(donor_id)
+
+    urls = list(url_map)
+    job_ids: List[str] = []
+    stmt = text("""
+        INSERT INTO firecrawl_jobs (id, kind, status, url_map, total)
+        VALUES (:id, 'batch_scrape', 'submitted', :url_map, :total)
+        ON CONFLICT (id) DO NOTHING
+    """).bindparams(bindparam("url_map", type_=JSONB))
+
+    for i in range(0, len(urls), max_urls):
+        chunk = urls[i:i + max_urls]
+        job_id = await batch_scrape_submit(chunk)
+        if not job_id:
+            continue
+        await session.execute(stmt, {
+            "id": job_id,
+            "url_map": {_key(u): url_map[u] for u in chunk},
+            "total": len(chunk),
+        })
+        await session.commit()  # persist before polling so a restart can pick it up
+        job_ids.append(job_id)
+    return job_ids
+
+
+def _write_pages(session, job: dict, docs: list, processed: set) -> int:
+    """Insert a poll's newly finished pages with multi-row INSERTs (apollo_batch.insert_enrichments)."""
+    rows = []
+    for doc in docs:
+        meta = (doc or {}).get("metadata") or {}
+        url = meta.get("sourceURL") or meta.get("url")
+        if not url or _key(url) in processed:
+            continue
+        processed.add(_key(url))
+        md = doc.get("markdown")
+        if not md or (meta.get("statusCode") or 200) >= 400:
+            continue
+        raw = {"url": url, "markdown": md[:20000]}
+        rows.extend(
+            {"donor_id": donor_id, "kind": "page_markdown", "source": "firecrawl", "url": url, "raw": raw}
+            for donor_id in job["url_map"].get(_key(url), [])
+        )
+    return insert_enrichments(session, rows) if rows else 0
+
+
+def _claim(session, job_id: str) -> dict | None:
+    """
+    Take (or renew) this process's polling lease on a job; None if another
+    poller holds an unexpired lease or the job is unknown / finished.
+    """
+    row = session.execute(text("""
+        UPDATE firecrawl_jobs
+        SET poller = :poller, lease_until = NOW() + make_interval(secs => :lease), updated_at = NOW()
+        WHERE id = :id AND status NOT IN ('completed', 'failed', 'cancelled')
+          AND (poller IS NULL OR poller = :poller OR lease_until < NOW())
+        RETURNING id, status, url_map, total, completed, saved, cardinality(processed) AS processed
+    """), {"id": job_id, "poller": POLLER_ID, "lease": LEASE_S}).mappings().first()
+    session.commit()
+    return dict(row) if row else None
+
+
+def _release(session, job_id: str) -> None:
+    session.execute(text("""
+        UPDATE firecrawl_jobs SET poller = NULL, lease_until = NULL
+        WHERE id = :id AND poller = :poller
+    """), {"id": job_id, "poller": POLLER_ID})
+    session.commit()
+
+
+def _record_poll(session, job: dict, status: dict, docs: list) -> int | None:
+    """
+    Write newly finished pages and the job's progress in one transaction.
+    `processed` is re-read under the row lock, so a page is written once even
+    if two pollers overlap. Returns the processed count, or None if the lease
+    was lost to another poller.
+    """
+    row = session.execute(text("""
+        SELECT processed, saved, poller FROM firecrawl_jobs WHERE id = :id FOR UPDATE
+    """), {"id": job["id"]}).mappings().first()
+    if row is None or row["poller"] != POLLER_ID:
+        session.rollback()
+        return None
+    processed = set(row["processed"] or [])
+    saved = _write_pages(session, job, docs, processed)
+    job["status"] = status.get("status") or job["status"]
+    job["saved"] = (row["saved"] or 0) + saved
+    session.execute(text("""
+        UPDATE firecrawl_jobs
+        SET status = :status, completed = :completed, processed = :processed,
+            saved = :saved, error = NULL, lease_until = NOW() + make_interval(secs => :lease), updated_at = NOW()
+        WHERE id = :id
+    """), {
+        "id": job["id"],
+        "status": job["status"],
+        "completed": status.get("completed"),
+        "processed": sorted(processed),
+        "saved": job["saved"],
+        "lease": LEASE_S,
+    })
+    session.commit()
+    return len(processed)
+
+
+async def poll_job(session, job_id: str) -> dict:
+    """
+    Poll one job until it reaches a terminal status, writing finished pages
+    on every poll. Backs off (with jitter) while there is no progress. Only
+    the holder of the job's lease polls it; other callers return at once.
+    """
+    job = await session.run_sync(_claim, job_id)
+    if job is None:
+        row = await session.run_sync(get_job, job_id)
+        return {"id": job_id, "status": row["status"] if row else "unknown", "polled_elsewhere": row is not None}
+    delay, errors, done = POLL_MIN_S, 0, job["processed"]
+
+    try:
+        while job["status"] not in TERMINAL:
+            status, docs, next_url = None, [], None
+            while True:
+                page = await batch_scrape_status(job_id, next_url)
+                if page is None:
+                    break
+                status = page
+                docs.extend(page.get("data") or [])
+                next_url = page.get("next")
+                if not next_url:
+                    break
+
+            if status is None:
+                errors += 1
+                if errors >= MAX_POLL_ERRORS:
+                    await session.execute(text("""
+                        UPDATE firecrawl_jobs SET error = 'status polling failed', updated_at = NOW() WHERE id = :id
+                    """), {"id": job_id})
+                    await session.commit()
+                    break  # left non-terminal; resume() retries later
+                if await session.run_sync(_claim, job_id) is None:  # keep the lease through failed polls
+                    break
+            else:
+                errors = 0
+                processed = await session.run_sync(_record_poll, job, status, docs)
+                if processed is None:
+                    break  # lease lost: another poller has the job
+                # progress resets the interval; otherwise back off
+                delay = POLL_MIN_S if processed > done else min(delay * 2, POLL_MAX_S)
+                done = processed
+
+            if job["status"] not in TERMINAL:
+                await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+    finally:
+        try:
+            await session.run_sync(_release, job_id)
+        except Exception:
+            pass  # the lease expires on its own
+
+    return {"id": job_id, "status": job["status"], "saved": job["saved"], "processed": done}
+
+
+async def _poll_in_background(job_id: str) -> None:
+    try:
+        async with AsyncSessionLocal() as session:
+            await poll_job(session, job_id)
+    except Exception as e:
+        print(f"[batch_crawl] polling {job_id} failed: {e}")
+    finally:
+        _pollers.pop(job_id, None)
+
+
+def start_polling(job_id: str) -> bool:
+    """Poll a job in the background (own DB session); False if already polling."""
+    if job_id in _pollers:
+        return False
+    _pollers[job_id] = asyncio.create_task(_poll_in_background(job_id))
+    return True
+
+
+def polling() -> List[str]:
+    return list(_pollers)
+
+
+def list_jobs(session, limit: int = 50) -> list:
+    return session.execute(text("""
+        SELECT id, kind, status, total, completed, saved, error, created_at, updated_at
+        FROM firecrawl_jobs
+        ORDER BY created_at DESC
+        LIMIT :limit
+    """), {"limit": limit}).mappings().all()
+
+
+def get_job(session, job_id: str) -> dict | None:
+    row = session.execute(text("""
+        SELECT id, kind, status, total, completed, saved, error, created_at, updated_at
+        FROM firecrawl_jobs WHERE id = :id
+    """), {"id": job_id}).mappings().first()
+    return dict(row) if row else None
+
+
+async def resume(session) -> List[str]:
+    """Start polling every unfinished job that no other process holds a lease on."""
+    rows = (await session.execute(text("""
+        SELECT id FROM firecrawl_jobs
+        WHERE status NOT IN ('completed', 'failed', 'cancelled')
+          AND (poller IS NULL OR poller = :poller OR lease_until < NOW())
+    """), {"poller": POLLER_ID})).all()
+    return [job_id for (job_id,) in rows if start_polling(job_id)]
+
+
+async def startup() -> None:
+    try:
+        async with AsyncSessionLocal() as session:
+            resumed = await resume(session)
+        if resumed:
+            print(f"[batch_crawl] resumed polling for {len(resumed)} job(s)")
+    except Exception as e:  # table missing / DB down: nothing to resume
+        print(f"[WARN] batch crawl jobs not resumed: {e}")
+
+
+async def shutdown() -> None:
+    tasks = list(_pollers.values())
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _pollers.clear()
@@ -0,0 +1,323 @@
+"""
+Offline bulk import of donors from local data files.
+
+    python -m app.bulk_import data/eo_ca.csv data/eo_ny.csv --workers 8
+    python -m app.bulk_import dumps/orgs.jsonl.gz --dry-run
+
+Formats, by extension (optionally `.gz`):
+  .csv           IRS EO Business Master File extract (EIN, NAME, CITY, STATE,
+                 SUBSECTION, NTEE_CD, ASSET_AMT, ...)
+  .jsonl         ProPublica organization detail objects, one per line
+                 ({"organization": {...}, "filings_with_data": [...]})
+  .json          the same as a JSON array (or a single object)
+
+Files are cut into line batches that a process pool parses, filters with the
+route's foundation rule (ingest.is_foundation) and maps to donor rows. The
+main process COPYs the rows into a temp staging table and every
+`--flush-rows` merges it into `donors` with one set-based upsert (last row
+per EIN wins; unchanged donors are not rewritten), writes changed ProPublica
+details to `donor_sources`, syncs their filings (app/filings.py), then
+commits. BMF ASSET_AMT only fills assets_total for donors without filings.
+
+BMF lines are split on newlines (the IRS extracts have no quoted line
+breaks). `.json` arrays are parsed whole by one worker. --dry-run parses and
+filters without touching the database.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import gzip
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from sqlalchemy import text
+
+from app import filings
+from app.ingest import DONOR_COLS, donor_row, is_foundation
+
+BATCH_LINES = 20000
+FLUSH_ROWS = 200000
+
+# staged row layout: donor columns, then the BMF asset amount and the ProPublica detail (JSON text)
+STAGE_COLS = DONOR_COLS + ("assets_total", "source")
+
+STAGE_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS donors_stage (
+        seq BIGINT GENERATED ALWAYS AS IDENTITY,
+        ein TEXT, name TEXT, state TEXT, city TEXT, mission TEXT, ntee_code TEXT,
+        irs_subsection INTEGER, website TEXT, assets_total NUMERIC, source JSONB
+    )
+"""
+
+# filings, once a donor has any, own assets_total
+_ASSETS = """CASE WHEN EXISTS (SELECT 1 FROM filings f WHERE f.donor_id = donors.id)
+                  THEN donors.assets_total
+                  ELSE COALESCE(EXCLUDED.assets_total, donors.assets_total) END"""
+
+MERGE_SQL = f"""
+    WITH up AS (
+        INSERT INTO donors ({', '.join(DONOR_COLS)}, assets_total)
+        SELECT DISTINCT ON (ein) {', '.join(DONOR_COLS)}, assets_total
+        FROM donors_stage
+        ORDER BY ein, seq DESC
+        ON CONFLICT (ein) DO UPDATE SET
+            name=EXCLUDED.name,
+            state=EXCLUDED.state,
+            city=EXCLUDED.city,
+            mission=EXCLUDED.mission,
+            ntee_code=EXCLUDED.ntee_code,
+            assets_total={_ASSETS},
+            irs_subsection=EXCLUDED.irs_subsection,
+            website=COALESCE(EXCLUDED.website, donors.website),
+            updated_at=NOW()
+        WHERE (donors.name, donors.state, donors.city, donors.mission, donors.ntee_code,
+               donors.assets_total, donors.irs_subsection, donors.website)
+              IS DISTINCT FROM
+              (EXCLUDED.name, EXCLUDED.state, EXCLUDED.city, EXCLUDED.mission, EXCLUDED.ntee_code,
+               {_ASSETS}, EXCLUDED.irs_subsection, COALESCE(EXCLUDED.website, donors.website))
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM up
+"""
+
+# latest staged detail per EIN; unchanged sources are not rewritten (or re-synced)
+SOURCES_SQL = """
+    INSERT INTO donor_sources (donor_id, source, fetched_at)
+    SELECT d.id, s.source, NOW()
+    FROM (
+        SELECT DISTINCT ON (ein) ein, source
+        FROM donors_stage
+        WHERE source IS NOT NULL
+        ORDER BY ein, seq DESC
+    ) s
+    JOIN donors d USING (ein)
+    ON CONFLICT (donor_id) DO UPDATE SET source = EXCLUDED.source, fetched_at = EXCLUDED.fetched_at
+    WHERE donor_sources.source IS DISTINCT FROM EXCLUDED.source
+    RETURNING donor_id
+"""
+
+
+# --------------------------
+# parsing (runs in worker processes)
+# --------------------------
+
+def _int(value) -> int | None:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def bmf_row(rec: dict) -> tuple | None:
+    """Map one BMF record to a staged tuple (STAGE_COLS order), or None if it isn't a foundation."""
+    ein, name = _int(rec.get("EIN")), (rec.get("NAME") or "").strip()
+    subseccd = _int(rec.get("SUBSECTION"))
+    if ein is None or not name or not is_foundation(name, subseccd):
+        return None
+    ntee = (rec.get("NTEE_CD") or "").strip() or None
+    return (
+        str(ein),  # ProPublica-style: no zero padding
+        name,
+        (rec.get("STATE") or "").strip() or None,
+        (rec.get("CITY") or "").strip() or None,
+        ntee,  # mission: NTEE code, as donor_row does
+        ntee,
+        subseccd,
+        None,  # website
+        _int(rec.get("ASSET_AMT")),
+        None,  # source: keep any richer ProPublica detail already stored
+    )
+
+
+def parse_bmf_lines(header: list[str], lines: list[str]) -> tuple[list[tuple], int]:
+    rows, skipped = [], 0
+    for values in csv.reader(lines):
+        row = bmf_row(dict(zip(header, values))) if values else None
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    return rows, skipped
+
+
+def _propublica_rows(details) -> tuple[list[tuple], int]:
+    rows, skipped = [], 0
+    for detail in details:
+        org = (detail or {}).get("organization") or {}
+        row = donor_row(org, detail) if org.get("ein") else None
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(tuple(row[c] for c in DONOR_COLS) + (None, json.dumps(detail)))
+    return rows, skipped
+
+
+def parse_propublica_lines(lines: list[str]) -> tuple[list[tuple], int]:
+    return _propublica_rows(json.loads(line) for line in lines if line.strip())
+
+
+def parse_propublica_file(path: str) -> tuple[list[tuple], int]:
+    with _open(path) as f:
+        data = json.load(f)
+    return _propublica_rows(data if isinstance(data, list) else [data])
+
+
+# --------------------------
+# reading (main process)
+# --------------------------
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _kind(path: str) -> str:
+    base = path[:-3] if path.endswith(".gz") else path
+    for ext in ("csv", "jsonl", "json"):
+        if base.endswith(f".{ext}"):
+            return ext
+    raise ValueError(f"unsupported file type: {path}")
+
+
+def _line_batches(f, size: int) -> Iterator[list[str]]:
+    batch = []
+    for line in f:
+        batch.append(line)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def tasks_for(path: str, batch_lines: int = BATCH_LINES) -> Iterator[tuple]:
+    """(fn, args) work items for one file."""
+    kind = _kind(path)
+    if kind == "json":
+        yield parse_propublica_file, (path,)
+        return
+    with _open(path) as f:
+        if kind == "csv":
+            header = [h.strip().upper() for h in next(csv.reader([f.readline()]))]
+            for batch in _line_batches(f, batch_lines):
+                yield parse_bmf_lines, (header, batch)
+        else:
+            for batch in _line_batches(f, batch_lines):
+                yield parse_propublica_lines, (batch,)
+
+
+# --------------------------
+# loading
+# --------------------------
+
+class StagingLoader:
+    """COPY into a temp staging table on one connection; merge() upserts donors + sources and commits."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.staged = 0
+        conn.execute(text(STAGE_DDL))
+        conn.execute(text("TRUNCATE donors_stage"))
+
+    def copy(self, rows: list[tuple]) -> None:
+        if not rows:
+            return
+        pg = self.conn.connection.driver_connection  # psycopg connection, same transaction
+        with pg.cursor() as cur:
+            with cur.copy(f"COPY donors_stage ({', '.join(STAGE_COLS)}) FROM STDIN") as cp:
+                for row in rows:
+                    cp.write_row(row)
+        self.staged += len(rows)
+
+    def merge(self) -> tuple[int, int]:
+        if not self.staged:
+            return 0, 0
+        inserted, updated = self.conn.execute(text(MERGE_SQL)).one()
+        changed = self.conn.execute(text(SOURCES_SQL)).scalars().all()
+        filings.sync(self.conn, changed)
+        self.conn.execute(text("TRUNCATE donors_stage"))
+        self.conn.commit()
+        self.staged = 0
+        return inserted, updated
+
+
+def run(
+    paths: list[str],
+    workers: int | None = None,
+    batch_lines: int = BATCH_LINES,
+    flush_rows: int = FLUSH_ROWS,
+    dry_run: bool = False,
+) -> dict:
+    started = time.perf_counter()
+    stats = {"files": len(paths), "batches": 0, "rows": 0, "skipped": 0, "inserted": 0, "updated": 0,
+             "merges": 0, "parse_wait_s": 0.0, "db_s": 0.0}
+    workers = workers or os.cpu_count() or 1
+
+    conn = None
+    if not dry_run:
+        from app.db import engine
+        conn = engine.connect()
+    try:
+        loader = StagingLoader(conn) if conn is not None else None
+
+        def merge() -> None:
+            t = time.perf_counter()
+            inserted, updated = loader.merge()
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            stats["merges"] += 1
+            stats["db_s"] += time.perf_counter() - t
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: deque = deque()
+
+            def drain_one() -> None:
+                t = time.perf_counter()
+                rows, skipped = pending.popleft().result()
+                stats["parse_wait_s"] += time.perf_counter() - t
+                stats["batches"] += 1
+                stats["rows"] += len(rows)
+                stats["skipped"] += skipped
+                if loader is not None:
+                    t = time.perf_counter()
+                    loader.copy(rows)
+                    stats["db_s"] += time.perf_counter() - t
+                    if loader.staged >= flush_rows:
+                        merge()
+
+            for path in paths:
+                for fn, args in tasks_for(path, batch_lines):
+                    pending.append(pool.submit(fn, *args))
+                    if len(pending) >= workers * 2:  # bound parsed-but-unloaded batches
+                        drain_one()
+            while pending:
+                drain_one()
+
+        if loader is not None:
+            merge()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["parse_wait_s"] = round(stats["parse_wait_s"], 3)
+    stats["db_s"] = round(stats["db_s"], 3)
+    stats["rows_per_s"] = round((stats["rows"] + stats["skipped"]) / elapsed, 1) if elapsed else None
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bulk-load donors from ProPublica JSON / IRS BMF CSV files.")
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    ap.add_argument("--batch-lines", type=int, default=BATCH_LINES, help="lines per parse task")
+    ap.add_argument("--flush-rows", type=int, default=FLUSH_ROWS, help="staged rows per upsert + commit")
+    ap.add_argument("--dry-run", action="store_true", help="parse and filter only; no database writes")
+    args = ap.parse_args()
+    print(json.dumps(run(args.paths, args.workers, args.batch_lines, args.flush_rows, args.dry_run), indent=2))
@@ -1,12 +1,19 @@
 from __future__ import annotations
+import asyncio
+import itertools
 import re
+import time
+from dataclasses import dataclass, field
 from typing import Dict, List, Tuple
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
 
 import httpx
-from bs4 import BeautifulSoup
 
-EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+from app.html_extract import EMAIL_RE, extract_page
+from app.http_clients import get_client
+from app.page_cache import PageCache
+
 HEADERS = {
     "User-Agent": "DonorFinderBot/0.1 (+https://example.org; polite crawl for MVP demo)"
 }
@@ -29,82 +36,345 @@ def looks_like_grants_page(url: str, text: str) -> bool:
 def extract_emails(text: str) -> List[str]:
     return sorted(set(EMAIL_RE.findall(text)))
 
-async def fetch(url: str, timeout: int = 20) -> Tuple[str, str]:
-    async with httpx.AsyncClient(headers=HEADERS, timeout=timeout, follow_redirects=True) as client:
-        r = await client.get(url)
+async def fetch_response(
+    url: str, headers: Dict[str, str] | None = None, timeout: float | None = None,
+) -> httpx.Response:
+    """
+    GET with the crawler headers (plus e.g. conditional ones); 4xx/5xx raise, 304 is returned.
+    Uses the crawl client's timeout (HTTP_CRAWL_TIMEOUT) unless `timeout` is given.
+    """
+    kwargs = {"headers": {**HEADERS, **(headers or {})}}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    r = await get_client("crawl").get(url, **kwargs)
+    if r.status_code >= 400:
         r.raise_for_status()
-        return r.text, str(r.url)
+    return r
+
+async def fetch(url: str, timeout: float | None = None) -> Tuple[str, str]:
+    r = await fetch_response(url, timeout=timeout)
+    return r.text, str(r.url)
 
 def absolute_links(base_url: str, html: str, limit: int = 20) -> List[str]:
-    soup = BeautifulSoup(html, "lxml")
+    host = urlparse(base_url).netloc
     links: List[str] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        url = urljoin(base_url, href)
-        if url not in links and urlparse(url).netloc == urlparse(base_url).netloc:
+    for url, _ in extract_page(html, base_url)["links"]:
+        if url not in links and urlparse(url).netloc == host:
             links.append(url)
         if len(links) >= limit:
             break
     return links
 
 def extract_names_and_roles(html: str) -> List[Dict[str, str]]:
-    soup = BeautifulSoup(html, "lxml")
-    out: List[Dict[str, str]] = []
-    for sel in ["h1", "h2", "h3", ".team-member", ".person", ".staff", "li"]:
-        for el in soup.select(sel):
-            text = " ".join(el.get_text(" ", strip=True).split())
-            if 5 <= len(text) <= 80 and (" " in text):
-                out.append({"name": text})
-        if len(out) > 20:
-            break
-    seen = set()
-    uniq: List[Dict[str, str]] = []
-    for p in out:
-        n = p["name"].lower()
-        if n not in seen:
-            uniq.append(p)
-            seen.add(n)
-    return uniq[:20]
+    return extract_page(html)["people"]
 
-async def crawl_site(base_url: str, max_pages: int = 6) -> Dict[str, object]:
+def scan_page(final_url: str, html: str) -> Dict[str, object]:
     """
-    Returns { emails, contacts, opportunities, pages_checked }
+    Per-page extraction shared by crawl_site and the multi-site scheduler:
+    { text, links, emails, contacts, opportunity }, from a single parse.
     """
-    base_url = normalize_url(base_url)
-    if not base_url:
-        return {"emails": [], "contacts": [], "opportunities": [], "pages_checked": []}
+    page = extract_page(html, final_url)
+    text = page["text"]
 
-    results = {"emails": set(), "contacts": [], "opportunities": [], "pages_checked": []}
-    try:
-        html, final_url = await fetch(base_url)
-        results["pages_checked"].append(final_url)
-    except Exception:
-        return {"emails": [], "contacts": [], "opportunities": [], "pages_checked": []}
+    contacts: List[Dict[str, str]] = []
+    if looks_like_people_page(final_url, text):
+        contacts = [{**p, "source_url": final_url} for p in page["people"]]
 
-    queue = [final_url] + absolute_links(final_url, html, limit=15)
+    opportunity = None
+    if looks_like_grants_page(final_url, text):
+        opportunity = {"url": final_url, "snippet": text[:1000]}
 
-    for url in queue[:max_pages]:
-        try:
-            html, final_url = await fetch(url)
-        except Exception:
-            continue
-        results["pages_checked"].append(final_url)
+    return {
+        "text": text,
+        "links": page["links"],
+        "emails": page["emails"],
+        "contacts": contacts,
+        "opportunity": opportunity,
+    }
+
+
+# --------------------------
+# multi-site scheduler
+# --------------------------
 
-        soup = BeautifulSoup(html, "lxml")
-        text = soup.get_text(" ", strip=True)
+LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+SKIP_EXT_RE = re.compile(r"\.(pdf|jpe?g|png|gif|svg|webp|zip|docx?|xlsx?|pptx?|mp4|mp3)$", re.IGNORECASE)
 
-        for e in extract_emails(text):
-            results["emails"].add(e)
 
-        if looks_like_people_page(final_url, text):
-            contacts = extract_names_and_roles(html)
-            for c in contacts:
-                c["source_url"] = final_url
-            results["contacts"].extend(contacts)
+def _host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
 
-        if looks_like_grants_page(final_url, text):
-            snippet = text[:1000]
-            results["opportunities"].append({"url": final_url, "snippet": snippet})
 
-    results["emails"] = sorted(results["emails"])
-    return results
+def _priority(url: str, anchor: str, depth: int) -> int:
+    """Lower runs first: people/grants pages, then everything else by depth."""
+    if looks_like_people_page(url, anchor) or looks_like_grants_page(url, anchor):
+        return depth
+    return 10 + depth
+
+
+@dataclass(order=True)
+class _Task:
+    priority: int
+    seq: int
+    url: str = field(compare=False)
+    site: str = field(compare=False)
+    depth: int = field(compare=False, default=0)
+
+
+@dataclass
+class _Site:
+    seed: str
+    host: str
+    seen: set = field(default_factory=set)
+    fetched: int = 0
+    queued: int = 0
+    robots: RobotFileParser | None = None
+    emails: set = field(default_factory=set)
+    contacts: list = field(default_factory=list)
+    opportunities: list = field(default_factory=list)
+    pages_checked: list = field(default_factory=list)
+    errors: int = 0
+    changed: bool = False
+
+
+@dataclass
+class _Domain:
+    slots: asyncio.Semaphore
+    delay: float
+    next_at: float = 0.0
+
+
+class CrawlScheduler:
+    """
+    Crawl many sites over one shared priority frontier.
+
+    - `concurrency` workers fetch in parallel; each domain allows at most
+      `per_domain` in-flight requests spaced `delay` seconds apart (or the
+      site's robots.txt Crawl-delay, if larger).
+    - robots.txt is honored, and sitemap.xml (plus robots Sitemap: lines)
+      seeds the frontier alongside in-page links.
+    - people/grants pages are fetched before other pages of a site, up to
+      `max_pages_per_site` pages.
+    - with a `PageCache`, pages are revalidated with conditional requests;
+      a 304 or an unchanged body reuses the cached extraction instead of
+      parsing again, and a site with no changed page reports changed=False.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 32,
+        per_domain: int = 2,
+        delay: float = 1.0,
+        max_pages_per_site: int = 6,
+        respect_robots: bool = True,
+        use_sitemaps: bool = True,
+        max_depth: int = 2,
+        cache: PageCache | None = None,
+    ):
+        self.concurrency = concurrency
+        self.per_domain = per_domain
+        self.delay = delay
+        self.max_pages = max_pages_per_site
+        self.respect_robots = respect_robots
+        self.use_sitemaps = use_sitemaps
+        self.max_depth = max_depth
+        self.cache = cache
+        self._seq = itertools.count()
+        self._domains: Dict[str, _Domain] = {}
+        self.stats = {"fetched": 0, "errors": 0, "robots_blocked": 0, "sitemap_urls": 0, "cache_hits": 0}
+
+    def _domain(self, host: str) -> _Domain:
+        d = self._domains.get(host)
+        if d is None:
+            d = self._domains[host] = _Domain(asyncio.Semaphore(self.per_domain), self.delay)
+        return d
+
+    async def _get(self, url: str, headers: Dict[str, str] | None = None) -> httpx.Response:
+        """Fetch under the domain's concurrency slot and politeness spacing."""
+        dom = self._domain(_host(url))
+        async with dom.slots:
+            now = time.monotonic()
+            start = max(now, dom.next_at)
+            dom.next_at = start + dom.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            return await fetch_response(url, headers)
+
+    def _push(self, frontier: asyncio.PriorityQueue, site: _Site, url: str, anchor: str, depth: int) -> None:
+        if site.queued >= self.max_pages * 4 or depth > self.max_depth:
+            return
+        if url in site.seen or _host(url) != site.host or SKIP_EXT_RE.search(urlparse(url).path):
+            return
+        if self.respect_robots and site.robots is not None \
+                and not site.robots.can_fetch(HEADERS["User-Agent"], url):
+            self.stats["robots_blocked"] += 1
+            return
+        site.seen.add(url)
+        site.queued += 1
+        frontier.put_nowait(_Task(_priority(url, anchor, depth), next(self._seq), url, site.seed, depth))
+
+    async def _discover(self, site: _Site) -> List[str]:
+        """robots.txt + sitemap URLs for a site (best effort)."""
+        base = f"{urlparse(site.seed).scheme}://{urlparse(site.seed).netloc}"
+        sitemaps = [f"{base}/sitemap.xml"]
+        if self.respect_robots:
+            try:
+                body = (await self._get(f"{base}/robots.txt")).text
+                rp = RobotFileParser()
+                rp.parse(body.splitlines())
+                site.robots = rp
+                crawl_delay = rp.crawl_delay(HEADERS["User-Agent"])
+                if crawl_delay:
+                    dom = self._domain(site.host)
+                    dom.delay = max(dom.delay, float(crawl_delay))
+                sitemaps = (rp.site_maps() or []) + sitemaps
+            except Exception:
+                pass  # no robots.txt: allow all
+        if not self.use_sitemaps:
+            return []
+
+        urls: List[str] = []
+        for sm in list(dict.fromkeys(sitemaps))[:3]:
+            try:
+                body = (await self._get(sm)).text
+            except Exception:
+                continue
+            locs = LOC_RE.findall(body)
+            if "<sitemapindex" in body.lower():
+                for child in locs[:3]:
+                    try:
+                        child_body = (await self._get(child)).text
+                        urls.extend(LOC_RE.findall(child_body))
+                    except Exception:
+                        continue
+            else:
+                urls.extend(locs)
+            if urls:
+                break
+        return urls
+
+    async def _seed(self, frontier: asyncio.PriorityQueue, site: _Site) -> None:
+        # robots.txt first so every queued URL (including the homepage) is checked against it
+        urls = await self._discover(site)
+        self.stats["sitemap_urls"] += len(urls)
+        if self.respect_robots and site.robots is not None \
+                and not site.robots.can_fetch(HEADERS["User-Agent"], site.seed):
+            self.stats["robots_blocked"] += 1
+            return
+        # the homepage goes first; it is where most in-page links come from
+        site.seen.add(site.seed)
+        site.queued += 1
+        frontier.put_nowait(_Task(-1, next(self._seq), site.seed, site.seed, 0))
+        for url in sorted(urls, key=lambda u: _priority(u, "", 1)):
+            self._push(frontier, site, url, "", 1)
+
+    async def _worker(self, frontier: asyncio.PriorityQueue, sites: Dict[str, _Site]) -> None:
+        while True:
+            task = await frontier.get()
+            try:
+                site = sites[task.site]
+                if site.fetched >= self.max_pages:
+                    continue
+                site.fetched += 1
+                cache = self.cache
+                try:
+                    resp = await self._get(task.url, cache.conditional_headers(task.url) if cache else None)
+                except Exception:
+                    site.errors += 1
+                    self.stats["errors"] += 1
+                    continue
+                self.stats["fetched"] += 1
+
+                page = None
+                final_url = str(resp.url)
+                if cache is not None:
+                    unchanged, entry = cache.check(task.url, resp)
+                    if unchanged and entry.extract:
+                        page = entry.extract
+                        final_url = entry.final_url or final_url
+                        self.stats["cache_hits"] += 1
+                    elif resp.status_code == 304:
+                        # validated, but nothing stored to reuse (e.g. an entry from crawl_donor): get the body
+                        try:
+                            resp = await self._get(task.url)
+                        except Exception:
+                            site.errors += 1
+                            self.stats["errors"] += 1
+                            continue
+                        final_url = str(resp.url)
+                        cache.check(task.url, resp)
+                if page is None:
+                    site.changed = True
+                    page = scan_page(final_url, resp.text)
+                    if cache is not None and resp.status_code != 304:
+                        cache.set_extract(task.url, {k: v for k, v in page.items() if k != "text"})
+
+                site.pages_checked.append(final_url)
+                if task.depth == 0:
+                    # follow the homepage's redirect (e.g. to another domain) for same-host checks
+                    site.host = _host(final_url)
+                site.emails.update(page["emails"])
+                site.contacts.extend(page["contacts"])
+                if page["opportunity"]:
+                    site.opportunities.append(page["opportunity"])
+
+                if site.fetched < self.max_pages:
+                    for url, anchor in page["links"]:
+                        self._push(frontier, site, url, anchor, task.depth + 1)
+            except Exception:
+                # a bad page must not end the worker: with every worker gone, frontier.join() never returns
+                sites[task.site].errors += 1
+                self.stats["errors"] += 1
+            finally:
+                frontier.task_done()
+
+    async def crawl(self, seeds: List[str]) -> Dict[str, Dict[str, object]]:
+        """
+        Crawl each seed site; returns {seed: {emails, contacts, opportunities,
+        pages_checked, errors, changed}} keyed by the seed as given.
+        """
+        sites: Dict[str, _Site] = {}
+        by_url: Dict[str, _Site] = {}
+        for seed in seeds:
+            url = normalize_url(seed)
+            if url:
+                sites[seed] = by_url.setdefault(url, _Site(seed=url, host=_host(url)))
+
+        frontier: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        started = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(frontier, by_url)) for _ in range(self.concurrency)]
+        try:
+            # discovery runs concurrently too; each site's robots/sitemap fetches share its domain slots
+            await asyncio.gather(*(self._seed(frontier, s) for s in by_url.values()))
+            await frontier.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        self.stats["elapsed_s"] = round(elapsed, 3)
+        self.stats["pages_per_s"] = round(self.stats["fetched"] / elapsed, 2) if elapsed else None
+
+        return {
+            seed: {
+                "emails": sorted(s.emails),
+                "contacts": s.contacts,
+                "opportunities": s.opportunities,
+                "pages_checked": s.pages_checked,
+                "errors": s.errors,
+                "changed": s.changed,
+            }
+            for seed, s in sites.items()
+        }
+
+
+async def crawl_site(base_url: str, max_pages: int = 6) -> Dict[str, object]:
+    """
+    Returns { emails, contacts, opportunities, pages_checked }
+    """
+    site = normalize_url(base_url)
+    if not site:
+        return {"emails": [], "contacts": [], "opportunities": [], "pages_checked": []}
+    results = await CrawlScheduler(max_pages_per_site=max_pages).crawl([site])
+    return results[site]
@@ -3,14 +3,24 @@ Minimal embeddings wrapper.
 
 Uses sentence-transformers if available (recommended for local),
 otherwise falls back to a very simple hashing vector (keeps the API usable).
+
+`embed_array` is the batch path: it returns one contiguous float32 matrix
+(rows = texts) that can be handed straight to the DB layer. `embed_texts`
+keeps the list-of-lists shape for callers that want plain Python values.
 """
 from __future__ import annotations
-import math
+import hashlib
 import os
 from typing import List
 
+import numpy as np
+
+HASH_DIM = 384
+
 _MODEL = None
 _USE_ST = False
+_HASH_PROJECTION: np.ndarray | None = None
+
 
 def _init_model():
     global _MODEL, _USE_ST
@@ -25,24 +35,57 @@ def _init_model():
         _MODEL = True  # sentinel
         _USE_ST = False
 
-def _normalize(v):
-    s = math.sqrt(sum(x * x for x in v)) or 1.0
-    return [x / s for x in v]
 
-def _hash_embed(text: str, dim: int = 384) -> List[float]:
-    # toy hashing fallback to keep API running if no model is installed
-    import hashlib, random
-    h = hashlib.sha256(text.encode("utf-8")).digest()
-    random.seed(h)
-    return _normalize([random.random() - 0.5 for _ in range(dim)])
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    m /= norms
+    return m
+
+
+def _hash_embed_batch(texts: List[str], dim: int = HASH_DIM) -> np.ndarray:
+    # toy hashing fallback to keep API running if no model is installed:
+    # sha256 bits as a ±1 sign vector, projected through a fixed random matrix
+    global _HASH_PROJECTION
+    if _HASH_PROJECTION is None or _HASH_PROJECTION.shape[1] != dim:
+        _HASH_PROJECTION = np.random.default_rng(0).standard_normal((256, dim)).astype(np.float32)
+    digests = b"".join(hashlib.sha256(t.encode("utf-8")).digest() for t in texts)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), 32), axis=1)
+    signs = bits.astype(np.float32) * 2.0 - 1.0
+    return _normalize(signs @ _HASH_PROJECTION)
+
+
+def embed_array(texts: List[str]) -> np.ndarray:
+    """Embed a batch into a C-contiguous float32 array of shape (len(texts), dim), L2-normalized."""
+    _init_model()
+    if not texts:
+        return np.zeros((0, embedding_dim()), dtype=np.float32)
+    if _USE_ST:
+        vecs = _MODEL.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.ascontiguousarray(vecs, dtype=np.float32)
+    return _hash_embed_batch(texts)
+
+
+def embed_texts(texts: List[str], as_numpy: bool = False) -> List[list[float]] | np.ndarray:
+    if as_numpy:
+        return embed_array(texts)
+    return embed_array(texts).tolist()
 
-def embed_texts(texts: List[str]) -> List[list[float]]:
+
+def model_name() -> str:
     _init_model()
     if _USE_ST:
-        vecs = _MODEL.encode(texts, normalize_embeddings=True, convert_to_numpy=False)
-        return [list(map(float, v)) for v in vecs]
-    return [_hash_embed(t) for t in texts]
+        return os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    return f"hash-{HASH_DIM}"
+
+
+def embedding_dim() -> int:
+    _init_model()
+    if _USE_ST:
+        return int(_MODEL.get_sentence_embedding_dimension())
+    return HASH_DIM
+
 
-def to_pgvector(vec: list[float]) -> str:
+def to_pgvector(vec) -> str:
     # pgvector text representation: '[0.01,0.02,...]'
     return "[" + ",".join(f"{x:.6f}" for x in vec) + "]"
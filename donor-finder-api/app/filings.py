@@ -0,0 +1,99 @@
+"""
+Normalized `filings` rows, extracted from the ProPublica org detail stored in
+`donor_sources`, and the donor totals derived from them.
+
+Extraction is a single SQL statement over donor_sources, shared by ingest,
+the bulk importer and the one-off backfill (POST /admin/filings/sync), so
+there is one mapping from ProPublica fields to columns:
+
+  total_assets   totassetsend
+  grants_paid    contrpdpbks (990-PF), else grntstogovt + grnsttoindiv + grntstofrgngovt (990)
+  total_revenue  totrevenue
+
+donors.assets_total / grants_total then come from each donor's latest filing
+that reports the value. Rows whose values did not change are not rewritten.
+"""
+from __future__ import annotations
+import time
+
+from sqlalchemy import text
+
+
+def _num(key: str) -> str:
+    # ProPublica numbers are JSON numbers; anything else (null, "") maps to NULL
+    return f"(CASE WHEN jsonb_typeof(f->'{key}') = 'number' THEN (f->>'{key}')::numeric END)"
+
+
+_GRANTS_990 = ("grntstogovt", "grnsttoindiv", "grntstofrgngovt")
+
+GRANTS_PAID_SQL = (
+    f"COALESCE({_num('contrpdpbks')}, CASE WHEN "
+    + " OR ".join(f"jsonb_typeof(f->'{k}') = 'number'" for k in _GRANTS_990)
+    + " THEN " + " + ".join(f"COALESCE({_num(k)}, 0)" for k in _GRANTS_990) + " END)"
+)
+
+
+def _extract_sql(where: str) -> str:
+    return f"""
+        INSERT INTO filings (donor_id, tax_period, tax_year, form_type, total_assets, grants_paid, total_revenue)
+        SELECT DISTINCT ON (s.donor_id, {_num('tax_prd')}::int)
+               s.donor_id,
+               {_num('tax_prd')}::int,
+               COALESCE({_num('tax_prd_yr')}::int, {_num('tax_prd')}::int / 100),
+               {_num('formtype')}::int,
+               {_num('totassetsend')},
+               {GRANTS_PAID_SQL},
+               {_num('totrevenue')}
+        FROM donor_sources s
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(s.source->'filings_with_data') = 'array'
+                 THEN s.source->'filings_with_data' ELSE '[]'::jsonb END
+        ) AS f
+        WHERE {where} AND {_num('tax_prd')} IS NOT NULL
+        ORDER BY s.donor_id, {_num('tax_prd')}::int
+        ON CONFLICT (donor_id, tax_period) DO UPDATE SET
+            tax_year = EXCLUDED.tax_year,
+            form_type = EXCLUDED.form_type,
+            total_assets = EXCLUDED.total_assets,
+            grants_paid = EXCLUDED.grants_paid,
+            total_revenue = EXCLUDED.total_revenue
+        WHERE (filings.tax_year, filings.form_type, filings.total_assets, filings.grants_paid, filings.total_revenue)
+              IS DISTINCT FROM
+              (EXCLUDED.tax_year, EXCLUDED.form_type, EXCLUDED.total_assets, EXCLUDED.grants_paid,
+               EXCLUDED.total_revenue)
+    """
+
+
+def _totals_sql(where: str) -> str:
+    return f"""
+        UPDATE donors d
+        SET assets_total = t.total_assets, grants_total = t.grants_paid, updated_at = NOW()
+        FROM (
+            SELECT donor_id,
+                   (array_agg(total_assets ORDER BY tax_period DESC)
+                        FILTER (WHERE total_assets IS NOT NULL))[1] AS total_assets,
+                   (array_agg(grants_paid ORDER BY tax_period DESC)
+                        FILTER (WHERE grants_paid IS NOT NULL))[1] AS grants_paid
+            FROM filings
+            WHERE {where}
+            GROUP BY donor_id
+        ) t
+        WHERE d.id = t.donor_id
+          AND (d.assets_total, d.grants_total) IS DISTINCT FROM (t.total_assets, t.grants_paid)
+    """
+
+
+def sync(session, donor_ids: list[int] | None = None) -> dict:
+    """
+    Extract filings for `donor_ids` (every stored source when None) and
+    re-derive their donors' totals. Works on a sync Session or Connection;
+    the caller commits.
+    """
+    started = time.perf_counter()
+    if donor_ids is not None and not donor_ids:
+        return {"filings": 0, "donors_updated": 0, "elapsed_s": 0.0}
+    params = {} if donor_ids is None else {"ids": list(donor_ids)}
+    scope = "TRUE" if donor_ids is None else "{col} = ANY(:ids)"
+    filings = session.execute(text(_extract_sql(scope.format(col="s.donor_id"))), params).rowcount
+    updated = session.execute(text(_totals_sql(scope.format(col="donor_id"))), params).rowcount
+    return {"filings": filings, "donors_updated": updated, "elapsed_s": round(time.perf_counter() - started, 3)}
@@ -0,0 +1,104 @@
+"""
+Single-parse HTML extraction for crawled pages.
+
+Each document is parsed once with lxml and walked once to collect visible
+text, links (with anchor text), emails and person-name candidates, instead
+of building a separate BeautifulSoup tree per helper.
+"""
+from __future__ import annotations
+import re
+from typing import Dict, List, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import lxml.html
+from lxml import etree
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+_SKIP_TAGS = {"script", "style", "noscript", "template", "head"}
+_PEOPLE_TAGS = {"h1", "h2", "h3", "li"}
+_PEOPLE_CLASSES = {"team-member", "person", "staff"}
+MAX_PEOPLE = 20
+
+
+def _parse(html: str):
+    try:
+        return lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        # empty documents, or str input carrying an XML encoding declaration
+        try:
+            return lxml.html.fromstring(html.encode("utf-8", "replace"))
+        except etree.ParserError:
+            return None
+
+
+def _inner_text(el) -> str:
+    return " ".join(" ".join(el.itertext()).split())
+
+
+def extract_page(html: str, base_url: str = "") -> Dict[str, object]:
+    """
+    { text, links: [(absolute_url, anchor_text)], emails, people: [{"name"}] }
+
+    `text` matches BeautifulSoup's get_text(" ", strip=True) minus script/style
+    content; `people` are short multi-word headings/list items/team cards in
+    document order, deduped case-insensitively and capped at MAX_PEOPLE.
+    """
+    root = _parse(html)
+    if root is None:
+        return {"text": "", "links": [], "emails": [], "people": []}
+
+    parts: List[str] = []
+    links: List[Tuple[str, str]] = []
+    people: List[Dict[str, str]] = []
+    seen_people: set = set()
+
+    stack = [(root, False)]
+    while stack:
+        el, closing = stack.pop()
+        if closing:
+            if el.tail and el is not root:
+                t = el.tail.strip()
+                if t:
+                    parts.append(t)
+            continue
+        stack.append((el, True))
+
+        tag = el.tag if isinstance(el.tag, str) else None  # None: comment / PI
+        if tag is None or tag in _SKIP_TAGS:
+            continue
+
+        if el.text:
+            t = el.text.strip()
+            if t:
+                parts.append(t)
+
+        if tag == "a":
+            href = el.get("href")
+            if href:
+                try:
+                    url = urldefrag(urljoin(base_url, href.strip()))[0]
+                    scheme = urlparse(url).scheme
+                except ValueError:  # malformed, e.g. "http://[bad"
+                    scheme = None
+                if scheme in ("http", "https"):
+                    links.append((url, _inner_text(el)[:100]))
+
+        if len(people) < MAX_PEOPLE and (
+            tag in _PEOPLE_TAGS or _PEOPLE_CLASSES.intersection((el.get("class") or "").split())
+        ):
+            name = _inner_text(el)
+            if 5 <= len(name) <= 80 and " " in name and name.lower() not in seen_people:
+                seen_people.add(name.lower())
+                people.append({"name": name})
+
+        for child in reversed(el):
+            stack.append((child, False))
+
+    text = " ".join(parts)
+    return {
+        "text": text,
+        "links": links,
+        "emails": sorted(set(EMAIL_RE.findall(text))),
+        "people": people,
+    }
@@ -0,0 +1,125 @@
+"""
+Shared outbound HTTP clients.
+
+One long-lived `httpx.AsyncClient` per upstream so batches reuse TCP/TLS
+connections instead of handshaking on every call. Clients are opened and
+closed by the FastAPI lifespan (app/main.py); outside the app (scripts,
+REPL) `get_client` creates them lazily.
+
+Env overrides per upstream (NAME = PROPUBLICA | APOLLO | FIRECRAWL | CRAWL):
+  HTTP_<NAME>_TIMEOUT, HTTP_<NAME>_MAX_CONNECTIONS, HTTP_<NAME>_MAX_KEEPALIVE
+and HTTP2=1 to negotiate HTTP/2 where the `h2` package is installed.
+"""
+from __future__ import annotations
+import importlib.util
+import os
+from dataclasses import dataclass, replace
+
+import httpx
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    timeout: float
+    max_connections: int
+    max_keepalive: int
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    follow_redirects: bool = False
+
+
+# Upstream APIs are single-host, so max_connections is effectively the per-host
+# limit. The crawl client talks to many hosts; per-domain politeness is the
+# caller's job.
+CONFIGS: dict[str, ClientConfig] = {
+    "propublica": ClientConfig(timeout=30, max_connections=16, max_keepalive=16),
+    "apollo": ClientConfig(timeout=30, max_connections=8, max_keepalive=8),
+    "firecrawl": ClientConfig(timeout=60, max_connections=8, max_keepalive=8, keepalive_expiry=60),
+    "crawl": ClientConfig(timeout=20, max_connections=64, max_keepalive=32, follow_redirects=True),
+}
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: dict[str, httpx.AsyncClient] = {}
+_requests: dict[str, int] = {}
+
+
+def _config_for(name: str) -> ClientConfig:
+    cfg = CONFIGS[name]
+    prefix = f"HTTP_{name.upper()}_"
+    overrides = {}
+    if os.getenv(prefix + "TIMEOUT"):
+        overrides["timeout"] = float(os.environ[prefix + "TIMEOUT"])
+    if os.getenv(prefix + "MAX_CONNECTIONS"):
+        overrides["max_connections"] = int(os.environ[prefix + "MAX_CONNECTIONS"])
+    if os.getenv(prefix + "MAX_KEEPALIVE"):
+        overrides["max_keepalive"] = int(os.environ[prefix + "MAX_KEEPALIVE"])
+    if os.getenv("HTTP2") == "1" and _HTTP2_AVAILABLE:
+        overrides["http2"] = True
+    return replace(cfg, **overrides)
+
+
+def _build(name: str) -> httpx.AsyncClient:
+    cfg = _config_for(name)
+
+    async def _count(request: httpx.Request) -> None:
+        _requests[name] = _requests.get(name, 0) + 1
+
+    return httpx.AsyncClient(
+        timeout=cfg.timeout,
+        limits=httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive,
+            keepalive_expiry=cfg.keepalive_expiry,
+        ),
+        http2=cfg.http2,
+        follow_redirects=cfg.follow_redirects,
+        event_hooks={"request": [_count]},
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream, creating it on first use."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = _build(name)
+    return client
+
+
+async def startup() -> None:
+    for name in CONFIGS:
+        get_client(name)
+
+
+async def shutdown() -> None:
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+
+
+def pool_stats() -> dict[str, dict]:
+    """
+    Per-upstream pool utilization. Connection counts come from httpcore's pool
+    internals, so they are best-effort and omitted if that shape changes.
+    """
+    out: dict[str, dict] = {}
+    for name, client in _clients.items():
+        cfg = _config_for(name)
+        entry = {
+            "requests": _requests.get(name, 0),
+            "max_connections": cfg.max_connections,
+            "max_keepalive": cfg.max_keepalive,
+            "http2": cfg.http2,
+        }
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        conns = getattr(pool, "connections", None)
+        if conns is not None:
+            idle = sum(1 for c in conns if c.is_idle())
+            entry.update({
+                "connections": len(conns),
+                "idle": idle,
+                "active": len(conns) - idle,
+                "in_flight": len(getattr(pool, "_requests", None) or []),
+            })
+        out[name] = entry
+    return out
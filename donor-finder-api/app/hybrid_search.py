@@ -0,0 +1,94 @@
+"""
+Hybrid donor search: keyword and vector candidates fused with reciprocal
+rank fusion (RRF) in a single SQL statement.
+
+Each branch takes its top `k` donors under the same state/asset filters
+(keyword: donors matching any query word, by ts_rank_cd + name similarity;
+vector: cosine distance), then
+score = kw_weight / (rrf_k + keyword_rank) + vec_weight / (rrf_k + vector_rank),
+with a missing rank contributing 0.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from app.db import vector_param
+from app.text_search import keyword_filter
+from app.vector_store import donor_filters, index_info, set_search_params
+
+RRF_K = 60
+
+
+def hybrid_search(
+    session,
+    query: str,
+    qvec,
+    limit: int,
+    state=None,
+    min_assets=None,
+    max_assets=None,
+    k: int = 50,
+    rrf_k: int = RRF_K,
+    kw_weight: float = 1.0,
+    vec_weight: float = 1.0,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list:
+    where, params = donor_filters(state, min_assets, max_assets)
+    kw_where, kw_rank, kw_params = keyword_filter(query, match_any=True)  # any word; rank by coverage
+    filters = " AND ".join(where) or "TRUE"
+    params.update(kw_params)
+    params.update({
+        "qvec": vector_param(qvec),
+        "k": max(k, limit),
+        "limit": limit,
+        "rrf_k": rrf_k,
+        "kw_w": kw_weight,
+        "vec_w": vec_weight,
+    })
+
+    info = index_info(session)
+    if info:
+        set_search_params(session, info["method"], params["k"], ef_search, probes)
+
+    sql = text(f"""
+        WITH kw AS (
+            SELECT id, row_number() OVER (ORDER BY relevance DESC, id) AS rnk
+            FROM (
+                SELECT d.id, {kw_rank} AS relevance
+                FROM donors d
+                WHERE {filters} AND {kw_where}
+                ORDER BY relevance DESC, d.id
+                LIMIT :k
+            ) s
+        ),
+        vec AS (
+            SELECT id, distance, row_number() OVER (ORDER BY distance, id) AS rnk
+            FROM (
+                SELECT d.id, de.embedding <=> CAST(:qvec AS vector) AS distance
+                FROM donor_embeddings de
+                JOIN donors d ON d.id = de.donor_id
+                WHERE {filters}
+                ORDER BY de.embedding <=> CAST(:qvec AS vector)
+                LIMIT :k
+            ) s
+        ),
+        fused AS (
+            SELECT COALESCE(kw.id, vec.id) AS id,
+                   COALESCE(:kw_w / (:rrf_k + kw.rnk), 0)
+                     + COALESCE(:vec_w / (:rrf_k + vec.rnk), 0) AS score,
+                   kw.rnk AS keyword_rank,
+                   vec.rnk AS vector_rank,
+                   vec.distance
+            FROM kw
+            FULL OUTER JOIN vec ON vec.id = kw.id
+        )
+        SELECT d.id, d.name, d.state, d.city, d.mission,
+               d.assets_total, d.grants_total, d.website,
+               f.score, f.keyword_rank, f.vector_rank, f.distance
+        FROM fused f
+        JOIN donors d ON d.id = f.id
+        ORDER BY f.score DESC, d.id
+        LIMIT :limit
+    """)
+    return session.execute(sql, params).mappings().all()
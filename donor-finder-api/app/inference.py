@@ -0,0 +1,153 @@
+"""
+In-process embedding inference worker.
+
+Concurrent `embed` calls are queued and coalesced over a short window into a
+single `embed_array` batch, which runs on a dedicated thread so the event loop
+never blocks on `encode`. The worker is started (and the model preloaded) in
+the FastAPI lifespan.
+
+Env:
+  EMBED_BATCH_WINDOW_MS  how long to wait for more requests after the first (default 5)
+  EMBED_MAX_BATCH        max texts per encode call (default 64)
+  EMBED_PRELOAD          load the model at startup (default 1)
+"""
+from __future__ import annotations
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import anyio.from_thread
+import numpy as np
+
+from app.embeddings import embed_array, embedding_dim
+
+
+class EmbeddingBatcher:
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._executor: ThreadPoolExecutor | None = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.texts = 0
+        self.max_seen = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        return self._executor
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._pool()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # fail requests still queued, then release the embed thread
+        while self._queue is not None and not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("embedding batcher stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def preload(self) -> None:
+        # forces the model load on the worker thread
+        await asyncio.get_running_loop().run_in_executor(self._pool(), embedding_dim)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n = len(batch[0][0])
+            deadline = loop.time() + self.window
+            while n < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n += len(item[0])
+
+            all_texts = [t for texts, _ in batch for t in texts]
+            try:
+                mat = await loop.run_in_executor(self._pool(), embed_array, all_texts)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(all_texts)
+            self.max_seen = max(self.max_seen, len(all_texts))
+            i = 0
+            for texts, fut in batch:
+                if not fut.done():
+                    fut.set_result(mat[i:i + len(texts)])
+                i += len(texts)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else None,
+            "max_batch_seen": self.max_seen,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+batcher = EmbeddingBatcher(
+    window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+    max_batch=int(os.getenv("EMBED_MAX_BATCH", "64")),
+)
+
+
+async def startup() -> None:
+    if os.getenv("EMBED_PRELOAD", "1") != "0":
+        await batcher.preload()
+    await batcher.start()
+
+
+async def shutdown() -> None:
+    await batcher.stop()
+
+
+def embed_sync(texts: List[str]) -> np.ndarray:
+    """
+    Embed from a sync route (FastAPI worker thread) through the shared batcher.
+    Falls back to a direct `embed_array` call outside the app or before startup.
+    """
+    if batcher.running:
+        try:
+            return anyio.from_thread.run(batcher.embed, texts)
+        except RuntimeError:  # not on an anyio worker thread
+            pass
+    return embed_array(texts)
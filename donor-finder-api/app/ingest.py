@@ -0,0 +1,414 @@
+"""
+ProPublica ingestion pipeline.
+
+Search pages are prefetched in the background, org detail lookups fan out
+under a concurrency bound, and accepted orgs are written to `donors` with
+batched multi-row upserts. The org detail JSON goes to `donor_sources`;
+its filings are extracted into `filings`, which assets_total / grants_total
+are derived from (app/filings.py).
+
+run_refresh is the incremental variant for re-running a (state, NTEE) slice:
+orgs checked within `recheck_days` are not re-fetched, an org whose
+fingerprint (mapped fields + latest filing, in `donor_fingerprints`) is
+unchanged is not rewritten, changed donors get `needs_enrichment`, and the
+next search page is checkpointed in `ingest_checkpoints` after every page so
+an interrupted run resumes where it stopped.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any
+
+import httpx
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app import filings, propublica
+
+DONOR_COLS = (
+    "ein", "name", "state", "city", "mission", "ntee_code", "irs_subsection", "website",
+)
+
+# donor fields that, with the latest filing, make up an org's fingerprint; bump the
+# version whenever they (or donor_row's mapping) change
+FINGERPRINT_FIELDS = ("name", "state", "city", "ntee_code", "irs_subsection", "website")
+FINGERPRINT_VERSION = "v2"
+
+_PAGE_DONE = object()
+
+
+def is_foundation(name: str | None, subseccd: Any) -> bool:
+    """Rough grantmaker filter: 501(c)(3)/4947(a)(1) trusts or 'foundation' in the name."""
+    return "foundation" in (name or "").lower() or subseccd in (3, 92)
+
+
+def donor_row(o: dict, detail: dict) -> dict | None:
+    """
+    Map a search hit + org detail to a `donors` row (plus the detail as
+    `source`), or None if it isn't a foundation. Totals come from filings.
+    """
+    org = detail.get("organization", {}) or {}
+
+    name = org.get("name") or o.get("organization_name")
+    subseccd = org.get("subseccd")
+    if not is_foundation(name, subseccd):
+        return None
+
+    return {
+        "ein": str(o.get("ein")),
+        "name": name,
+        "state": org.get("state") or o.get("state"),
+        "city": org.get("city"),
+        "mission": org.get("ntee_code") or o.get("ntee_code"),
+        "ntee_code": org.get("ntee_code") or o.get("ntee_code"),
+        "irs_subsection": subseccd,
+        "website": org.get("website") or None,
+        "source": detail,
+    }
+
+
+def _fingerprint_hash(o: dict, detail: dict, row: dict | None, row_fields: list) -> str:
+    filings = detail.get("filings_with_data") or []
+    latest = max(filings, key=lambda f: f.get("tax_prd") or 0) if filings else None
+    if row is not None:
+        fields = row_fields
+    else:
+        org = detail.get("organization") or {}
+        fields = [org.get("name") or o.get("organization_name"), org.get("subseccd")]
+    payload = json.dumps([fields, latest], sort_keys=True, default=str)
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+def fingerprint(o: dict, detail: dict, row: dict | None) -> str:
+    """Versioned md5 of the mapped donor fields plus the latest filing (non-foundations: the org's own fields)."""
+    fields = [row[c] for c in FINGERPRINT_FIELDS] if row is not None else None
+    return f"{FINGERPRINT_VERSION}:{_fingerprint_hash(o, detail, row, fields)}"
+
+
+def fingerprint_v1(o: dict, detail: dict, row: dict | None) -> str:
+    """
+    The unversioned fingerprint stored before v2, which also covered
+    assets_total (then the first of the 3 latest filings with totassetsend).
+    Lets run_refresh tell a real change from a fingerprint format change.
+    """
+    fields = None
+    if row is not None:
+        assets = next((f["totassetsend"] for f in (detail.get("filings_with_data") or [])[:3]
+                       if f.get("totassetsend") is not None), None)
+        fields = [row["name"], row["state"], row["city"], row["ntee_code"], assets, row["irs_subsection"],
+                  row["website"]]
+    return _fingerprint_hash(o, detail, row, fields)
+
+
+def upsert_donors(session, rows: list[dict], mark_changed: bool = False) -> int:
+    """
+    Write rows into `donors` with one multi-row INSERT ... ON CONFLICT (ein),
+    their `source` into donor_sources, and sync their filings + totals.
+    Duplicate EINs inside the batch are collapsed (last wins), since Postgres
+    refuses to update the same row twice in one statement. With mark_changed,
+    updated rows are also flagged `needs_enrichment`.
+    """
+    by_ein = {r["ein"]: r for r in rows}
+    if not by_ein:
+        return 0
+
+    values, params = [], {}
+    for i, r in enumerate(by_ein.values()):
+        values.append("(" + ", ".join(f":{c}_{i}" for c in DONOR_COLS) + ")")
+        for c in DONOR_COLS:
+            params[f"{c}_{i}"] = r[c]
+
+    stmt = text(f"""
+        INSERT INTO donors ({', '.join(DONOR_COLS)})
+        VALUES {', '.join(values)}
+        ON CONFLICT (ein) DO UPDATE SET
+            name=EXCLUDED.name,
+            state=EXCLUDED.state,
+            city=EXCLUDED.city,
+            mission=EXCLUDED.mission,
+            ntee_code=EXCLUDED.ntee_code,
+            irs_subsection=EXCLUDED.irs_subsection,
+            website=COALESCE(EXCLUDED.website, donors.website),
+            updated_at=NOW(){", needs_enrichment=TRUE" if mark_changed else ""}
+        RETURNING id, ein
+    """)
+    ids = {ein: donor_id for donor_id, ein in session.execute(stmt, params).all()}
+    write_sources(session, [(ids[ein], r["source"]) for ein, r in by_ein.items() if r.get("source")])
+    filings.sync(session, list(ids.values()))
+    return len(by_ein)
+
+
+def write_sources(session, pairs: list[tuple[int, dict]]) -> int:
+    """Upsert (donor_id, ProPublica detail) into donor_sources."""
+    if not pairs:
+        return 0
+    values, params, binds = [], {}, []
+    for i, (donor_id, source) in enumerate(pairs):
+        values.append(f"(:donor_id_{i}, :source_{i}, NOW())")
+        params.update({f"donor_id_{i}": donor_id, f"source_{i}": source})
+        binds.append(bindparam(f"source_{i}", type_=JSONB))
+    session.execute(text(f"""
+        INSERT INTO donor_sources (donor_id, source, fetched_at)
+        VALUES {', '.join(values)}
+        ON CONFLICT (donor_id) DO UPDATE SET source = EXCLUDED.source, fetched_at = EXCLUDED.fetched_at
+    """).bindparams(*binds), params)
+    return len(pairs)
+
+
+async def _prefetch_pages(state: str, ntee_major: int, out: asyncio.Queue, start_page: int = 0) -> None:
+    """Producer: walk search pages ahead of the consumer until results run out."""
+    page = start_page
+    try:
+        while True:
+            data = await propublica.search_orgs(state, ntee_major, page)
+            orgs = data.get("organizations", [])
+            if not orgs:
+                break
+            await out.put(orgs)
+            page += 1
+            num_pages = data.get("num_pages")
+            if num_pages is not None and page >= int(num_pages):
+                break
+    except Exception as e:  # surfaced to the consumer
+        await out.put(e)
+        return
+    await out.put(_PAGE_DONE)
+
+
+async def run_ingest(
+    session,
+    state: str,
+    ntee_major: int,
+    limit: int,
+    concurrency: int = 8,
+    batch_size: int = 50,
+    prefetch_pages: int = 2,
+) -> dict:
+    """
+    Ingest up to `limit` foundations for (state, ntee_major) through an
+    AsyncSession. Returns counts and throughput stats (orgs/s, wall time
+    waiting on HTTP vs time spent in the DB).
+    """
+    sem = asyncio.Semaphore(concurrency)
+    pages: asyncio.Queue = asyncio.Queue(maxsize=max(prefetch_pages, 1))
+    producer = asyncio.create_task(_prefetch_pages(state, ntee_major, pages))
+
+    stats = {"pages": 0, "orgs_fetched": 0, "org_errors": 0, "skipped": 0,
+             "http_s": 0.0, "db_s": 0.0, "batches": 0}
+
+    async def fetch_detail(o: dict) -> dict | None:
+        async with sem:
+            try:
+                return await propublica.get_org(str(o.get("ein")))
+            except httpx.HTTPError:
+                stats["org_errors"] += 1
+                return None
+
+    async def flush(buf: list[dict]) -> None:
+        t = time.perf_counter()
+        await session.run_sync(upsert_donors, list(buf))
+        stats["db_s"] += time.perf_counter() - t
+        stats["batches"] += 1
+        buf.clear()
+
+    started = time.perf_counter()
+    added, buf = 0, []
+    try:
+        while added < limit:
+            t = time.perf_counter()
+            orgs = await pages.get()
+            if orgs is _PAGE_DONE:
+                break
+            if isinstance(orgs, Exception):
+                raise orgs
+            stats["pages"] += 1
+
+            details = await asyncio.gather(*(fetch_detail(o) for o in orgs))
+            stats["http_s"] += time.perf_counter() - t
+            stats["orgs_fetched"] += len(orgs)
+
+            for o, detail in zip(orgs, details):
+                row = donor_row(o, detail) if detail else None
+                if row is None:
+                    stats["skipped"] += 1
+                    continue
+                buf.append(row)
+                added += 1
+                if len(buf) >= batch_size:
+                    await flush(buf)
+                if added >= limit:
+                    break
+        if buf:
+            await flush(buf)
+    finally:
+        producer.cancel()
+
+    t = time.perf_counter()
+    await session.commit()
+    stats["db_s"] += time.perf_counter() - t
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["http_s"] = round(stats["http_s"], 3)
+    stats["db_s"] = round(stats["db_s"], 3)
+    stats["orgs_per_s"] = round(stats["orgs_fetched"] / elapsed, 2) if elapsed else None
+    return {"added": added, "stats": stats}
+
+
+async def _checkpoint_start(session, state: str, ntee_major: int) -> int:
+    """Page to resume from; starts (and records) a new pass when none is in progress."""
+    row = (await session.execute(text("""
+        SELECT next_page, run_started_at FROM ingest_checkpoints
+        WHERE state = :state AND ntee_major = :ntee
+    """), {"state": state, "ntee": ntee_major})).first()
+    if row and row[1] is not None:
+        return row[0]
+    await session.execute(text("""
+        INSERT INTO ingest_checkpoints (state, ntee_major, next_page, run_started_at, updated_at)
+        VALUES (:state, :ntee, 0, NOW(), NOW())
+        ON CONFLICT (state, ntee_major) DO UPDATE SET
+            next_page = 0, run_started_at = NOW(), updated_at = NOW()
+    """), {"state": state, "ntee": ntee_major})
+    await session.commit()
+    return 0
+
+
+async def _save_checkpoint(session, state: str, ntee_major: int, next_page: int, finished: bool) -> None:
+    if finished:
+        sql = """
+            UPDATE ingest_checkpoints
+            SET next_page = 0, run_started_at = NULL, last_completed_at = NOW(), updated_at = NOW()
+            WHERE state = :state AND ntee_major = :ntee
+        """
+    else:
+        sql = """
+            UPDATE ingest_checkpoints SET next_page = :page, updated_at = NOW()
+            WHERE state = :state AND ntee_major = :ntee
+        """
+    await session.execute(text(sql), {"state": state, "ntee": ntee_major, "page": next_page})
+
+
+async def run_refresh(
+    session,
+    state: str,
+    ntee_major: int,
+    limit: int,
+    concurrency: int = 8,
+    batch_size: int = 50,
+    prefetch_pages: int = 2,
+    recheck_days: float = 7.0,
+) -> dict:
+    """
+    Incremental pass over (state, ntee_major) through an AsyncSession,
+    examining at most `limit` search hits per call; call again to continue
+    (the checkpoint resets once the last page is done). Writes are
+    proportional to what changed upstream: new, changed and unchanged orgs
+    are counted separately in the stats.
+    """
+    start_page = await _checkpoint_start(session, state, ntee_major)
+    sem = asyncio.Semaphore(concurrency)
+    pages: asyncio.Queue = asyncio.Queue(maxsize=max(prefetch_pages, 1))
+    producer = asyncio.create_task(_prefetch_pages(state, ntee_major, pages, start_page))
+
+    stats = {"start_page": start_page, "pages": 0, "orgs_seen": 0, "recently_checked": 0, "orgs_fetched": 0,
+             "org_errors": 0, "new": 0, "changed": 0, "unchanged": 0, "rehashed": 0, "skipped": 0,
+             "http_s": 0.0, "db_s": 0.0}
+
+    async def fetch_detail(o: dict) -> dict | None:
+        async with sem:
+            try:
+                return await propublica.get_org(str(o.get("ein")))
+            except httpx.HTTPError:
+                stats["org_errors"] += 1
+                return None
+
+    started = time.perf_counter()
+    page, finished = start_page, False
+    try:
+        while stats["orgs_seen"] < limit:
+            t = time.perf_counter()
+            orgs = await pages.get()
+            if orgs is _PAGE_DONE:
+                finished = True
+                break
+            if isinstance(orgs, Exception):
+                raise orgs
+            stats["pages"] += 1
+            stats["orgs_seen"] += len(orgs)
+
+            eins = [str(o.get("ein")) for o in orgs]
+            known = {r[0]: (r[1], r[2]) for r in (await session.execute(text("""
+                SELECT ein, fingerprint, checked_at > NOW() - make_interval(secs => :recheck_s)
+                FROM donor_fingerprints WHERE ein = ANY(:eins)
+            """), {"eins": eins, "recheck_s": recheck_days * 86400})).all()}
+            todo = [o for o, ein in zip(orgs, eins) if not (ein in known and known[ein][1])]
+            stats["recently_checked"] += len(orgs) - len(todo)
+
+            details = await asyncio.gather(*(fetch_detail(o) for o in todo))
+            stats["http_s"] += time.perf_counter() - t
+            stats["orgs_fetched"] += len(todo)
+
+            t = time.perf_counter()
+            rows, fresh_fps, unchanged, rehashed = [], {}, [], {}
+            for o, detail in zip(todo, details):
+                if not detail:
+                    continue
+                ein = str(o.get("ein"))
+                row = donor_row(o, detail)
+                fp = fingerprint(o, detail, row)
+                stored = known[ein][0] if ein in known else None
+                if stored == fp:
+                    unchanged.append(ein)
+                    stats["unchanged"] += 1
+                    continue
+                if stored and ":" not in stored and stored == fingerprint_v1(o, detail, row):
+                    # same org, older fingerprint format: store the new one, don't rewrite or flag
+                    rehashed[ein] = fp
+                    stats["unchanged"] += 1
+                    stats["rehashed"] += 1
+                    continue
+                fresh_fps[ein] = fp
+                if row is None:
+                    stats["skipped"] += 1
+                else:
+                    rows.append(row)
+                    stats["changed" if ein in known else "new"] += 1
+
+            for i in range(0, len(rows), batch_size):
+                await session.run_sync(upsert_donors, rows[i:i + batch_size], True)
+            if fresh_fps:
+                await session.execute(text("""
+                    INSERT INTO donor_fingerprints (ein, fingerprint, checked_at, changed_at)
+                    SELECT ein, fp, NOW(), NOW() FROM unnest(CAST(:eins AS TEXT[]), CAST(:fps AS TEXT[])) AS t(ein, fp)
+                    ON CONFLICT (ein) DO UPDATE SET
+                        fingerprint = EXCLUDED.fingerprint, checked_at = NOW(), changed_at = NOW()
+                """), {"eins": list(fresh_fps), "fps": list(fresh_fps.values())})
+            if unchanged:
+                await session.execute(text("""
+                    UPDATE donor_fingerprints SET checked_at = NOW() WHERE ein = ANY(:eins)
+                """), {"eins": unchanged})
+            if rehashed:
+                await session.execute(text("""
+                    UPDATE donor_fingerprints f SET fingerprint = t.fp, checked_at = NOW()
+                    FROM unnest(CAST(:eins AS TEXT[]), CAST(:fps AS TEXT[])) AS t(ein, fp)
+                    WHERE f.ein = t.ein
+                """), {"eins": list(rehashed), "fps": list(rehashed.values())})
+            page += 1
+            await _save_checkpoint(session, state, ntee_major, page, finished=False)
+            await session.commit()  # page done: a crash resumes from the next one
+            stats["db_s"] += time.perf_counter() - t
+
+        if finished:
+            await _save_checkpoint(session, state, ntee_major, page, finished=True)
+            await session.commit()
+    finally:
+        producer.cancel()
+
+    elapsed = time.perf_counter() - started
+    stats["next_page"] = 0 if finished else page
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["http_s"] = round(stats["http_s"], 3)
+    stats["db_s"] = round(stats["db_s"], 3)
+    return {"done": finished, "written": stats["new"] + stats["changed"], "stats": stats}
@@ -0,0 +1,221 @@
+"""
+Durable job queue on the Postgres `jobs` table.
+
+Routes `enqueue` work and return the job id; workers (app/worker.py) `claim`
+the oldest runnable job with FOR UPDATE SKIP LOCKED, so any number of worker
+processes can share the table without double-running a job. A `dedupe_key`
+(e.g. "crawl:donor:42") allows only one queued/running job per key; a
+`serial_key` (e.g. "crawl:ucla.edu") lets jobs queue side by side but only
+one of them run at a time. Failures are retried with exponential backoff up
+to `max_attempts`.
+
+Env:
+  JOB_MAX_ATTEMPTS    default attempts per job (default 3)
+  JOB_RETRY_BASE_S    backoff base; attempt n waits base * 2**(n-1) (default 30)
+  JOB_LOCK_TIMEOUT_S  running jobs not heartbeated for this long are requeued (default 900)
+"""
+from __future__ import annotations
+import os
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import JSONB
+
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_S = float(os.getenv("JOB_RETRY_BASE_S", "30"))
+LOCK_TIMEOUT_S = float(os.getenv("JOB_LOCK_TIMEOUT_S", "900"))
+
+ACTIVE = ("queued", "running")
+
+
+class PermanentJobError(Exception):
+    """Raised by a task when retrying cannot help (missing donor, bad params); the job fails at once."""
+
+_JOB_COLUMNS = (
+    "id, kind, params, dedupe_key, serial_key, status, attempts, max_attempts, run_after, "
+    "locked_by, progress, result, error, created_at, updated_at, finished_at"
+)
+
+
+def enqueue(
+    session,
+    kind: str,
+    params: dict | None = None,
+    dedupe_key: str | None = None,
+    max_attempts: int = MAX_ATTEMPTS,
+    serial_key: str | None = None,
+) -> tuple[int, bool]:
+    """
+    Queue a job; returns (job_id, created). If an active job already holds
+    `dedupe_key`, its id is returned with created=False.
+    """
+    row = session.execute(text("""
+        INSERT INTO jobs (kind, params, dedupe_key, serial_key, max_attempts)
+        VALUES (:kind, :params, :dedupe_key, :serial_key, :max_attempts)
+        ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING
+        RETURNING id
+    """).bindparams(bindparam("params", type_=JSONB)), {
+        "kind": kind,
+        "params": params or {},
+        "dedupe_key": dedupe_key,
+        "serial_key": serial_key,
+        "max_attempts": max_attempts,
+    }).first()
+    if row is None:
+        existing = session.execute(text("""
+            SELECT id FROM jobs WHERE dedupe_key = :key AND status IN ('queued', 'running')
+        """), {"key": dedupe_key}).first()
+        session.commit()
+        if existing is not None:
+            return existing[0], False
+        # the active job finished between the two statements; queue a fresh one
+        return enqueue(session, kind, params, dedupe_key, max_attempts, serial_key)
+    session.commit()
+    return row[0], True
+
+
+def claim(session, worker_id: str, kinds: list[str] | None = None) -> dict | None:
+    """
+    Lock the oldest runnable job for this worker (skipping ones other workers
+    hold, and ones whose serial_key already has a running job).
+    """
+    kind_filter = "AND kind = ANY(:kinds)" if kinds else ""
+    try:
+        row = session.execute(text(f"""
+            UPDATE jobs SET
+                status = 'running',
+                attempts = attempts + 1,
+                locked_by = :worker,
+                locked_at = NOW(),
+                updated_at = NOW()
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status = 'queued' AND run_after <= NOW() {kind_filter}
+                  AND (serial_key IS NULL OR NOT EXISTS (
+                      SELECT 1 FROM jobs r WHERE r.status = 'running' AND r.serial_key = jobs.serial_key
+                  ))
+                ORDER BY run_after, id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, kind, params, attempts, max_attempts, locked_by
+        """), {"worker": worker_id, "kinds": kinds}).mappings().first()
+    except IntegrityError:
+        # another worker started a job with the same serial_key at the same moment; next poll
+        session.rollback()
+        return None
+    session.commit()
+    return dict(row) if row else None
+
+
+# heartbeat / complete / fail only touch a job this worker still holds: after
+# requeue_stale another worker may have claimed it
+_OWNED = "id = :id AND status = 'running' AND locked_by = :worker"
+
+
+def heartbeat(session, job: dict, progress: dict | None = None) -> None:
+    """Refresh the lock (and optionally record progress) for a running job."""
+    if progress is None:
+        stmt = text(f"""
+            UPDATE jobs SET locked_at = NOW(), updated_at = NOW()
+            WHERE {_OWNED}
+        """)
+    else:
+        stmt = text(f"""
+            UPDATE jobs SET locked_at = NOW(), updated_at = NOW(), progress = :progress
+            WHERE {_OWNED}
+        """).bindparams(bindparam("progress", type_=JSONB))
+    session.execute(stmt, {"id": job["id"], "worker": job["locked_by"], "progress": progress})
+    session.commit()
+
+
+def complete(session, job: dict, result) -> str:
+    """Mark succeeded; returns "lost" if the job no longer belongs to this worker."""
+    res = session.execute(text(f"""
+        UPDATE jobs SET status = 'succeeded', result = :result, error = NULL,
+                        locked_by = NULL, finished_at = NOW(), updated_at = NOW()
+        WHERE {_OWNED}
+    """).bindparams(bindparam("result", type_=JSONB)), {"id": job["id"], "worker": job["locked_by"], "result": result})
+    session.commit()
+    return "succeeded" if res.rowcount else "lost"
+
+
+def fail(session, job: dict, error: str, retryable: bool = True) -> str:
+    """
+    Requeue with backoff while attempts remain, else mark failed. Returns the
+    new status, or "lost" if the job no longer belongs to this worker.
+    """
+    retry = retryable and job["attempts"] < job["max_attempts"]
+    res = session.execute(text(f"""
+        UPDATE jobs SET
+            status = :status,
+            error = :error,
+            locked_by = NULL,
+            run_after = CASE WHEN :retry THEN NOW() + make_interval(secs => :delay) ELSE run_after END,
+            finished_at = CASE WHEN :retry THEN NULL ELSE NOW() END,
+            updated_at = NOW()
+        WHERE {_OWNED}
+    """), {
+        "id": job["id"],
+        "worker": job["locked_by"],
+        "status": "queued" if retry else "failed",
+        "error": error[:2000],
+        "retry": retry,
+        "delay": RETRY_BASE_S * (2 ** (job["attempts"] - 1)),
+    })
+    session.commit()
+    if not res.rowcount:
+        return "lost"
+    return "queued" if retry else "failed"
+
+
+def requeue_stale(session, timeout_s: float = LOCK_TIMEOUT_S) -> int:
+    """
+    Put running jobs whose worker stopped heartbeating back in the queue, or
+    mark them failed once their attempts are used up (a job that keeps killing
+    its worker, e.g. OOM, must not be retried forever).
+    """
+    res = session.execute(text("""
+        UPDATE jobs SET
+            status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+            locked_by = NULL, updated_at = NOW(),
+            error = 'worker lost (lock timeout)'
+        WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => :timeout)
+    """), {"timeout": timeout_s})
+    session.commit()
+    return res.rowcount
+
+
+def get_job(session, job_id: int) -> dict | None:
+    row = session.execute(
+        text(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = :id"), {"id": job_id}
+    ).mappings().first()
+    return dict(row) if row else None
+
+
+def list_jobs(session, status: str | None = None, kind: str | None = None, limit: int = 50) -> list:
+    where, params = [], {"limit": limit}
+    if status:
+        where.append("status = :status")
+        params["status"] = status
+    if kind:
+        where.append("kind = :kind")
+        params["kind"] = kind
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    return session.execute(text(f"""
+        SELECT {_JOB_COLUMNS} FROM jobs
+        {where_sql}
+        ORDER BY id DESC
+        LIMIT :limit
+    """), params).mappings().all()
+
+
+def cancel(session, job_id: int) -> bool:
+    """Cancel a job that has not started yet."""
+    res = session.execute(text("""
+        UPDATE jobs SET status = 'cancelled', finished_at = NOW(), updated_at = NOW()
+        WHERE id = :id AND status = 'queued'
+    """), {"id": job_id})
+    session.commit()
+    return res.rowcount > 0
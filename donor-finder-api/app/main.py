@@ -1,9 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app import batch_crawl, http_clients, inference
+from app.routes.admin import router as admin_router
 from app.routes.donors import router as donors_router
+from app.routes.jobs import router as jobs_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_clients.startup()
+    await inference.startup()
+    await batch_crawl.startup()
+    try:
+        yield
+    finally:
+        await batch_crawl.shutdown()
+        await inference.shutdown()
+        await http_clients.shutdown()
+
 
-app = FastAPI(title="Donor Finder API")
+app = FastAPI(title="Donor Finder API", lifespan=lifespan)
 
 # Allow local Next.js and any dev tools
 app.add_middleware(
@@ -19,3 +38,5 @@ app.add_middleware(
 )
 
 app.include_router(donors_router, prefix="/donors")
+app.include_router(jobs_router, prefix="/jobs")
+app.include_router(admin_router, prefix="/admin")
@@ -0,0 +1,154 @@
+"""
+Persistent revalidation cache for crawled / scraped pages (`page_cache`).
+
+Per URL we keep the validators (ETag, Last-Modified), a sha256 of the body,
+the HTTP status and the page's extraction result. Re-crawls send conditional
+requests; a 304 or an identical body reuses the stored extraction, so the
+page is not parsed again, re-sent to Firecrawl or re-inserted as evidence.
+
+Entries for the hosts being crawled are loaded up front and written back in
+one statement afterwards, so the async crawl itself never touches the DB.
+"""
+from __future__ import annotations
+import hashlib
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+import httpx
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+def page_host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8", "replace")).hexdigest()
+
+
+@dataclass
+class CachedPage:
+    url: str
+    status: int
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    final_url: str | None = None
+    extract: dict | None = None
+
+
+@dataclass
+class PageCache:
+    entries: dict[str, CachedPage] = field(default_factory=dict)
+    dirty: dict[str, CachedPage] = field(default_factory=dict)
+    stats: dict = field(default_factory=lambda: {
+        "not_modified": 0, "same_content": 0, "changed": 0, "new": 0,
+    })
+
+    @classmethod
+    def load(cls, session, hosts) -> "PageCache":
+        cache = cls()
+        hosts = sorted({page_host(h if "://" in h else f"https://{h}") for h in hosts if h})
+        if not hosts:
+            return cache
+        rows = session.execute(text("""
+            SELECT url, status, etag, last_modified, content_hash, final_url, extract
+            FROM page_cache
+            WHERE host = ANY(:hosts)
+        """), {"hosts": hosts}).mappings().all()
+        for r in rows:
+            cache.entries[r["url"]] = CachedPage(**r)
+        return cache
+
+    def get(self, url: str) -> CachedPage | None:
+        return self.entries.get(url)
+
+    def conditional_headers(self, url: str) -> dict:
+        cached = self.entries.get(url)
+        headers = {}
+        if cached and cached.status == 200:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def check(self, url: str, resp: httpx.Response) -> tuple[bool, CachedPage]:
+        """
+        Compare a (possibly conditional) response with the cache.
+        Returns (unchanged, entry); the entry is refreshed and queued for save.
+        """
+        cached = self.entries.get(url)
+        if resp.status_code == 304 and cached:
+            self.stats["not_modified"] += 1
+            self.dirty[url] = cached
+            return True, cached
+
+        body_hash = content_hash(resp.text)
+        entry = CachedPage(
+            url=url,
+            status=resp.status_code,
+            etag=resp.headers.get("etag"),
+            last_modified=resp.headers.get("last-modified"),
+            content_hash=body_hash,
+            final_url=str(resp.url),
+            extract=cached.extract if cached else None,
+        )
+        unchanged = bool(cached) and cached.status == entry.status and cached.content_hash == body_hash
+        if unchanged:
+            self.stats["same_content"] += 1
+        else:
+            self.stats["changed" if cached else "new"] += 1
+            entry.extract = None
+        self.entries[url] = entry
+        self.dirty[url] = entry
+        return unchanged, entry
+
+    def set_extract(self, url: str, extract: dict) -> None:
+        entry = self.entries.get(url)
+        if entry is not None:
+            entry.extract = extract
+            self.dirty[url] = entry
+
+    def save(self, session) -> int:
+        """Upsert every touched entry in one statement; fetched_at only moves when the content did."""
+        if not self.dirty:
+            return 0
+        values, params, binds = [], {}, []
+        for i, entry in enumerate(self.dirty.values()):
+            values.append(
+                f"(:url_{i}, :host_{i}, :status_{i}, :etag_{i}, :lm_{i}, :hash_{i}, :final_{i}, :extract_{i}, NOW(), NOW())"
+            )
+            params.update({
+                f"url_{i}": entry.url,
+                f"host_{i}": page_host(entry.url),
+                f"status_{i}": entry.status,
+                f"etag_{i}": entry.etag,
+                f"lm_{i}": entry.last_modified,
+                f"hash_{i}": entry.content_hash,
+                f"final_{i}": entry.final_url,
+                f"extract_{i}": entry.extract,  # JSONB bind serializes the dict
+            })
+            # None must bind as SQL NULL (not JSON null) so COALESCE below keeps a stored extract
+            binds.append(bindparam(f"extract_{i}", type_=JSONB(none_as_null=True)))
+        session.execute(text(f"""
+            INSERT INTO page_cache AS pc
+                (url, host, status, etag, last_modified, content_hash, final_url, extract, fetched_at, validated_at)
+            VALUES {', '.join(values)}
+            ON CONFLICT (url) DO UPDATE SET
+                status = EXCLUDED.status,
+                etag = COALESCE(EXCLUDED.etag, pc.etag),
+                last_modified = COALESCE(EXCLUDED.last_modified, pc.last_modified),
+                content_hash = EXCLUDED.content_hash,
+                final_url = EXCLUDED.final_url,
+                extract = CASE WHEN EXCLUDED.content_hash IS DISTINCT FROM pc.content_hash
+                               THEN EXCLUDED.extract ELSE COALESCE(EXCLUDED.extract, pc.extract) END,
+                fetched_at = CASE WHEN EXCLUDED.content_hash IS DISTINCT FROM pc.content_hash
+                                  THEN NOW() ELSE pc.fetched_at END,
+                validated_at = NOW()
+        """).bindparams(*binds), params)
+        saved = len(self.dirty)
+        self.dirty.clear()
+        return saved
@@ -0,0 +1,119 @@
+"""
+Keyset pagination and row counts for the donors listing.
+
+The listing is ordered by (assets_total DESC NULLS LAST, id). A page cursor is
+an opaque token for the last row's (assets_total, id); the next page seeks
+past it through the composite indexes instead of skipping OFFSET rows.
+
+Counts are optional: an exact COUNT(*) cached for COUNT_CACHE_TTL seconds
+(per filter set), or the planner's row estimate.
+"""
+from __future__ import annotations
+import base64
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+ORDER_BY = "assets_total DESC NULLS LAST, id"
+
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+_COUNT_CACHE_MAX = 512
+_count_cache: dict[tuple, tuple[float, int]] = {}
+_count_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row) -> str:
+    assets = row["assets_total"]
+    payload = {"a": None if assets is None else str(assets), "id": row["id"]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Decimal | None, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        assets = payload["a"]
+        return (None if assets is None else Decimal(assets)), int(payload["id"])
+    except Exception as e:
+        raise InvalidCursor("invalid cursor") from e
+
+
+def keyset_page(session, cols: str, where: list[str], params: dict, cursor: str | None, limit: int) -> list:
+    """
+    One page of donors after `cursor` (first page if None), ordered by ORDER_BY.
+
+    Mixed sort directions rule out a row comparison, so a cursor in the
+    non-NULL region seeks on assets_total and appends the NULL tail with a
+    UNION ALL; each branch is an index range scan bounded by `limit`.
+    """
+    where_sql = " AND ".join(where) or "TRUE"
+    params = {**params, "limit": limit}
+
+    if cursor is None:
+        sql = f"SELECT {cols} FROM donors WHERE {where_sql} ORDER BY {ORDER_BY} LIMIT :limit"
+    else:
+        c_assets, c_id = decode_cursor(cursor)
+        params["c_id"] = c_id
+        if c_assets is None:
+            sql = f"""
+                SELECT {cols} FROM donors
+                WHERE {where_sql} AND assets_total IS NULL AND id > :c_id
+                ORDER BY id
+                LIMIT :limit
+            """
+        else:
+            params["c_assets"] = c_assets
+            sql = f"""
+                SELECT * FROM (
+                    (SELECT {cols} FROM donors
+                     WHERE {where_sql} AND assets_total <= :c_assets
+                       AND (assets_total < :c_assets OR id > :c_id)
+                     ORDER BY {ORDER_BY}
+                     LIMIT :limit)
+                    UNION ALL
+                    (SELECT {cols} FROM donors
+                     WHERE {where_sql} AND assets_total IS NULL
+                     ORDER BY id
+                     LIMIT :limit)
+                ) page
+                ORDER BY {ORDER_BY}
+                LIMIT :limit
+            """
+    return session.execute(text(sql), params).mappings().all()
+
+
+def exact_count(session, where: list[str], params: dict) -> int:
+    where_sql = " AND ".join(where) or "TRUE"
+    key = (where_sql, tuple(sorted((k, str(v)) for k, v in params.items())))
+    now = time.time()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and now - hit[0] <= COUNT_CACHE_TTL:
+            return hit[1]
+    total = session.execute(text(f"SELECT COUNT(*) FROM donors WHERE {where_sql}"), params).scalar()
+    with _count_lock:
+        if len(_count_cache) >= _COUNT_CACHE_MAX:
+            _count_cache.pop(min(_count_cache, key=lambda k: _count_cache[k][0]))
+        _count_cache[key] = (now, total)
+    return total
+
+
+def estimated_count(session, where: list[str], params: dict) -> int:
+    """Planner row estimate; filter values are inlined since EXPLAIN can't take bind params."""
+    where_sql = " AND ".join(where) or "TRUE"
+    stmt = text(f"SELECT 1 FROM donors WHERE {where_sql}").bindparams(**params)
+    literal = stmt.compile(dialect=postgresql.dialect(paramstyle="named"), compile_kwargs={"literal_binds": True})
+    # escape colons so text() doesn't read inlined string values as bind params
+    plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {literal}".replace(":", r"\:"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
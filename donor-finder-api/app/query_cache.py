@@ -0,0 +1,145 @@
+"""
+Query-embedding cache for semantic search.
+
+In-process LRU keyed on (model name, normalized query) with size and TTL
+bounds, plus an optional SQLite tier so warm entries survive restarts.
+
+Env:
+  QUERY_CACHE_SIZE  max in-memory entries (default 1024, 0 disables)
+  QUERY_CACHE_TTL   seconds an entry stays valid (default 86400)
+  QUERY_CACHE_PATH  SQLite file for the persistent tier (unset = memory only)
+  QUERY_CACHE_DISK_MAX  max rows kept in the SQLite tier (default 100000)
+
+The SQLite tier is pruned on open and every PRUNE_EVERY writes: expired rows
+are deleted, then the oldest ones beyond QUERY_CACHE_DISK_MAX.
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.embeddings import model_name
+from app.inference import embed_sync
+
+
+PRUNE_EVERY = 256
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int, ttl: float, path: str | None = None, disk_max: int = 100000):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.disk_max = disk_max
+        self._disk_writes = 0
+        self._mem: OrderedDict[tuple[str, str], tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    model TEXT, query TEXT, created REAL, dim INTEGER, vec BLOB,
+                    PRIMARY KEY (model, query)
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created_idx ON query_embeddings (created)")
+            self._db.commit()
+            self._disk_prune(time.time())
+
+    def _disk_get(self, key: tuple[str, str]) -> tuple[float, np.ndarray] | None:
+        row = self._db.execute(
+            "SELECT created, vec FROM query_embeddings WHERE model=? AND query=?", key
+        ).fetchone()
+        if not row:
+            return None
+        return row[0], np.frombuffer(row[1], dtype=np.float32)
+
+    def _disk_put(self, key: tuple[str, str], created: float, vec: np.ndarray) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO query_embeddings (model, query, created, dim, vec) VALUES (?, ?, ?, ?, ?)",
+            (*key, created, vec.shape[0], vec.tobytes()),
+        )
+        self._disk_writes += 1
+        if self._disk_writes % PRUNE_EVERY == 0:
+            self._disk_prune(created)
+        self._db.commit()
+
+    def _disk_prune(self, now: float) -> None:
+        self._db.execute("DELETE FROM query_embeddings WHERE created < ?", (now - self.ttl,))
+        self._db.execute("""
+            DELETE FROM query_embeddings WHERE created < (
+                SELECT created FROM query_embeddings ORDER BY created DESC LIMIT 1 OFFSET ?
+            )
+        """, (self.disk_max - 1,))
+        self._db.commit()
+
+    def _remember(self, key: tuple[str, str], created: float, vec: np.ndarray) -> None:
+        self._mem[key] = (created, vec)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_size:
+            self._mem.popitem(last=False)
+
+    def get(self, query: str) -> np.ndarray:
+        """Embedding for `query` as a read-only float32 vector, computed on miss."""
+        key = (model_name(), normalize_query(query))
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and now - hit[0] <= self.ttl:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            if self._db is not None:
+                hit = self._disk_get(key)
+                if hit and now - hit[0] <= self.ttl:
+                    self.disk_hits += 1
+                    self._remember(key, *hit)
+                    return hit[1]
+            self.misses += 1
+
+        vec = embed_sync([query])[0].copy()  # normalized text is the key only; embed what was sent
+        vec.setflags(write=False)
+        with self._lock:
+            self._remember(key, now, vec)
+            if self._db is not None:
+                self._disk_put(key, now, vec)
+        return vec
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._mem),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+query_cache = QueryEmbeddingCache(
+    max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("QUERY_CACHE_TTL", "86400")),
+    path=os.getenv("QUERY_CACHE_PATH") or None,
+    disk_max=int(os.getenv("QUERY_CACHE_DISK_MAX", "100000")),
+)
+
+
+def embed_query(query: str) -> np.ndarray:
+    if query_cache.max_size <= 0:
+        return embed_sync([query])[0]
+    return query_cache.get(query)
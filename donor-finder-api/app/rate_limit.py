@@ -0,0 +1,81 @@
+"""
+Async token-bucket rate limiting and retry backoff for quota'd upstreams.
+"""
+from __future__ import annotations
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second refill up to `burst`; `acquire` waits for a token.
+    `pause(seconds)` stops all callers (e.g. on 429 Retry-After) until it passes.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited_s = 0.0
+        self.pauses = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        started = time.monotonic()
+        async with self._lock:  # FIFO-ish: one waiter computes its slot at a time
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        self.acquired += 1
+        self.waited_s += time.monotonic() - started
+
+    def pause(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = 0.0
+            self.pauses += 1
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_s": self.rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "avg_wait_ms": round(self.waited_s / self.acquired * 1000, 1) if self.acquired else None,
+            "pauses": self.pauses,
+        }
+
+
+def retry_after_seconds(value: str | None, default: float) -> float:
+    """Parse a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
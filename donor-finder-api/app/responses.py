@@ -0,0 +1,42 @@
+"""
+Fast JSON responses for the read-heavy endpoints.
+
+Routes return `FastJSONResponse(payload)` directly, which skips FastAPI's
+per-value `jsonable_encoder` walk; rendering uses orjson when installed
+(stdlib json otherwise). DB values FastAPI would have converted are handled
+here: NUMERIC -> int/float (like FastAPI's decimal encoder), RowMapping ->
+dict; datetimes are ISO 8601 either way.
+"""
+from __future__ import annotations
+import json
+from collections.abc import Mapping
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (datetime, date)):  # stdlib path only; orjson handles these natively
+        return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
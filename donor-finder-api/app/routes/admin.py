@@ -0,0 +1,101 @@
+# app/routes/admin.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app import apollo_cache, filings, http_clients, inference, vector_store
+from app.db import engine, get_session
+from app.query_cache import query_cache
+from app.services import apollo, firecrawl
+
+router = APIRouter()
+
+
+@router.get("/http")
+def http_pool_stats():
+    """
+    Outbound HTTP pool utilization per upstream (requests sent, open/idle connections).
+    """
+    return {"clients": http_clients.pool_stats()}
+
+
+@router.get("/caches")
+def cache_stats():
+    """
+    Hit/miss counters for in-process caches.
+    """
+    return {"query_embeddings": query_cache.stats(), "apollo": apollo_cache.stats()}
+
+
+@router.get("/inference")
+def inference_stats():
+    """
+    Embedding micro-batcher stats (batches run, average/max batch size, queue depth).
+    """
+    return {"embeddings": inference.batcher.stats()}
+
+
+@router.get("/apollo")
+def apollo_rate_stats():
+    """
+    Apollo request/429/retry counters and token-bucket wait times.
+    """
+    return apollo.rate_stats()
+
+
+@router.get("/firecrawl")
+def firecrawl_capabilities():
+    """
+    Memoized Firecrawl endpoint support (which endpoints our plan accepts), with age.
+    """
+    return {"base": firecrawl.BASE, "ttl_s": firecrawl.CAPABILITY_TTL, "endpoints": firecrawl.capabilities()}
+
+
+@router.delete("/firecrawl")
+def firecrawl_capabilities_reset():
+    firecrawl.reset_capabilities()
+    return {"reset": True}
+
+
+@router.get("/vector-index")
+def vector_index_status(session=Depends(get_session)):
+    """
+    Managed ANN index on donor_embeddings (method/definition) and the column dimension.
+    """
+    return {
+        "index": vector_store.index_info(session, refresh=True),
+        "column_dim": vector_store.column_dim(session),
+    }
+
+
+@router.post("/vector-index")
+def vector_index_build(
+    method: str = Query("hnsw", pattern="^(hnsw|ivfflat)$"),
+    m: int = Query(16, ge=2, le=100, description="hnsw: max links per node"),
+    ef_construction: int = Query(64, ge=4, le=1000, description="hnsw: build-time candidate list"),
+    lists: int | None = Query(None, ge=1, description="ivfflat: clusters (default rows/1000, min 10)"),
+):
+    """
+    Fix donor_embeddings.embedding to the model dimension and (re)build the ANN index concurrently.
+    """
+    try:
+        return vector_store.build_index(engine, method=method, m=m, ef_construction=ef_construction, lists=lists)
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+
+
+@router.delete("/vector-index")
+def vector_index_drop():
+    vector_store.drop_index(engine)
+    return {"dropped": vector_store.ANN_INDEX}
+
+
+@router.post("/filings/sync")
+def filings_sync(session=Depends(get_session)):
+    """
+    Re-extract `filings` from every stored ProPublica source and re-derive donor
+    assets/grants totals (one-off backfill after the donor_sources migration).
+    """
+    result = filings.sync(session)
+    session.commit()
+    return result
@@ -4,62 +4,108 @@ import json
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, Depends, Query, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text, bindparam
 from sqlalchemy.dialects.postgresql import JSONB
 
-from app.db import get_session
-from app import propublica
-from app.embeddings import embed_texts, to_pgvector
-from app.services.apollo import enrich_org_by_domain, search_org_by_name
-from app.services.firecrawl import scrape_markdown, extract_structured
+from app import batch_crawl, export, jobs, tasks
+from app.crawl import CrawlScheduler
+from app.db import get_async_session, get_session
+from app.hybrid_search import RRF_K, hybrid_search
+from app.page_cache import PageCache
+from app.pagination import InvalidCursor, keyset_page, encode_cursor, exact_count, estimated_count
+from app.text_search import keyword_filter
+from app.query_cache import embed_query
+from app.responses import FastJSONResponse
+from app.sites import candidate_pages_for, normalize_site, to_domain
+from app.vector_store import search as vector_search
 
 
 # --------------------------
 # helpers
 # --------------------------
 
-def _to_domain(website: str | None) -> str | None:
-    """Accepts 'ucla.edu' or 'https://ucla.edu/…' and returns bare domain like 'ucla.edu'."""
-    if not website:
-        return None
-    w = website.strip()
-    if "://" not in w:
-        return w.lower()
-    parsed = urlparse(w)
-    host = (parsed.netloc or parsed.path).lower().strip("/")
-    return host[4:] if host.startswith("www.") else host
-
-
-def _normalize_site(website: str | None) -> str | None:
-    """Return normalized https URL like 'https://ucla.edu' from bare or full input."""
-    if not website:
-        return None
-    w = website.strip()
-    if "://" not in w:
-        w = f"https://{w}"
-    parsed = urlparse(w)
-    host = (parsed.netloc or parsed.path).lower().strip("/")
-    if not host:
-        return None
-    return f"https://{host}"
-
-
-def _candidate_pages_for(domain: str) -> list[str]:
-    base = f"https://{domain}"
-    return [
-        base,
-        f"{base}/about",
-        f"{base}/about-us",
-        f"{base}/mission",
-        f"{base}/team",
-        f"{base}/leadership",
-        f"{base}/people",
-        f"{base}/grants",
-        f"{base}/grantmaking",
-        f"{base}/apply",
-        f"{base}/funding",
-        f"{base}/contact",
-    ]
+# explicit so derived columns (e.g. search_tsv) stay out of API payloads
+DONOR_FIELDS = (
+    "id", "ein", "name", "state", "city", "mission", "ntee_code", "assets_total", "grants_total",
+    "irs_subsection", "website", "source", "created_at", "updated_at",
+)
+# opt-in only (fields= / include=): `source` is the whole ProPublica org detail + filings
+HEAVY_FIELDS = ("source",)
+# fields stored outside `donors`; {t} is the donors table/alias in the outer query
+JOINED_FIELDS = {
+    "source": "(SELECT s.source FROM donor_sources s WHERE s.donor_id = {t}.id) AS source",
+}
+DONOR_LEAN_COLUMNS = ", ".join(f for f in DONOR_FIELDS if f not in HEAVY_FIELDS)
+PROFILE_INCLUDES = ("source", "raw")
+
+
+def _select_list(fields, t: str = "donors") -> str:
+    return ", ".join(JOINED_FIELDS[f].format(t=t) if f in JOINED_FIELDS else f for f in fields)
+
+
+def _donor_columns(fields: str | None) -> str:
+    """Column list for `fields=` (comma list of DONOR_FIELDS); the lean set when empty."""
+    if not fields:
+        return DONOR_LEAN_COLUMNS
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted.difference(DONOR_FIELDS)
+    if unknown:
+        raise HTTPException(422, f"Unknown fields: {', '.join(sorted(unknown))}")
+    wanted.update(("id", "assets_total"))  # keyset cursor
+    return _select_list(f for f in DONOR_FIELDS if f in wanted)
+
+
+def _list_filters(state, q, min_assets, max_assets, min_grants, max_grants) -> tuple[list[str], dict, str | None]:
+    """WHERE fragments (unqualified donor columns), params and the `q` rank expression for GET /donors + export."""
+    where = ["1=1"]
+    params = {}
+
+    if state:
+        where.append("state = :state")
+        params["state"] = state
+
+    rank_sql = None
+    if q and q.strip():
+        kw_where, rank_sql, kw_params = keyword_filter(q, alias="")
+        where.append(kw_where)
+        params.update(kw_params)
+
+    if min_assets is not None:
+        where.append("assets_total >= :min_assets")
+        params["min_assets"] = min_assets
+
+    if max_assets is not None:
+        where.append("assets_total <= :max_assets")
+        params["max_assets"] = max_assets
+
+    if min_grants is not None:
+        where.append("grants_total >= :min_grants")
+        params["min_grants"] = min_grants
+
+    if max_grants is not None:
+        where.append("grants_total <= :max_grants")
+        params["max_grants"] = max_grants
+
+    return where, params, rank_sql
+
+
+def _submit(session, kind: str, params: dict, dedupe_key: str | None = None, serial_key: str | None = None) -> dict:
+    """Queue a job for the worker; an identical active job is reused instead of duplicated."""
+    job_id, created = jobs.enqueue(session, kind, params, dedupe_key, serial_key=serial_key)
+    return {"job_id": job_id, "kind": kind, "deduplicated": not created}
+
+
+async def _submit_for_donor(session, kind: str, id: int, params: dict | None = None) -> dict:
+    # one active job per donor; donors sharing a site queue separately but run one at a time
+    row = (await session.execute(text("SELECT website FROM donors WHERE id=:id"), {"id": id})).first()
+    if not row:
+        raise HTTPException(404, "Donor not found")
+    domain = to_domain(row[0])
+    params = {"id": id, **(params or {})}
+    return await session.run_sync(
+        _submit, kind, params, f"{kind}:donor:{id}", f"{kind}:{domain}" if domain else None,
+    )
 
 
 router = APIRouter()
@@ -69,7 +115,7 @@ router = APIRouter()
 # list & detail
 # --------------------------
 
-@router.get("")
+@router.get("", response_class=FastJSONResponse)
 def list_donors(
     state: str | None = None,
     q: str | None = None,
@@ -79,80 +125,161 @@ def list_donors(
     max_grants: float | None = None,
     limit: int = 25,
     offset: int = 0,
+    cursor: str | None = Query(None, description="next_cursor from the previous page (replaces offset)"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$",
+                       description="exact (cached COUNT), estimate (planner), or none"),
+    sort: str = Query("assets", pattern="^(assets|relevance)$",
+                      description="relevance ranks `q` matches (full-text rank + name similarity)"),
+    fields: str | None = Query(None, description="Comma list of columns (default: all but `source`)"),
     session = Depends(get_session),
 ):
     """
     Filterable donors listing for the UI.
+    Pass back `next_cursor` as `cursor` for constant-cost paging; `offset` still works without one.
+    `q` matches name/mission/city via the full-text index (last word as prefix) or fuzzy name similarity.
+    `fields` projects columns; heavy ones (`source`) are only returned when asked for.
     """
-    where = ["1=1"]
-    params = {"limit": limit, "offset": offset}
-
-    if state:
-        where.append("state = :state")
-        params["state"] = state
-
-    if q:
-        where.append("(name ILIKE :q OR mission ILIKE :q)")
-        params["q"] = f"%{q}%"
-
-    if min_assets is not None:
-        where.append("assets_total >= :min_assets")
-        params["min_assets"] = min_assets
-
-    if max_assets is not None:
-        where.append("assets_total <= :max_assets")
-        params["max_assets"] = max_assets
-
-    if min_grants is not None:
-        where.append("grants_total >= :min_grants")
-        params["min_grants"] = min_grants
+    columns = _donor_columns(fields)
+    where, params, rank_sql = _list_filters(state, q, min_assets, max_assets, min_grants, max_grants)
+
+    if sort == "relevance" and rank_sql:
+        sql = text(f"""
+          SELECT {columns}, {rank_sql} AS relevance FROM donors
+          WHERE {' AND '.join(where)}
+          ORDER BY relevance DESC, assets_total DESC NULLS LAST, id
+          LIMIT :limit OFFSET :offset
+        """)
+        items = session.execute(sql, {**params, "limit": limit, "offset": offset}).mappings().all()
+    elif cursor is not None or not offset:
+        try:
+            items = keyset_page(session, columns, where, params, cursor, limit)
+        except InvalidCursor:
+            raise HTTPException(400, "Invalid cursor")
+    else:
+        sql = text(f"""
+          SELECT {columns} FROM donors
+          WHERE {' AND '.join(where)}
+          ORDER BY assets_total DESC NULLS LAST, id
+          LIMIT :limit OFFSET :offset
+        """)
+        items = session.execute(sql, {**params, "limit": limit, "offset": offset}).mappings().all()
+
+    if count == "exact":
+        total = exact_count(session, where, params)
+    elif count == "estimate":
+        total = estimated_count(session, where, params)
+    else:
+        total = None
+
+    # relevance pages by offset; the cursor only encodes the (assets_total, id) order
+    next_cursor = encode_cursor(items[-1]) if len(items) == limit and "relevance" not in items[-1] else None
+    return FastJSONResponse({
+        "items": items, "total": total, "total_is_estimate": count == "estimate", "next_cursor": next_cursor,
+    })
 
-    if max_grants is not None:
-        where.append("grants_total <= :max_grants")
-        params["max_grants"] = max_grants
 
-    sql = text(f"""
-      SELECT * FROM donors
-      WHERE {' AND '.join(where)}
-      ORDER BY assets_total DESC NULLS LAST, id
-      LIMIT :limit OFFSET :offset
-    """)
-    items = session.execute(sql, params).mappings().all()
-    total = session.execute(text(f"SELECT COUNT(*) FROM donors WHERE {' AND '.join(where)}"), params).scalar()
-    return {"items": items, "total": total}
+@router.get("/export")
+def export_donors(
+    state: str | None = None,
+    q: str | None = None,
+    min_assets: float | None = None,
+    max_assets: float | None = None,
+    min_grants: float | None = None,
+    max_grants: float | None = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    chunk_size: int = Query(export.DEFAULT_CHUNK, ge=100, le=50000, description="Rows per cursor fetch / encoded chunk"),
+):
+    """
+    Stream every donor matching the GET /donors filters (ordered by id) with its latest
+    contact and enrichment summary. Read through a server-side cursor; memory stays at one chunk.
+    """
+    if fmt == "parquet" and not export.parquet_available():
+        raise HTTPException(400, "format=parquet needs pyarrow installed")
+    where, params, _ = _list_filters(state, q, min_assets, max_assets, min_grants, max_grants)
+    chunks = export.iter_chunks(export.export_sql(where), params, chunk_size)
+    return StreamingResponse(
+        export.ENCODERS[fmt](chunks),
+        media_type=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="donors.{fmt}"'},
+    )
 
 
-@router.get("/{id}")
-def donor_detail(id: int, session=Depends(get_session)):
+@router.get("/{id}", response_class=FastJSONResponse)
+def donor_detail(
+    id: int,
+    include: str = Query("", description="Comma list of heavy fields: source (ProPublica JSON), raw (page snapshots)"),
+    session=Depends(get_session),
+):
     """
-    One donor + recent grants/contacts/enrichments for profile page.
+    One donor + recent filings/grants/contacts/enrichments for profile page, in a
+    single round trip (lateral json_agg per child table).
+    'page_markdown' enrichments come back with raw=null unless include=raw;
+    fetch one snapshot with GET /donors/{id}/enrichments/{enrichment_id}.
     """
-    donor = session.execute(text("SELECT * FROM donors WHERE id=:id"), {"id": id}).mappings().first()
-    if not donor:
+    extras = {f.strip() for f in include.split(",") if f.strip()}
+    unknown = extras.difference(PROFILE_INCLUDES)
+    if unknown:
+        raise HTTPException(422, f"Unknown include: {', '.join(sorted(unknown))}")
+    columns = _select_list(DONOR_FIELDS, "d") if "source" in extras else DONOR_LEAN_COLUMNS
+
+    row = session.execute(text(f"""
+        SELECT {columns}, f.items AS filings, g.items AS grants, c.items AS contacts, e.items AS enrichments
+        FROM donors d
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(x ORDER BY x.tax_period DESC), '[]'::json) AS items
+            FROM (
+                SELECT tax_period, tax_year, form_type, total_assets, grants_paid, total_revenue
+                FROM filings WHERE donor_id = d.id
+                ORDER BY tax_period DESC LIMIT 5
+            ) x
+        ) f
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(x ORDER BY x.year DESC NULLS LAST, x.id), '[]'::json) AS items
+            FROM (
+                SELECT * FROM grants WHERE donor_id = d.id
+                ORDER BY year DESC NULLS LAST, id LIMIT 10
+            ) x
+        ) g
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(x ORDER BY x.created_at DESC, x.id DESC), '[]'::json) AS items
+            FROM (
+                SELECT * FROM contacts WHERE donor_id = d.id
+                ORDER BY created_at DESC, id DESC LIMIT 20
+            ) x
+        ) c
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(x ORDER BY x.created_at DESC, x.id DESC), '[]'::json) AS items
+            FROM (
+                SELECT id, donor_id, kind, source, url, created_at,
+                       CASE WHEN :all_raw OR kind <> 'page_markdown' THEN raw END AS raw
+                FROM enrichments WHERE donor_id = d.id
+                ORDER BY created_at DESC, id DESC LIMIT 25
+            ) x
+        ) e
+        WHERE d.id = :id
+    """), {"id": id, "all_raw": "raw" in extras}).mappings().first()
+    if not row:
         raise HTTPException(404, "Donor not found")
 
-    grants = session.execute(
-        text("SELECT * FROM grants WHERE donor_id=:id ORDER BY year DESC NULLS LAST, id LIMIT 10"),
-        {"id": id}
-    ).mappings().all()
-
-    contacts = session.execute(
-        text("SELECT * FROM contacts WHERE donor_id=:id ORDER BY created_at DESC, id DESC LIMIT 20"),
-        {"id": id}
-    ).mappings().all()
+    donor = dict(row)
+    filings = donor.pop("filings")
+    grants, contacts, enrichments = donor.pop("grants"), donor.pop("contacts"), donor.pop("enrichments")
+    return FastJSONResponse({
+        "donor": donor, "filings": filings, "grants": grants, "contacts": contacts, "enrichments": enrichments,
+    })
 
-    enrichments = session.execute(
-        text("""
-            SELECT id, donor_id, kind, source, url, created_at, raw
-            FROM enrichments
-            WHERE donor_id=:id
-            ORDER BY created_at DESC, id DESC
-            LIMIT 25
-        """),
-        {"id": id}
-    ).mappings().all()
 
-    return {"donor": donor, "grants": grants, "contacts": contacts, "enrichments": enrichments}
+@router.get("/{id}/enrichments/{enrichment_id}", response_class=FastJSONResponse)
+def donor_enrichment(id: int, enrichment_id: int, session=Depends(get_session)):
+    """One enrichment with its full `raw` payload (e.g. a page_markdown snapshot)."""
+    row = session.execute(text("""
+        SELECT id, donor_id, kind, source, url, created_at, raw
+        FROM enrichments
+        WHERE id = :eid AND donor_id = :id
+    """), {"id": id, "eid": enrichment_id}).mappings().first()
+    if not row:
+        raise HTTPException(404, "Enrichment not found")
+    return FastJSONResponse(row)
 
 
 # --------------------------
@@ -164,83 +291,28 @@ async def ingest(
     state: str = Query("CA", description="Two-letter state, e.g., CA"),
     ntee_major: int = Query(2, description="NTEE major group (2=Education)"),
     limit: int = Query(35, description="How many donors to ingest"),
-    session=Depends(get_session)
+    concurrency: int = Query(8, ge=1, le=32, description="Max in-flight ProPublica org lookups"),
+    batch_size: int = Query(50, ge=1, le=500, description="Rows per multi-row upsert"),
+    prefetch_pages: int = Query(2, ge=1, le=10, description="Search pages fetched ahead"),
+    refresh: bool = Query(False, description="Incremental pass: skip unchanged orgs, resume from checkpoint"),
+    recheck_days: float = Query(7.0, ge=0, description="refresh: orgs checked more recently are not re-fetched"),
+    background: bool = Query(True, description="Queue as a job (default) or run inline"),
+    session=Depends(get_async_session)
 ):
     """
     Pull a small, real subset of donors from ProPublica and insert/update our DB.
+    With refresh=true, `limit` caps the search hits examined per call; only new or
+    changed orgs are written, and repeated calls continue the (state, NTEE) pass.
     """
-    page, added = 0, 0
-    while added < limit:
-        data = await propublica.search_orgs(state, ntee_major, page)
-        orgs = data.get("organizations", [])
-        if not orgs:
-            break
-
-        for o in orgs:
-            ein = str(o.get("ein"))
-            detail = await propublica.get_org(ein)
-
-            org = detail.get("organization", {}) or {}
-            filings = detail.get("filings_with_data", []) or []
-
-            # pick a recent assets value if present
-            tot_assets = None
-            for f in filings[:3]:
-                if "totassetsend" in f and f["totassetsend"] is not None:
-                    tot_assets = f["totassetsend"]
-                    break
-
-            name = org.get("name") or o.get("organization_name")
-            subseccd = org.get("subseccd")
-            is_foundation = "foundation" in (name or "").lower()
-
-            # keep to foundations/grantmakers roughly
-            if not (is_foundation or subseccd in (3, 92)):
-                continue
-
-            stmt = text("""
-                INSERT INTO donors (
-                    ein, name, state, city, mission, ntee_code,
-                    assets_total, irs_subsection, website, source
-                )
-                VALUES (
-                    :ein, :name, :state, :city, :mission, :ntee,
-                    :assets, :sub, :website, :source
-                )
-                ON CONFLICT (ein) DO UPDATE SET
-                    name=EXCLUDED.name,
-                    state=EXCLUDED.state,
-                    city=EXCLUDED.city,
-                    mission=EXCLUDED.mission,
-                    ntee_code=EXCLUDED.ntee_code,
-                    assets_total=EXCLUDED.assets_total,
-                    irs_subsection=EXCLUDED.irs_subsection,
-                    website=COALESCE(EXCLUDED.website, donors.website),
-                    source=EXCLUDED.source,
-                    updated_at=NOW()
-            """).bindparams(bindparam("source", type_=JSONB))
-
-            session.execute(stmt, {
-                "ein": ein,
-                "name": name,
-                "state": org.get("state") or o.get("state"),
-                "city": org.get("city"),
-                "mission": org.get("ntee_code") or o.get("ntee_code"),
-                "ntee": org.get("ntee_code") or o.get("ntee_code"),
-                "assets": tot_assets,
-                "sub": subseccd,
-                "website": org.get("website") or None,
-                "source": json.dumps(detail),
-            })
-
-            added += 1
-            if added >= limit:
-                break
-
-        page += 1
-
-    session.commit()
-    return {"added": added, "state": state, "ntee_major": ntee_major}
+    params = {
+        "state": state, "ntee_major": ntee_major, "limit": limit,
+        "concurrency": concurrency, "batch_size": batch_size, "prefetch_pages": prefetch_pages,
+    }
+    if refresh:
+        params.update(refresh=True, recheck_days=recheck_days)
+    if background:
+        return await session.run_sync(_submit, "ingest", params, f"ingest:{state}:{ntee_major}")
+    return await tasks.ingest(session, **params)
 
 
 # --------------------------
@@ -251,65 +323,26 @@ async def ingest(
 def build_embeddings(
     batch_size: int = Query(32, ge=1, le=256),
     max_rows: int = Query(200, ge=1),
+    incremental: bool = Query(False, description="Re-embed every donor whose doc changed, not just missing ones"),
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Rows per server-side cursor fetch (incremental)"),
+    after_id: int = Query(0, ge=0, description="Resume an incremental run after this donor id"),
+    background: bool = Query(True, description="Queue as a job (default) or run inline"),
     session = Depends(get_session),
 ):
     """
     Create embeddings for donors missing them using a small doc (name+mission+location+website).
+    With incremental=true, also re-embed donors whose doc hash changed; resume with after_id=last_id.
     """
-    rows = session.execute(text("""
-        SELECT d.id, d.name, COALESCE(d.mission,'' ) AS mission,
-               COALESCE(d.city,'') AS city, COALESCE(d.state,'') AS state,
-               COALESCE(d.website,'') AS website
-        FROM donors d
-        LEFT JOIN donor_embeddings de ON de.donor_id = d.id
-        WHERE de.donor_id IS NULL
-        ORDER BY d.id
-        LIMIT :max_rows
-    """), {"max_rows": max_rows}).mappings().all()
+    params = {
+        "batch_size": batch_size, "max_rows": max_rows, "incremental": incremental,
+        "chunk_size": chunk_size, "after_id": after_id,
+    }
+    if background:
+        return _submit(session, "build_embeddings", params, "build_embeddings")
+    return tasks.build_embeddings(session, **params)
 
-    if not rows:
-        return {"created": 0, "note": "No missing embeddings"}
 
-    docs, ids = [], []
-    for r in rows:
-        parts = [r["name"]]
-        if r["mission"]:
-            parts.append(r["mission"])
-        loc = f'{r["city"]}, {r["state"]}'.strip(", ")
-        if loc:
-            parts.append(loc)
-        if r["website"]:
-            parts.append(r["website"])
-        doc = " | ".join(p for p in parts if p)
-        docs.append(doc)
-        ids.append(r["id"])
-
-    created = 0
-    for i in range(0, len(docs), batch_size):
-        batch_docs = docs[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-        vecs = embed_texts(batch_docs)
-
-        for donor_id, doc, vec in zip(batch_ids, batch_docs, vecs):
-            stmt = text("""
-                INSERT INTO donor_embeddings (donor_id, embedding, doc)
-                VALUES (:donor_id, CAST(:embedding AS vector), :doc)
-                ON CONFLICT (donor_id) DO UPDATE SET
-                    embedding = EXCLUDED.embedding,
-                    doc = EXCLUDED.doc
-            """)
-            session.execute(stmt, {
-                "donor_id": donor_id,
-                "embedding": to_pgvector(vec),
-                "doc": doc
-            })
-            created += 1
-
-    session.commit()
-    return {"created": created}
-
-
-@router.post("/search/semantic")
+@router.post("/search/semantic", response_class=FastJSONResponse)
 def semantic_search(
     payload: dict = Body(..., example={
         "query": "foundations supporting early childhood education in California",
@@ -320,44 +353,61 @@ def semantic_search(
 ):
     """
     Semantic search donors using pgvector cosine distance. Optional filters: state, min/max assets.
+    ANN tuning (when the index exists): ef_search (hnsw) / probes (ivfflat); exact=true skips the index.
     """
     query = (payload.get("query") or "").strip()
     if not query:
         raise HTTPException(400, "Missing 'query'")
 
-    state = payload.get("state")
-    min_assets = payload.get("min_assets")
-    max_assets = payload.get("max_assets")
     limit = int(payload.get("limit") or 10)
+    qvec = embed_query(query)
+
+    rows = vector_search(
+        session, qvec, limit,
+        state=payload.get("state"),
+        min_assets=payload.get("min_assets"),
+        max_assets=payload.get("max_assets"),
+        ef_search=int(payload["ef_search"]) if payload.get("ef_search") else None,
+        probes=int(payload["probes"]) if payload.get("probes") else None,
+        exact=bool(payload.get("exact")),
+    )
+    return FastJSONResponse({"items": rows, "count": len(rows)})
 
-    qvec = embed_texts([query])[0]
-
-    where = ["1=1"]
-    params = {"qvec": to_pgvector(qvec), "limit": limit}
 
-    if state:
-        where.append("d.state = :state")
-        params["state"] = state
-    if min_assets is not None:
-        where.append("d.assets_total >= :min_assets")
-        params["min_assets"] = min_assets
-    if max_assets is not None:
-        where.append("d.assets_total <= :max_assets")
-        params["max_assets"] = max_assets
+@router.post("/search/hybrid", response_class=FastJSONResponse)
+def hybrid(
+    payload: dict = Body(..., example={
+        "query": "early childhood education grants",
+        "state": "CA",
+        "limit": 10
+    }),
+    session = Depends(get_session),
+):
+    """
+    Keyword + semantic search fused with reciprocal rank fusion, in one query.
+    Optional: state, min/max assets, k (candidates per branch), rrf_k,
+    keyword_weight / vector_weight, ef_search / probes.
+    """
+    query = (payload.get("query") or "").strip()
+    if not query:
+        raise HTTPException(400, "Missing 'query'")
 
-    sql = text(f"""
-        SELECT d.id, d.name, d.state, d.city, d.mission,
-               d.assets_total, d.grants_total,
-               (de.embedding <=> CAST(:qvec AS vector)) AS distance,
-               d.website
-        FROM donor_embeddings de
-        JOIN donors d ON d.id = de.donor_id
-        WHERE {' AND '.join(where)}
-        ORDER BY distance ASC
-        LIMIT :limit
-    """)
-    rows = session.execute(sql, params).mappings().all()
-    return {"items": rows, "count": len(rows)}
+    limit = int(payload.get("limit") or 10)
+    qvec = embed_query(query)
+
+    rows = hybrid_search(
+        session, query, qvec, limit,
+        state=payload.get("state"),
+        min_assets=payload.get("min_assets"),
+        max_assets=payload.get("max_assets"),
+        k=int(payload.get("k") or 50),
+        rrf_k=int(payload.get("rrf_k") or RRF_K),
+        kw_weight=float(payload.get("keyword_weight", 1.0)),
+        vec_weight=float(payload.get("vector_weight", 1.0)),
+        ef_search=int(payload["ef_search"]) if payload.get("ef_search") else None,
+        probes=int(payload["probes"]) if payload.get("probes") else None,
+    )
+    return FastJSONResponse({"items": rows, "count": len(rows)})
 
 
 # --------------------------
@@ -365,236 +415,178 @@ def semantic_search(
 # --------------------------
 
 @router.post("/{id}/enrich")
-async def enrich_donor(id: int, session=Depends(get_session)):
-    donor = session.execute(text("SELECT * FROM donors WHERE id=:id"), {"id": id}).mappings().first()
-    if not donor:
-        raise HTTPException(404, "Donor not found")
-
-    domain = _to_domain(donor.get("website"))
-    if not domain:
-        return {"id": id, "enriched": False, "reason": "no website/domain on record"}
-
-    org = await enrich_org_by_domain(domain)
-    if not org:
-        return {"id": id, "enriched": False, "reason": "Apollo: no data / credits / invalid domain"}
-
-    stmt_apollo = text("""
-        INSERT INTO enrichments (donor_id, kind, source, url, raw)
-        VALUES (:donor_id, :kind, :source, :url, :raw)
-    """).bindparams(bindparam("raw", type_=JSONB))
+async def enrich_donor(
+    id: int,
+    bypass_cache: bool = Query(False, description="Ignore cached Apollo answers (the fresh ones are cached)"),
+    background: bool = Query(True, description="Queue as a job (default) or run inline"),
+    session=Depends(get_async_session),
+):
+    if background:
+        return await _submit_for_donor(session, "enrich", id, {"bypass_cache": bypass_cache})
+    try:
+        return await tasks.enrich_donor(session, id, bypass_cache=bypass_cache)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
 
-    session.execute(stmt_apollo, {
-        "donor_id": id,
-        "kind": "company_profile",
-        "source": "apollo",
-        "url": "https://api.apollo.io/v1/organizations/enrich",
-        "raw": json.dumps(org),
-    })
 
-    apollo_site = org.get("website_url") or org.get("domain")
-    if apollo_site and (donor.get("website") or "").lower() != apollo_site.lower():
-        session.execute(
-            text("UPDATE donors SET website=:w, updated_at=NOW() WHERE id=:id"),
-            {"w": apollo_site, "id": id}
-        )
-
-    top_people = (org.get("top_people") or [])[:5]
-    for p in top_people:
-        session.execute(text("""
-            INSERT INTO contacts (donor_id, name, title, email, linkedin_url, source)
-            VALUES (:donor_id, :name, :title, :email, :linkedin, :source)
-            ON CONFLICT DO NOTHING
-        """), {
-            "donor_id": id,
-            "name": p.get("name"),
-            "title": p.get("title"),
-            "email": p.get("email"),
-            "linkedin": p.get("linkedin_url"),
-            "source": "apollo",
-        })
+@router.post("/enrich/batch")
+async def enrich_batch(
+    limit: int = Query(5, ge=1, le=5000),
+    concurrency: int = Query(8, ge=1, le=64, description="Apollo lookups in flight (rate is capped separately)"),
+    bypass_cache: bool = Query(False, description="Ignore cached Apollo answers (the fresh ones are cached)"),
+    background: bool = Query(True, description="Queue as a job (default) or run inline"),
+    session=Depends(get_async_session),
+):
+    params = {"limit": limit, "concurrency": concurrency, "bypass_cache": bypass_cache}
+    if background:
+        return await session.run_sync(_submit, "enrich_batch", params, "enrich_batch")
+    return await tasks.enrich_batch(session, **params)
 
-    session.commit()
-    return {"id": id, "enriched": True, "contacts_added": len(top_people), "domain": domain}
 
+# --------------------------
+# crawling (Firecrawl)
+# --------------------------
 
-@router.post("/enrich/batch")
-async def enrich_batch(limit: int = Query(5, ge=1, le=25), session=Depends(get_session)):
-    to_enrich = session.execute(text("""
-        SELECT d.id, d.website
-        FROM donors d
-        WHERE d.website IS NOT NULL
-          AND NOT EXISTS (
-            SELECT 1 FROM enrichments e
-            WHERE e.donor_id = d.id AND e.kind = 'company_profile'
-          )
-        ORDER BY d.id
+@router.post("/{id}/crawl")
+async def crawl_donor_site(
+    id: int,
+    background: bool = Query(True, description="Queue as a job (default) or run inline"),
+    session=Depends(get_async_session),
+):
+    """
+    Crawl donor website (if present) and store a structured 'company_profile'
+    (Firecrawl extract), a few 'page_markdown' snapshots and light contacts.
+    See app.tasks.crawl_donor.
+    """
+    if background:
+        return await _submit_for_donor(session, "crawl", id)
+    try:
+        return await tasks.crawl_donor(session, id)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+
+
+@router.post("/crawl/local")
+async def crawl_sites_local(
+    limit: int = Query(100, ge=1, le=2000, description="How many donors with websites to crawl"),
+    concurrency: int = Query(32, ge=1, le=256, description="Global in-flight page fetches"),
+    per_domain: int = Query(2, ge=1, le=8, description="In-flight fetches per domain"),
+    delay: float = Query(1.0, ge=0, le=30, description="Seconds between requests to one domain"),
+    max_pages: int = Query(6, ge=1, le=50, description="Pages per site"),
+    session=Depends(get_async_session),
+):
+    """
+    Crawl many donor websites ourselves (no Firecrawl) over one shared frontier.
+    Stores one 'site_extract' enrichment per donor: emails, people, grant pages, pages checked.
+    Pages are revalidated against page_cache; sites where nothing changed are not re-inserted.
+    """
+    rows = (await session.execute(text("""
+        SELECT id, website FROM donors
+        WHERE website IS NOT NULL
+        ORDER BY assets_total DESC NULLS LAST, id
         LIMIT :limit
-    """), {"limit": limit}).mappings().all()
+    """), {"limit": limit})).mappings().all()
+
+    sites = {r["id"]: normalize_site(r["website"]) for r in rows}
+    cache = await session.run_sync(PageCache.load, [s for s in sites.values() if s])
+    scheduler = CrawlScheduler(
+        concurrency=concurrency, per_domain=per_domain, delay=delay, max_pages_per_site=max_pages,
+        cache=cache,
+    )
+    results = await scheduler.crawl([s for s in sites.values() if s])
 
-    results = []
-    stmt_batch = text("""
+    stmt = text("""
         INSERT INTO enrichments (donor_id, kind, source, url, raw)
         VALUES (:donor_id, :kind, :source, :url, :raw)
     """).bindparams(bindparam("raw", type_=JSONB))
 
-    for row in to_enrich:
-        donor_id = row["id"]
-        domain = _to_domain(row["website"])
-        if not domain:
-            results.append({"id": donor_id, "enriched": False, "reason": "bad website"})
+    items = []
+    for donor_id, site in sites.items():
+        res = results.get(site) if site else None
+        if not res or not res["pages_checked"]:
+            items.append({"id": donor_id, "crawled": False})
             continue
-
-        org = await enrich_org_by_domain(domain)
-        if not org:
-            results.append({"id": donor_id, "enriched": False, "reason": "apollo: no data/credits"})
+        # donors sharing a website share `res`: read it, don't mutate it
+        if not res["changed"]:
+            items.append({"id": donor_id, "crawled": True, "unchanged": True, "pages": len(res["pages_checked"])})
             continue
-
-        session.execute(stmt_batch, {
+        await session.execute(stmt, {
             "donor_id": donor_id,
-            "kind": "company_profile",
-            "source": "apollo",
-            "url": "https://api.apollo.io/v1/organizations/enrich",
-            "raw": json.dumps(org),
+            "kind": "site_extract",
+            "source": "scraper",
+            "url": site,
+            "raw": json.dumps({k: v for k, v in res.items() if k != "changed"}),
+        })
+        items.append({
+            "id": donor_id,
+            "crawled": True,
+            "pages": len(res["pages_checked"]),
+            "emails": len(res["emails"]),
+            "opportunities": len(res["opportunities"]),
         })
 
-        apollo_site = org.get("website_url") or org.get("domain")
-        if apollo_site:
-            session.execute(
-                text("UPDATE donors SET website=:w, updated_at=NOW() WHERE id=:id"),
-                {"w": apollo_site, "id": donor_id}
-            )
+    await session.run_sync(cache.save)
+    await session.commit()
+    return {"count": len(items), "stats": scheduler.stats, "cache": cache.stats, "items": items}
 
-        results.append({"id": donor_id, "enriched": True, "domain": domain})
 
-    session.commit()
-    return {"count": len(results), "enriched": results}
+@router.post("/crawl/batch")
+async def crawl_batch(
+    limit: int = Query(500, ge=1, le=5000, description="How many donors with websites to crawl"),
+    pages_per_donor: int = Query(3, ge=1, le=12, description="Candidate pages per donor"),
+    wait: bool = Query(False, description="Poll to completion before responding"),
+    session=Depends(get_async_session),
+):
+    """
+    Submit many donors' candidate pages as a few Firecrawl batch-scrape jobs.
+    Jobs are persisted and polled in the background (or inline with wait=true);
+    finished pages land in enrichments as 'page_markdown' while the job runs.
+    """
+    rows = (await session.execute(text("""
+        SELECT id, website FROM donors
+        WHERE website IS NOT NULL
+        ORDER BY assets_total DESC NULLS LAST, id
+        LIMIT :limit
+    """), {"limit": limit})).mappings().all()
 
+    targets: dict[int, list[str]] = {}
+    for r in rows:
+        norm = normalize_site(r["website"])
+        if norm:
+            targets[r["id"]] = candidate_pages_for(urlparse(norm).netloc)[:pages_per_donor]
+    if not targets:
+        return {"jobs": [], "donors": 0, "urls": 0}
 
-# --------------------------
-# crawling (Firecrawl)
-# --------------------------
+    job_ids = await batch_crawl.submit(session, targets)
+    if not job_ids:
+        raise HTTPException(502, "Firecrawl batch submission failed (API key / plan?)")
 
-@router.post("/{id}/crawl")
-async def crawl_donor_site(id: int, session=Depends(get_session)):
-    """
-    Crawl donor website (if present) and store:
-      - a structured 'company_profile' enrichment (Firecrawl extract)
-      - a few markdown snapshots as 'page_markdown'
-      - (light) contacts from structured payload
-    """
-    donor = session.execute(text("SELECT * FROM donors WHERE id=:id"), {"id": id}).mappings().first()
-    if not donor:
-        raise HTTPException(404, "Donor not found")
+    out = {"jobs": job_ids, "donors": len(targets), "urls": sum(len(u) for u in targets.values())}
+    if wait:
+        out["results"] = [await batch_crawl.poll_job(session, job_id) for job_id in job_ids]
+    else:
+        for job_id in job_ids:
+            batch_crawl.start_polling(job_id)
+    return out
 
-    website_raw = donor.get("website")
-    norm = _normalize_site(website_raw)
-    if not norm:
-        return {"id": id, "crawled": False, "reason": "no website/domain on donor"}
-
-    parsed = urlparse(norm)
-    domain = (parsed.netloc or parsed.path).lower()
-    if not domain:
-        return {"id": id, "crawled": False, "reason": "invalid domain"}
-
-    pages = _candidate_pages_for(domain)[:6]
-
-    schema = {
-        "type": "object",
-        "properties": {
-            "org_name": {"type": "string"},
-            "about": {"type": "string"},
-            "mission": {"type": "string"},
-            "program_areas": {"type": "array", "items": {"type": "string"}},
-            "grantmaking": {"type": "string"},
-            "apply_instructions": {"type": "string"},
-            "contacts": {
-                "type": "object",
-                "properties": {
-                    "emails": {"type": "array", "items": {"type": "string"}},
-                    "phones": {"type": "array", "items": {"type": "string"}},
-                    "address": {"type": "string"},
-                }
-            },
-            "leadership": {
-                "type": "array",
-                "items": {"type": "object", "properties": {
-                    "name": {"type": "string"}, "title": {"type": "string"}
-                }}
-            }
-        },
-        "additionalProperties": True
-    }
 
-    prompt = (
-        "From these pages, extract a compact profile for a grantmaking foundation: "
-        "org_name, 1–2 paragraph about, mission in 1 sentence, up to 6 program_areas, "
-        "grantmaking summary, apply_instructions (deadlines/eligibility), contacts (emails/phones/address), "
-        "and leadership list with name/title when obvious."
-    )
+@router.get("/crawl/batch")
+def crawl_batch_jobs(limit: int = Query(50, ge=1, le=500), session=Depends(get_session)):
+    return {"jobs": batch_crawl.list_jobs(session, limit), "polling": batch_crawl.polling()}
 
-    structured = await extract_structured(pages, prompt=prompt, schema=schema)
-
-    # Insert structured profile (as JSONB)
-    if structured:
-        stmt_struct = text("""
-            INSERT INTO enrichments (donor_id, kind, source, url, raw)
-            VALUES (:donor_id, :kind, :source, :url, :raw)
-        """).bindparams(bindparam("raw", type_=JSONB))
-
-        session.execute(stmt_struct, {
-            "donor_id": id,
-            "kind": "company_profile",
-            "source": "firecrawl",
-            "url": ", ".join(pages),
-            "raw": json.dumps(structured),
-        })
 
-        # light contacts from leadership
-        leadership = (structured.get("leadership") or []) if isinstance(structured, dict) else []
-        seen = set()
-        for p in leadership:
-            name = (p or {}).get("name")
-            title = (p or {}).get("title")
-            if not name:
-                continue
-            key = (name or "", title or "")
-            if key in seen:
-                continue
-            seen.add(key)
-            session.execute(text("""
-                INSERT INTO contacts (donor_id, name, title, source)
-                VALUES (:donor_id, :name, :title, :source)
-                ON CONFLICT DO NOTHING
-            """), {"donor_id": id, "name": name, "title": title, "source": "firecrawl"})
-
-    # Snapshot up to 3 pages of markdown
-    saved_pages: list[str] = []
-    stmt_md = text("""
-        INSERT INTO enrichments (donor_id, kind, source, url, raw)
-        VALUES (:donor_id, :kind, :source, :url, :raw)
-    """).bindparams(bindparam("raw", type_=JSONB))
+@router.post("/crawl/batch/resume")
+async def crawl_batch_resume(session=Depends(get_async_session)):
+    """Resume polling for persisted jobs that have not finished (e.g. after a restart)."""
+    return {"resumed": await batch_crawl.resume(session)}
 
-    for url in pages[:3]:
-        page = await scrape_markdown(url)
-        if page and page.get("data", {}).get("markdown"):
-            md = page["data"]["markdown"][:20000]
-            session.execute(stmt_md, {
-                "donor_id": id,
-                "kind": "page_markdown",
-                "source": "firecrawl",
-                "url": url,
-                "raw": json.dumps({"url": url, "markdown": md}),
-            })
-            saved_pages.append(url)
-
-    session.commit()
-    return {
-        "id": id,
-        "crawled": True,
-        "domain": domain,
-        "structured": bool(structured),
-        "pages_saved": saved_pages,
-    }
+
+@router.get("/crawl/batch/{job_id}")
+def crawl_batch_job(job_id: str, session=Depends(get_session)):
+    job = batch_crawl.get_job(session, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return {**job, "polling": job_id in batch_crawl.polling()}
 
 
 # --------------------------
@@ -603,57 +595,16 @@ async def crawl_donor_site(id: int, session=Depends(get_session)):
 
 @router.post("/websites/backfill_apollo")
 async def backfill_websites_apollo(
-    limit: int = Query(12, ge=1, le=50),
-    session = Depends(get_session),
+    limit: int = Query(12, ge=1, le=5000),
+    concurrency: int = Query(8, ge=1, le=64, description="Apollo lookups in flight (rate is capped separately)"),
+    bypass_cache: bool = Query(False, description="Ignore cached Apollo answers (the fresh ones are cached)"),
+    background: bool = Query(True, description="Queue as a job (default) or run inline"),
+    session = Depends(get_async_session),
 ):
     """
     For donors missing website, try Apollo organizations search by name and set website/domain.
     """
-    rows = session.execute(text("""
-        SELECT id, name, state
-        FROM donors
-        WHERE website IS NULL
-        ORDER BY assets_total DESC NULLS LAST, id
-        LIMIT :limit
-    """), {"limit": limit}).mappings().all()
-
-    updated: list[dict] = []
-    stmt_websrc = text("""
-        INSERT INTO enrichments (donor_id, kind, source, url, raw)
-        VALUES (:id, :kind, :source, :url, :raw)
-    """).bindparams(bindparam("raw", type_=JSONB))
-
-    for r in rows:
-        donor_id = r["id"]
-        name = r["name"]
-        state = r["state"]
-
-        org = await search_org_by_name(name, state)
-        if not org:
-            updated.append({"id": donor_id, "updated": False, "reason": "apollo: no match"})
-            continue
-
-        # Apollo may give 'website_url' or 'domain'
-        site = (org.get("website_url") or org.get("domain") or "").strip()
-        if site.startswith("http://") or site.startswith("https://"):
-            site = site.split("://", 1)[1]
-        site = site.rstrip("/")
-
-        if site:
-            session.execute(
-                text("UPDATE donors SET website=:w, updated_at=NOW() WHERE id=:id"),
-                {"w": site, "id": donor_id}
-            )
-
-        session.execute(stmt_websrc, {
-            "id": donor_id,
-            "kind": "website_source",
-            "source": "apollo",
-            "url": "https://api.apollo.io/v1/organizations/search",
-            "raw": json.dumps({"query": {"name": name, "state": state}, "org": org}),
-        })
-
-        updated.append({"id": donor_id, "updated": bool(site), "website": site or None})
-
-    session.commit()
-    return {"backfilled": len(updated), "items": updated}
+    params = {"limit": limit, "concurrency": concurrency, "bypass_cache": bypass_cache}
+    if background:
+        return await session.run_sync(_submit, "backfill_websites", params, "backfill_websites")
+    return await tasks.backfill_websites(session, **params)
@@ -0,0 +1,38 @@
+# app/routes/jobs.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app import jobs
+from app.db import get_session
+
+router = APIRouter()
+
+
+@router.get("")
+def list_jobs(
+    status: str | None = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$"),
+    kind: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    session=Depends(get_session),
+):
+    return {"items": jobs.list_jobs(session, status, kind, limit)}
+
+
+@router.get("/{job_id}")
+def job_status(job_id: int, session=Depends(get_session)):
+    """
+    Status / progress / result of a queued job. Poll until status is
+    succeeded, failed or cancelled.
+    """
+    job = jobs.get_job(session, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: int, session=Depends(get_session)):
+    if not jobs.cancel(session, job_id):
+        raise HTTPException(409, "Only queued jobs can be cancelled")
+    return {"id": job_id, "status": "cancelled"}
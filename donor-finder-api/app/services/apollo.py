@@ -1,9 +1,19 @@
+import asyncio
 import os
 import httpx
 
+from app import apollo_cache
+from app.http_clients import get_client
+from app.rate_limit import TokenBucket, backoff_delay, retry_after_seconds
+
 APOLLO_API_KEY = os.getenv("APOLLO_API_KEY")
 BASE_URL = "https://api.apollo.io/v1"
 
+# size these to the Apollo plan's quota; every request (retries included) takes a token
+APOLLO_RATE_PER_MIN = float(os.getenv("APOLLO_RATE_PER_MIN", "100"))
+APOLLO_BURST = int(os.getenv("APOLLO_BURST", "5"))
+APOLLO_MAX_RETRIES = int(os.getenv("APOLLO_MAX_RETRIES", "4"))
+
 if not APOLLO_API_KEY:
     print("[WARN] APOLLO_API_KEY is not set. Apollo enrichment will no-op.")
 
@@ -12,29 +22,85 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
-async def enrich_org_by_domain(domain: str) -> dict | None:
-    """Apollo org enrichment by domain."""
+bucket = TokenBucket(rate=APOLLO_RATE_PER_MIN / 60.0, burst=APOLLO_BURST)
+stats = {"requests": 0, "rate_limited": 0, "retries": 0, "failures": 0}
+
+async def _post(url: str, payload: dict, timeout: float | None = None) -> httpx.Response | None:
+    """
+    POST under the shared token bucket. 429s pause the bucket for Retry-After;
+    429/5xx/transport errors retry with jittered exponential backoff.
+    Returns the final response (any status) or None if every attempt failed.
+    """
+    kwargs = {"headers": HEADERS, "json": payload}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    for attempt in range(APOLLO_MAX_RETRIES + 1):
+        await bucket.acquire()
+        stats["requests"] += 1
+        try:
+            r = await get_client("apollo").post(url, **kwargs)
+        except httpx.HTTPError:
+            r = None
+        limited = r is not None and r.status_code == 429
+        if r is not None and r.status_code < 500 and not limited:
+            return r
+        if limited:
+            stats["rate_limited"] += 1
+        if attempt == APOLLO_MAX_RETRIES:
+            break
+        stats["retries"] += 1
+        if limited:
+            # everyone waits; the next acquire() blocks until the pause ends
+            bucket.pause(retry_after_seconds(r.headers.get("retry-after"), 1.0 + backoff_delay(attempt)))
+        else:
+            await asyncio.sleep(backoff_delay(attempt))
+    stats["failures"] += 1
+    return r
+
+def rate_stats() -> dict:
+    return {**stats, "bucket": bucket.stats()}
+
+async def enrich_org_by_domain(domain: str, bypass_cache: bool = False) -> dict | None:
+    """
+    Apollo org enrichment by domain. Answers (including "no such org") are
+    cached per normalized domain; bypass_cache forces a fresh call.
+    """
     if not APOLLO_API_KEY:
         return None
+    key = apollo_cache.domain_key(domain)
+    if not bypass_cache:
+        cached = await apollo_cache.get("enrich", key)
+        if not apollo_cache.is_miss(cached):
+            return cached
     url = f"{BASE_URL}/organizations/enrich"
     payload = {"domain": domain}
-    async with httpx.AsyncClient(timeout=30) as client:
-        try:
-            r = await client.post(url, headers=HEADERS, json=payload)
-            if r.status_code != 200:
-                return None
-            data = r.json()
-            return data.get("organization")
-        except httpx.HTTPError:
+    try:
+        r = await _post(url, payload)
+        if r is None:
+            return None
+        if r.status_code != 200:
+            if r.status_code in (404, 422):  # unknown / invalid domain: a real "no match"
+                await apollo_cache.put("enrich", key, None)
             return None
+        data = r.json()
+        org = data.get("organization")
+        await apollo_cache.put("enrich", key, org)
+        return org
+    except ValueError:
+        return None
 
-async def search_org_by_name(name: str, state: str | None = None) -> dict | None:
+async def search_org_by_name(name: str, state: str | None = None, bypass_cache: bool = False) -> dict | None:
     """
     Search Apollo organizations by name (optionally hint by state).
-    Returns best hit or None.
+    Returns best hit or None. Cached per (normalized name, state).
     """
     if not APOLLO_API_KEY:
         return None
+    key = apollo_cache.name_key(name, state)
+    if not bypass_cache:
+        cached = await apollo_cache.get("search", key)
+        if not apollo_cache.is_miss(cached):
+            return cached
     url = f"{BASE_URL}/organizations/search"
     payload = {
         "q_organization_name": name,
@@ -44,16 +110,15 @@ async def search_org_by_name(name: str, state: str | None = None) -> dict | None
     if state:
         payload["person_locations"] = [state]  # weak heuristic
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        try:
-            r = await client.post(url, headers=HEADERS, json=payload)
-            if r.status_code != 200:
-                return None
-            data = r.json()
-            orgs = (data.get("organizations") or []) \
-                or (data.get("organizations_page") or {}).get("organizations", [])
-            if not orgs:
-                return None
-            return orgs[0]
-        except httpx.HTTPError:
+    try:
+        r = await _post(url, payload)
+        if r is None or r.status_code != 200:
             return None
+        data = r.json()
+        orgs = (data.get("organizations") or []) \
+            or (data.get("organizations_page") or {}).get("organizations", [])
+        org = orgs[0] if orgs else None
+        await apollo_cache.put("search", key, org)
+        return org
+    except ValueError:
+        return None
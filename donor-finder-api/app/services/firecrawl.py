@@ -2,14 +2,50 @@
 from __future__ import annotations
 import os
 import json
+import time
 import httpx
 
+from app.http_clients import get_client
+
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
-BASE = "https://api.firecrawl.dev/v1"
+# override to point at a local mock (scripts/mock_firecrawl.py) or a self-hosted instance
+BASE = os.getenv("FIRECRAWL_BASE_URL", "https://api.firecrawl.dev/v1").rstrip("/")
+# how long a "this endpoint works / doesn't work on our plan" verdict is trusted
+CAPABILITY_TTL = float(os.getenv("FIRECRAWL_CAPABILITY_TTL", "3600"))
 
 if not FIRECRAWL_API_KEY:
     print("[WARN] FIRECRAWL_API_KEY is not set. Firecrawl calls will NO-OP.")
 
+# statuses that mean the endpoint is unavailable to us (plan/version), not a transient failure
+_UNSUPPORTED_STATUSES = {402, 403, 404, 405, 501}
+
+# endpoint -> (supported, checked_at)
+_capabilities: dict[str, tuple[bool, float]] = {}
+
+def endpoint_supported(endpoint: str) -> bool | None:
+    """True/False if known within CAPABILITY_TTL, None if never tried (or expired)."""
+    known = _capabilities.get(endpoint)
+    if not known or time.monotonic() - known[1] > CAPABILITY_TTL:
+        return None
+    return known[0]
+
+def _record(endpoint: str, status: int) -> None:
+    if status == 200:
+        _capabilities[endpoint] = (True, time.monotonic())
+    elif status in _UNSUPPORTED_STATUSES:
+        _capabilities[endpoint] = (False, time.monotonic())
+    # 429 / 5xx / timeouts say nothing about the plan
+
+def capabilities() -> dict:
+    now = time.monotonic()
+    return {
+        ep: {"supported": ok, "age_s": round(now - at, 1), "expired": now - at > CAPABILITY_TTL}
+        for ep, (ok, at) in _capabilities.items()
+    }
+
+def reset_capabilities() -> None:
+    _capabilities.clear()
+
 def _headers() -> dict:
     return {
         "Authorization": f"Bearer {FIRECRAWL_API_KEY or ''}",
@@ -31,16 +67,16 @@ async def extract_structured(urls: list[str], prompt: str, schema: dict) -> dict
     }
 
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(f"{BASE}/extract", headers=_headers(), json=payload)
-            if r.status_code != 200:
-                print(f"[Firecrawl] /extract non-200: {r.status_code} body={r.text[:500]}")
-                return None
-            data = r.json()
-            # Firecrawl returns {"success":true, "id": "...", "data": {...}} OR {"success":true,"data":[...]}
-            # Normalize to one dict for our UI:
-            # Prefer "data" if present; else pass the whole body (so we can see it).
-            return data.get("data") or data
+        r = await get_client("firecrawl").post(f"{BASE}/extract", headers=_headers(), json=payload)
+        _record("extract", r.status_code)
+        if r.status_code != 200:
+            print(f"[Firecrawl] /extract non-200: {r.status_code} body={r.text[:500]}")
+            return None
+        data = r.json()
+        # Firecrawl returns {"success":true, "id": "...", "data": {...}} OR {"success":true,"data":[...]}
+        # Normalize to one dict for our UI:
+        # Prefer "data" if present; else pass the whole body (so we can see it).
+        return data.get("data") or data
     except httpx.HTTPError as e:
         print(f"[Firecrawl] /extract error: {e}")
         return None
@@ -51,6 +87,7 @@ async def scrape_markdown(url: str) -> dict | None:
     Firecrawl's public API exposes /crawl for site capture; we’ll ask for markdown.
     If your plan only supports /extract, keep using extract on single URL
     and pull page text from the result.
+    Endpoints known to be unsupported (see endpoint_supported) are skipped.
     """
     if not FIRECRAWL_API_KEY:
         return None
@@ -65,9 +102,10 @@ async def scrape_markdown(url: str) -> dict | None:
         "limit": 1
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(f"{BASE}/crawl", headers=_headers(), json=crawl_payload)
+    if endpoint_supported("crawl") is not False:
+        try:
+            r = await get_client("firecrawl").post(f"{BASE}/crawl", headers=_headers(), json=crawl_payload)
+            _record("crawl", r.status_code)
             if r.status_code == 200:
                 data = r.json()
                 # Normalize shape to {"data":{"markdown": "..."}}
@@ -85,8 +123,11 @@ async def scrape_markdown(url: str) -> dict | None:
                 return {"data": {"markdown": json.dumps(data)[:20000]}}
             else:
                 print(f"[Firecrawl] /crawl non-200: {r.status_code} body={r.text[:400]}")
-    except httpx.HTTPError as e:
-        print(f"[Firecrawl] /crawl error: {e}")
+        except httpx.HTTPError as e:
+            print(f"[Firecrawl] /crawl error: {e}")
+
+    if endpoint_supported("extract") is False:
+        return None
 
     # Fallback: /extract with simple schema to pull page text
     try:
@@ -100,17 +141,59 @@ async def scrape_markdown(url: str) -> dict | None:
             },
             "prompt": "Return the primary page content as plain text/markdown in the 'markdown' field.",
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(f"{BASE}/extract", headers=_headers(), json=payload)
-            if r.status_code != 200:
-                print(f"[Firecrawl] fallback /extract non-200: {r.status_code} body={r.text[:400]}")
-                return None
-            data = r.json()
-            md = (data.get("data") or {}).get("markdown")
-            if not md:
-                # last resort: stash whole body so we see something
-                return {"data": {"markdown": json.dumps(data)[:20000]}}
-            return {"data": {"markdown": md}}
+        r = await get_client("firecrawl").post(f"{BASE}/extract", headers=_headers(), json=payload)
+        _record("extract", r.status_code)
+        if r.status_code != 200:
+            print(f"[Firecrawl] fallback /extract non-200: {r.status_code} body={r.text[:400]}")
+            return None
+        data = r.json()
+        md = (data.get("data") or {}).get("markdown")
+        if not md:
+            # last resort: stash whole body so we see something
+            return {"data": {"markdown": json.dumps(data)[:20000]}}
+        return {"data": {"markdown": md}}
     except httpx.HTTPError as e:
         print(f"[Firecrawl] fallback /extract error: {e}")
         return None
+
+async def batch_scrape_submit(urls: list[str]) -> str | None:
+    """
+    Submits an asynchronous /batch/scrape job (markdown for every URL).
+    Returns the Firecrawl job id, or None on error.
+    """
+    if not FIRECRAWL_API_KEY or endpoint_supported("batch_scrape") is False:
+        return None
+
+    payload = {
+        "urls": urls,
+        "formats": ["markdown"],
+        "onlyMainContent": True,
+        "ignoreInvalidURLs": True,
+    }
+    try:
+        r = await get_client("firecrawl").post(f"{BASE}/batch/scrape", headers=_headers(), json=payload)
+        _record("batch_scrape", r.status_code)
+        if r.status_code != 200:
+            print(f"[Firecrawl] /batch/scrape non-200: {r.status_code} body={r.text[:400]}")
+            return None
+        return r.json().get("id")
+    except httpx.HTTPError as e:
+        print(f"[Firecrawl] /batch/scrape error: {e}")
+        return None
+
+async def batch_scrape_status(job_id: str, next_url: str | None = None) -> dict | None:
+    """
+    One page of a batch job's status: {status, total, completed, data: [...], next?}.
+    `next_url` follows the pagination link Firecrawl returns for large result sets.
+    """
+    if not FIRECRAWL_API_KEY:
+        return None
+    try:
+        r = await get_client("firecrawl").get(next_url or f"{BASE}/batch/scrape/{job_id}", headers=_headers())
+        if r.status_code != 200:
+            print(f"[Firecrawl] batch status non-200: {r.status_code} body={r.text[:400]}")
+            return None
+        return r.json()
+    except httpx.HTTPError as e:
+        print(f"[Firecrawl] batch status error: {e}")
+        return None
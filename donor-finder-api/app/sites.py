@@ -0,0 +1,50 @@
+"""
+Donor website helpers: bare domains, normalized site URLs and the candidate
+pages we crawl for a foundation.
+"""
+from __future__ import annotations
+from urllib.parse import urlparse
+
+
+def to_domain(website: str | None) -> str | None:
+    """Accepts 'ucla.edu' or 'https://ucla.edu/…' and returns bare domain like 'ucla.edu'."""
+    if not website:
+        return None
+    w = website.strip()
+    if "://" not in w:
+        return w.lower()
+    parsed = urlparse(w)
+    host = (parsed.netloc or parsed.path).lower().strip("/")
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_site(website: str | None) -> str | None:
+    """Return normalized https URL like 'https://ucla.edu' from bare or full input."""
+    if not website:
+        return None
+    w = website.strip()
+    if "://" not in w:
+        w = f"https://{w}"
+    parsed = urlparse(w)
+    host = (parsed.netloc or parsed.path).lower().strip("/")
+    if not host:
+        return None
+    return f"https://{host}"
+
+
+def candidate_pages_for(domain: str) -> list[str]:
+    base = f"https://{domain}"
+    return [
+        base,
+        f"{base}/about",
+        f"{base}/about-us",
+        f"{base}/mission",
+        f"{base}/team",
+        f"{base}/leadership",
+        f"{base}/people",
+        f"{base}/grants",
+        f"{base}/grantmaking",
+        f"{base}/apply",
+        f"{base}/funding",
+        f"{base}/contact",
+    ]
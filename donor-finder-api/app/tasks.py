@@ -0,0 +1,400 @@
+"""
+Long-running donor operations: ProPublica ingest, Apollo enrichment,
+Firecrawl crawls, website backfill and embedding builds.
+
+Routes either run these inline (background=false) or enqueue them as jobs
+that app/worker.py executes by kind (TASKS). Each takes the DB session (an
+AsyncSession for the async tasks, a sync Session for build_embeddings) plus
+its parameters and returns a JSON-serializable result; `progress`, when
+given, is awaited with partial counts. jobs.PermanentJobError (e.g.
+DonorNotFound) means the input is bad and the job is not retried; any other
+error goes through the worker's backoff.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+import httpx
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app import apollo_batch, jobs
+from app.crawl import fetch_response
+from app.ingest import run_ingest, run_refresh
+from app.page_cache import PageCache
+from app.services.apollo import enrich_org_by_domain
+from app.services.firecrawl import scrape_markdown, extract_structured
+from app.sites import candidate_pages_for, normalize_site, to_domain
+from app.vector_store import build_missing, rebuild_incremental
+
+Progress = Callable[[dict], Awaitable[None]]
+
+
+class DonorNotFound(jobs.PermanentJobError, LookupError):
+    pass
+
+# donors per Apollo executor call in batch tasks (one progress update each)
+PROGRESS_CHUNK = 100
+
+
+async def ingest(
+    session,
+    state: str = "CA",
+    ntee_major: int = 2,
+    limit: int = 35,
+    concurrency: int = 8,
+    batch_size: int = 50,
+    prefetch_pages: int = 2,
+    refresh: bool = False,
+    recheck_days: float = 7.0,
+    progress: Progress | None = None,
+) -> dict:
+    if refresh:
+        result = await run_refresh(
+            session, state, ntee_major, limit,
+            concurrency=concurrency, batch_size=batch_size, prefetch_pages=prefetch_pages,
+            recheck_days=recheck_days,
+        )
+        return {"refresh": True, "state": state, "ntee_major": ntee_major, **result}
+    result = await run_ingest(
+        session, state, ntee_major, limit,
+        concurrency=concurrency, batch_size=batch_size, prefetch_pages=prefetch_pages,
+    )
+    return {"added": result["added"], "state": state, "ntee_major": ntee_major, "stats": result["stats"]}
+
+
+async def _clear_needs_enrichment(session, ids: list[int]) -> None:
+    # set by incremental refreshes when a donor changed upstream
+    if ids:
+        await session.execute(text("""
+            UPDATE donors SET needs_enrichment = FALSE WHERE id = ANY(:ids) AND needs_enrichment
+        """), {"ids": ids})
+
+
+async def enrich_donor(session, id: int, bypass_cache: bool = False, progress: Progress | None = None) -> dict:
+    donor = (await session.execute(text("SELECT * FROM donors WHERE id=:id"), {"id": id})).mappings().first()
+    if not donor:
+        raise DonorNotFound("Donor not found")
+
+    domain = to_domain(donor.get("website"))
+    if not domain:
+        return {"id": id, "enriched": False, "reason": "no website/domain on record"}
+
+    org = await enrich_org_by_domain(domain, bypass_cache)
+    if not org:
+        return {"id": id, "enriched": False, "reason": "Apollo: no data / credits / invalid domain"}
+
+    stmt_apollo = text("""
+        INSERT INTO enrichments (donor_id, kind, source, url, raw)
+        VALUES (:donor_id, :kind, :source, :url, :raw)
+    """).bindparams(bindparam("raw", type_=JSONB))
+
+    await session.execute(stmt_apollo, {
+        "donor_id": id,
+        "kind": "company_profile",
+        "source": "apollo",
+        "url": "https://api.apollo.io/v1/organizations/enrich",
+        "raw": json.dumps(org),
+    })
+
+    apollo_site = org.get("website_url") or org.get("domain")
+    if apollo_site and (donor.get("website") or "").lower() != apollo_site.lower():
+        await session.execute(
+            text("UPDATE donors SET website=:w, updated_at=NOW() WHERE id=:id"),
+            {"w": apollo_site, "id": id}
+        )
+
+    top_people = (org.get("top_people") or [])[:5]
+    for p in top_people:
+        await session.execute(text("""
+            INSERT INTO contacts (donor_id, name, title, email, linkedin_url, source)
+            VALUES (:donor_id, :name, :title, :email, :linkedin, :source)
+            ON CONFLICT DO NOTHING
+        """), {
+            "donor_id": id,
+            "name": p.get("name"),
+            "title": p.get("title"),
+            "email": p.get("email"),
+            "linkedin": p.get("linkedin_url"),
+            "source": "apollo",
+        })
+
+    await _clear_needs_enrichment(session, [id])
+    await session.commit()
+    return {"id": id, "enriched": True, "contacts_added": len(top_people), "domain": domain}
+
+
+async def enrich_batch(
+    session, limit: int = 5, concurrency: int = 8, bypass_cache: bool = False, progress: Progress | None = None,
+) -> dict:
+    to_enrich = (await session.execute(text("""
+        SELECT d.id, d.website
+        FROM donors d
+        WHERE d.website IS NOT NULL
+          AND (d.needs_enrichment OR NOT EXISTS (
+            SELECT 1 FROM enrichments e
+            WHERE e.donor_id = d.id AND e.kind = 'company_profile'
+          ))
+        ORDER BY d.id
+        LIMIT :limit
+    """), {"limit": limit})).mappings().all()
+
+    results, donors = [], []
+    for row in to_enrich:
+        domain = to_domain(row["website"])
+        if not domain:
+            results.append({"id": row["id"], "enriched": False, "reason": "bad website"})
+        else:
+            donors.append((row["id"], domain))
+
+    stats: dict = {}
+    for i in range(0, len(donors), PROGRESS_CHUNK):
+        out = await apollo_batch.enrich_by_domain(
+            session, donors[i:i + PROGRESS_CHUNK], concurrency=concurrency, bypass_cache=bypass_cache,
+        )
+        results.extend(out["results"])
+        await _clear_needs_enrichment(session, [r["id"] for r in out["results"] if r["enriched"]])
+        await session.commit()
+        for k, v in out["stats"].items():
+            stats[k] = round(stats.get(k, 0) + v, 3)
+        if progress:
+            await progress({"done": min(i + PROGRESS_CHUNK, len(donors)), "total": len(donors)})
+    return {"count": len(results), "enriched": results, "stats": stats}
+
+
+async def crawl_donor(session, id: int, progress: Progress | None = None) -> dict:
+    """
+    Crawl donor website (if present) and store:
+      - a structured 'company_profile' enrichment (Firecrawl extract)
+      - a few markdown snapshots as 'page_markdown'
+      - (light) contacts from structured payload
+    Candidate pages are revalidated first (conditional GET + content hash via
+    page_cache); unchanged pages are not re-sent to Firecrawl or re-inserted.
+    The structured extract and the page scrapes run concurrently; `timings`
+    reports each stage in seconds.
+    """
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    donor = (await session.execute(text("SELECT * FROM donors WHERE id=:id"), {"id": id})).mappings().first()
+    if not donor:
+        raise DonorNotFound("Donor not found")
+
+    website_raw = donor.get("website")
+    norm = normalize_site(website_raw)
+    if not norm:
+        return {"id": id, "crawled": False, "reason": "no website/domain on donor"}
+
+    parsed = urlparse(norm)
+    domain = (parsed.netloc or parsed.path).lower()
+    if not domain:
+        return {"id": id, "crawled": False, "reason": "invalid domain"}
+
+    pages = candidate_pages_for(domain)[:6]
+
+    cache = await session.run_sync(PageCache.load, [domain])
+
+    async def _revalidate(url: str) -> bool:
+        try:
+            resp = await fetch_response(url, cache.conditional_headers(url))
+        except httpx.HTTPStatusError as e:
+            resp = e.response  # a stable 404 is still "unchanged"
+        except Exception:
+            return False
+        unchanged, _ = cache.check(url, resp)
+        return unchanged
+
+    t = time.perf_counter()
+    unchanged = dict(zip(pages, await asyncio.gather(*(_revalidate(u) for u in pages))))
+    timings["revalidate_s"] = round(time.perf_counter() - t, 3)
+    prior = (await session.execute(text("""
+        SELECT kind, url FROM enrichments
+        WHERE donor_id = :id AND source = 'firecrawl' AND kind IN ('company_profile', 'page_markdown')
+    """), {"id": id})).all()
+    has_profile = any(kind == "company_profile" for kind, _ in prior)
+    snapshotted = {url for kind, url in prior if kind == "page_markdown"}
+
+    schema = {
+        "type": "object",
+        "properties": {
+            "org_name": {"type": "string"},
+            "about": {"type": "string"},
+            "mission": {"type": "string"},
+            "program_areas": {"type": "array", "items": {"type": "string"}},
+            "grantmaking": {"type": "string"},
+            "apply_instructions": {"type": "string"},
+            "contacts": {
+                "type": "object",
+                "properties": {
+                    "emails": {"type": "array", "items": {"type": "string"}},
+                    "phones": {"type": "array", "items": {"type": "string"}},
+                    "address": {"type": "string"},
+                }
+            },
+            "leadership": {
+                "type": "array",
+                "items": {"type": "object", "properties": {
+                    "name": {"type": "string"}, "title": {"type": "string"}
+                }}
+            }
+        },
+        "additionalProperties": True
+    }
+
+    prompt = (
+        "From these pages, extract a compact profile for a grantmaking foundation: "
+        "org_name, 1–2 paragraph about, mission in 1 sentence, up to 6 program_areas, "
+        "grantmaking summary, apply_instructions (deadlines/eligibility), contacts (emails/phones/address), "
+        "and leadership list with name/title when obvious."
+    )
+
+    structured_reused = has_profile and all(unchanged.values())
+    # snapshot up to 3 pages of markdown, skipping ones we already hold unchanged
+    to_scrape = [u for u in pages[:3] if not (unchanged[u] and u in snapshotted)]
+    skipped_pages = [u for u in pages[:3] if u not in to_scrape]
+
+    async def _extract() -> dict | None:
+        if structured_reused:
+            return None
+        t = time.perf_counter()
+        try:
+            return await extract_structured(pages, prompt=prompt, schema=schema)
+        finally:
+            timings["extract_s"] = round(time.perf_counter() - t, 3)
+
+    async def _scrape() -> list:
+        t = time.perf_counter()
+        try:
+            return await asyncio.gather(*(scrape_markdown(u) for u in to_scrape))
+        finally:
+            timings["scrape_s"] = round(time.perf_counter() - t, 3)
+
+    t = time.perf_counter()
+    structured, scraped = await asyncio.gather(_extract(), _scrape())
+    timings["firecrawl_s"] = round(time.perf_counter() - t, 3)
+
+    t = time.perf_counter()
+    # Insert structured profile (as JSONB)
+    if structured:
+        stmt_struct = text("""
+            INSERT INTO enrichments (donor_id, kind, source, url, raw)
+            VALUES (:donor_id, :kind, :source, :url, :raw)
+        """).bindparams(bindparam("raw", type_=JSONB))
+
+        await session.execute(stmt_struct, {
+            "donor_id": id,
+            "kind": "company_profile",
+            "source": "firecrawl",
+            "url": ", ".join(pages),
+            "raw": json.dumps(structured),
+        })
+
+        # light contacts from leadership
+        leadership = (structured.get("leadership") or []) if isinstance(structured, dict) else []
+        seen = set()
+        for p in leadership:
+            name = (p or {}).get("name")
+            title = (p or {}).get("title")
+            if not name:
+                continue
+            key = (name or "", title or "")
+            if key in seen:
+                continue
+            seen.add(key)
+            await session.execute(text("""
+                INSERT INTO contacts (donor_id, name, title, source)
+                VALUES (:donor_id, :name, :title, :source)
+                ON CONFLICT DO NOTHING
+            """), {"donor_id": id, "name": name, "title": title, "source": "firecrawl"})
+
+    saved_pages: list[str] = []
+    stmt_md = text("""
+        INSERT INTO enrichments (donor_id, kind, source, url, raw)
+        VALUES (:donor_id, :kind, :source, :url, :raw)
+    """).bindparams(bindparam("raw", type_=JSONB))
+
+    for url, page in zip(to_scrape, scraped):
+        if page and page.get("data", {}).get("markdown"):
+            md = page["data"]["markdown"][:20000]
+            await session.execute(stmt_md, {
+                "donor_id": id,
+                "kind": "page_markdown",
+                "source": "firecrawl",
+                "url": url,
+                "raw": json.dumps({"url": url, "markdown": md}),
+            })
+            saved_pages.append(url)
+
+    await session.run_sync(cache.save)
+    await session.commit()
+    timings["db_s"] = round(time.perf_counter() - t, 3)
+    timings["total_s"] = round(time.perf_counter() - started, 3)
+    return {
+        "id": id,
+        "crawled": True,
+        "domain": domain,
+        "structured": bool(structured),
+        "structured_reused": structured_reused,
+        "pages_saved": saved_pages,
+        "pages_unchanged": skipped_pages,
+        "cache": cache.stats,
+        "timings": timings,
+    }
+
+
+async def backfill_websites(
+    session, limit: int = 12, concurrency: int = 8, bypass_cache: bool = False, progress: Progress | None = None,
+) -> dict:
+    rows = (await session.execute(text("""
+        SELECT id, name, state
+        FROM donors
+        WHERE website IS NULL
+        ORDER BY assets_total DESC NULLS LAST, id
+        LIMIT :limit
+    """), {"limit": limit})).mappings().all()
+    donors = [dict(r) for r in rows]
+
+    results, stats = [], {}
+    for i in range(0, len(donors), PROGRESS_CHUNK):
+        out = await apollo_batch.backfill_by_name(
+            session, donors[i:i + PROGRESS_CHUNK], concurrency=concurrency, bypass_cache=bypass_cache,
+        )
+        results.extend(out["results"])
+        for k, v in out["stats"].items():
+            stats[k] = round(stats.get(k, 0) + v, 3)
+        if progress:
+            await progress({"done": min(i + PROGRESS_CHUNK, len(donors)), "total": len(donors)})
+    return {"backfilled": len(results), "items": results, "stats": stats}
+
+
+def build_embeddings(
+    session,
+    batch_size: int = 32,
+    max_rows: int = 200,
+    incremental: bool = False,
+    chunk_size: int = 1000,
+    after_id: int = 0,
+    progress: Progress | None = None,
+) -> dict:
+    if incremental:
+        return rebuild_incremental(
+            session, batch_size, chunk_size=chunk_size, max_rows=max_rows, after_id=after_id,
+        )
+
+    created = build_missing(session, batch_size, max_rows)
+    if not created:
+        return {"created": 0, "note": "No missing embeddings"}
+    return {"created": created}
+
+
+# job kind -> implementation; sync ones run on a thread in the worker
+TASKS: dict[str, Callable] = {
+    "ingest": ingest,
+    "enrich": enrich_donor,
+    "enrich_batch": enrich_batch,
+    "crawl": crawl_donor,
+    "backfill_websites": backfill_websites,
+    "build_embeddings": build_embeddings,
+}
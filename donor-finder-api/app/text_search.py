@@ -0,0 +1,52 @@
+"""
+Keyword search over donors.
+
+`donors.search_tsv` is a stored generated tsvector (name > mission > city
+weights) with a GIN index; a pg_trgm GIN index on `name` covers fuzzy and
+partial name matches. The last search token is treated as a prefix so
+search-as-you-type works without a sequential ILIKE scan.
+
+The list filter requires every word (AND). Hybrid search passes
+match_any=True instead: natural-language queries rarely contain only words
+that all appear in one donor, so any word matches (OR) and ts_rank_cd ranks
+donors covering more of them higher.
+"""
+from __future__ import annotations
+import re
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def prefix_tsquery(q: str, match_any: bool = False) -> str | None:
+    """
+    'early childhood edu' -> 'early & childhood & edu:*' (None if no word tokens);
+    with match_any: 'early | childhood | edu:*'.
+    """
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return None
+    tokens[-1] += ":*"
+    return (" | " if match_any else " & ").join(tokens)
+
+
+def keyword_filter(q: str, alias: str = "d", match_any: bool = False) -> tuple[str, str, dict]:
+    """
+    (WHERE fragment, relevance expression, params) for a keyword query.
+    Matches the full-text index or a trigram word-similarity hit on the name;
+    match_any ORs the words instead of requiring all of them.
+    """
+    p = f"{alias}." if alias else ""
+    tsq = prefix_tsquery(q, match_any)
+    params = {"kw_q": q.strip()}
+    if tsq is None:
+        return (
+            f"(:kw_q <% {p}name)",
+            f"word_similarity(:kw_q, {p}name)",
+            params,
+        )
+    params["kw_tsq"] = tsq
+    return (
+        f"({p}search_tsv @@ to_tsquery('english', :kw_tsq) OR :kw_q <% {p}name)",
+        f"(ts_rank_cd({p}search_tsv, to_tsquery('english', :kw_tsq)) + word_similarity(:kw_q, {p}name))",
+        params,
+    )
@@ -0,0 +1,305 @@
+"""
+DB side of donor embeddings: the embedded doc, bulk writes, rebuilds, the
+ANN index and vector search.
+
+Each row in `donor_embeddings` stores md5(doc) in `doc_hash`. The doc and its
+hash are computed in SQL, so an incremental rebuild only streams the donors
+whose doc actually changed (or that have no embedding yet).
+"""
+from __future__ import annotations
+import time
+
+from sqlalchemy import text
+
+from app.db import vector_param
+from app.embeddings import embed_array, embedding_dim
+
+ANN_INDEX = "donor_embeddings_embedding_ann_idx"
+
+# filtered ANN queries fetch this many candidates per requested result
+DEFAULT_OVERSAMPLE = 10
+
+_index_cache: dict = {"at": 0.0, "info": None}
+_INDEX_CACHE_TTL = 60.0
+
+# name | mission | "city, state" | website  (empty parts dropped)
+DOC_SQL = """concat_ws(' | ',
+    NULLIF(d.name, ''),
+    NULLIF(d.mission, ''),
+    NULLIF(btrim(COALESCE(d.city, '') || ', ' || COALESCE(d.state, ''), ', '), ''),
+    NULLIF(d.website, '')
+)"""
+
+
+def upsert_embeddings(session, rows: list[tuple[int, str, str]], vecs) -> int:
+    """
+    Multi-row upsert of (donor_id, doc, doc_hash) + matching vectors into
+    `donor_embeddings`, one statement per call.
+    """
+    if not rows:
+        return 0
+    values, params = [], {}
+    for i, ((donor_id, doc, doc_hash), vec) in enumerate(zip(rows, vecs)):
+        values.append(f"(:id_{i}, CAST(:emb_{i} AS vector), :doc_{i}, :hash_{i}, NOW())")
+        params.update({
+            f"id_{i}": donor_id,
+            f"emb_{i}": vector_param(vec),
+            f"doc_{i}": doc,
+            f"hash_{i}": doc_hash,
+        })
+    session.execute(text(f"""
+        INSERT INTO donor_embeddings (donor_id, embedding, doc, doc_hash, embedded_at)
+        VALUES {', '.join(values)}
+        ON CONFLICT (donor_id) DO UPDATE SET
+            embedding = EXCLUDED.embedding,
+            doc = EXCLUDED.doc,
+            doc_hash = EXCLUDED.doc_hash,
+            embedded_at = EXCLUDED.embedded_at
+    """), params)
+    return len(rows)
+
+
+def _embed_and_write(session, rows: list[tuple[int, str, str]], batch_size: int) -> int:
+    written = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        written += upsert_embeddings(session, batch, embed_array([doc for _, doc, _ in batch]))
+    return written
+
+
+def build_missing(session, batch_size: int, max_rows: int) -> int:
+    """Embed donors that have no `donor_embeddings` row yet (up to max_rows)."""
+    rows = session.execute(text(f"""
+        SELECT d.id, {DOC_SQL} AS doc, md5({DOC_SQL}) AS doc_hash
+        FROM donors d
+        LEFT JOIN donor_embeddings de ON de.donor_id = d.id
+        WHERE de.donor_id IS NULL
+        ORDER BY d.id
+        LIMIT :max_rows
+    """), {"max_rows": max_rows}).all()
+    created = _embed_and_write(session, [tuple(r) for r in rows], batch_size)
+    session.commit()
+    return created
+
+
+def rebuild_incremental(
+    session,
+    batch_size: int,
+    chunk_size: int = 1000,
+    max_rows: int | None = None,
+    after_id: int = 0,
+) -> dict:
+    """
+    Re-embed donors whose doc hash differs from the stored one, in donor id order.
+
+    Candidates are read through a server-side cursor on a separate connection,
+    `chunk_size` rows at a time; each chunk is embedded, bulk-upserted and
+    committed on `session`. A run stopped by `max_rows` (or a crash) resumes
+    from `last_id`, and rows already committed no longer match the filter.
+    """
+    started = time.perf_counter()
+    embedded, last_id, done = 0, after_id, True
+    sql = text(f"""
+        SELECT d.id, {DOC_SQL} AS doc, md5({DOC_SQL}) AS doc_hash
+        FROM donors d
+        LEFT JOIN donor_embeddings de ON de.donor_id = d.id
+        WHERE d.id > :after_id
+          AND de.doc_hash IS DISTINCT FROM md5({DOC_SQL})
+        ORDER BY d.id
+    """)
+    with session.get_bind().connect() as reader:
+        result = reader.execution_options(stream_results=True, yield_per=chunk_size) \
+            .execute(sql, {"after_id": after_id})
+        for chunk in result.partitions(chunk_size):
+            rows = [tuple(r) for r in chunk]
+            if max_rows is not None and embedded + len(rows) > max_rows:
+                rows = rows[: max_rows - embedded]
+                done = False
+            embedded += _embed_and_write(session, rows, batch_size)
+            if rows:
+                last_id = rows[-1][0]
+            session.commit()
+            if not done:
+                break
+            if max_rows is not None and embedded >= max_rows:
+                # the cap fell on a chunk boundary: only done if the cursor has nothing left
+                done = result.fetchone() is None
+                break
+        result.close()
+
+    return {
+        "embedded": embedded,
+        "last_id": last_id,
+        "done": done,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+# --------------------------
+# ANN index management
+# --------------------------
+
+def index_info(session, refresh: bool = False) -> dict | None:
+    """
+    {"name", "method", "definition"} for the managed ANN index, or None.
+    Cached briefly since every search consults it.
+    """
+    now = time.time()
+    if not refresh and now - _index_cache["at"] < _INDEX_CACHE_TTL:
+        return _index_cache["info"]
+    row = session.execute(text("""
+        SELECT i.indexname AS name, am.amname AS method, i.indexdef AS definition
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        JOIN pg_am am ON am.oid = c.relam
+        WHERE i.tablename = 'donor_embeddings' AND i.indexname = :name
+    """), {"name": ANN_INDEX}).mappings().first()
+    _index_cache.update(at=now, info=dict(row) if row else None)
+    return _index_cache["info"]
+
+
+def column_dim(conn) -> int | None:
+    """Declared dimension of donor_embeddings.embedding (None while untyped)."""
+    typmod = conn.execute(text("""
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'donor_embeddings'::regclass AND attname = 'embedding'
+    """)).scalar()
+    return typmod if typmod and typmod > 0 else None
+
+
+def build_index(
+    engine,
+    method: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: int | None = None,
+) -> dict:
+    """
+    Pin the embedding column to the model's dimension and (re)build the ANN
+    index with CREATE INDEX CONCURRENTLY, so reads keep working during the build.
+    """
+    if method not in ("hnsw", "ivfflat"):
+        raise ValueError(f"unknown index method {method!r}")
+    dim = embedding_dim()
+    started = time.perf_counter()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        current = column_dim(conn)
+        if current is None:
+            conn.execute(text(f"ALTER TABLE donor_embeddings ALTER COLUMN embedding TYPE vector({int(dim)})"))
+        elif current != dim:
+            raise ValueError(f"embedding column is vector({current}) but the model produces {dim} dims")
+
+        if method == "hnsw":
+            opts = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+        else:
+            if lists is None:
+                rows = conn.execute(text("SELECT COUNT(*) FROM donor_embeddings")).scalar() or 0
+                lists = max(10, rows // 1000)
+            opts = f"lists = {int(lists)}"
+
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX}"))
+        conn.execute(text(f"""
+            CREATE INDEX CONCURRENTLY {ANN_INDEX} ON donor_embeddings
+            USING {method} (embedding vector_cosine_ops) WITH ({opts})
+        """))
+        conn.execute(text("ANALYZE donor_embeddings"))
+
+    _index_cache["at"] = 0.0
+    return {
+        "index": ANN_INDEX,
+        "method": method,
+        "dim": dim,
+        "options": opts,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def drop_index(engine) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX}"))
+    _index_cache["at"] = 0.0
+
+
+# --------------------------
+# search
+# --------------------------
+
+def donor_filters(state=None, min_assets=None, max_assets=None, alias: str = "d") -> tuple[list[str], dict]:
+    """WHERE fragments + params for the state / asset-range filters shared by the search paths."""
+    where, params = [], {}
+    if state:
+        where.append(f"{alias}.state = :state")
+        params["state"] = state
+    if min_assets is not None:
+        where.append(f"{alias}.assets_total >= :min_assets")
+        params["min_assets"] = min_assets
+    if max_assets is not None:
+        where.append(f"{alias}.assets_total <= :max_assets")
+        params["max_assets"] = max_assets
+    return where, params
+
+
+def set_search_params(session, method: str, k: int, ef_search: int | None, probes: int | None) -> None:
+    # transaction-local; hnsw can't return more than ef_search rows per scan
+    if method == "hnsw":
+        ef = max(ef_search or 40, k)
+        session.execute(text("SELECT set_config('hnsw.ef_search', :v, true)"), {"v": str(min(ef, 1000))})
+    elif method == "ivfflat" and probes:
+        session.execute(text("SELECT set_config('ivfflat.probes', :v, true)"), {"v": str(probes)})
+
+
+def search(
+    session,
+    qvec,
+    limit: int,
+    state=None,
+    min_assets=None,
+    max_assets=None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    oversample: int = DEFAULT_OVERSAMPLE,
+    exact: bool = False,
+) -> list:
+    """
+    Nearest donors by cosine distance.
+
+    With an ANN index, the top `limit` (or `limit * oversample` when filters are
+    set) candidates come from the index and are then filtered; if filtering
+    leaves fewer than `limit` rows, the query is re-run as an exact scan so
+    filtered searches still return a full page.
+    """
+    where, params = donor_filters(state, min_assets, max_assets)
+    params.update({"qvec": vector_param(qvec), "limit": limit})
+    where_sql = " AND ".join(where) or "TRUE"
+    cols = """d.id, d.name, d.state, d.city, d.mission,
+               d.assets_total, d.grants_total, {dist} AS distance, d.website"""
+
+    info = None if exact else index_info(session)
+    if info:
+        k = limit * max(oversample, 1) if where else limit
+        set_search_params(session, info["method"], k, ef_search, probes)
+        rows = session.execute(text(f"""
+            WITH ann AS (
+                SELECT donor_id, embedding <=> CAST(:qvec AS vector) AS distance
+                FROM donor_embeddings
+                ORDER BY embedding <=> CAST(:qvec AS vector)
+                LIMIT :k
+            )
+            SELECT {cols.format(dist="ann.distance")}
+            FROM ann
+            JOIN donors d ON d.id = ann.donor_id
+            WHERE {where_sql}
+            ORDER BY ann.distance ASC
+            LIMIT :limit
+        """), {**params, "k": k}).mappings().all()
+        if len(rows) >= limit or not where:
+            return rows
+
+    return session.execute(text(f"""
+        SELECT {cols.format(dist="(de.embedding <=> CAST(:qvec AS vector))")}
+        FROM donor_embeddings de
+        JOIN donors d ON d.id = de.donor_id
+        WHERE {where_sql}
+        ORDER BY distance ASC
+        LIMIT :limit
+    """), params).mappings().all()
@@ -0,0 +1,170 @@
+"""
+Standalone job worker.
+
+    python -m app.worker --concurrency 4
+    python -m app.worker --kinds crawl,enrich --concurrency 8
+
+Each slot claims one job at a time from the `jobs` table (FOR UPDATE SKIP
+LOCKED, so several worker processes can run side by side), runs the task
+from app.tasks.TASKS with its own DB session (an AsyncSession for async
+tasks, a sync Session in a thread for the rest), heartbeats while it runs and
+records the result, or requeues it with backoff on failure.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import socket
+import traceback
+
+from app import http_clients, jobs
+from app.db import AsyncSessionLocal, SessionLocal
+from app.tasks import TASKS
+
+HEARTBEAT_S = 30.0
+
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+async def run_job(job: dict) -> str:
+    """Execute one claimed job; returns its final status."""
+    fn = TASKS.get(job["kind"])
+    is_async = asyncio.iscoroutinefunction(fn)
+    # progress/heartbeat writes stay out of the task's transaction; progress() and
+    # the heartbeat share `meta`, and an AsyncSession allows one operation at a time
+    meta = AsyncSessionLocal()
+    meta_lock = asyncio.Lock()
+    session = AsyncSessionLocal() if is_async else SessionLocal()
+    stopping = False
+
+    async def _meta(fn, *args, **kwargs):
+        async with meta_lock:
+            return await meta.run_sync(fn, *args, **kwargs)
+
+    async def _rollback() -> None:
+        if is_async:
+            await session.rollback()
+        else:
+            await asyncio.to_thread(session.rollback)
+
+    try:
+        if fn is None:
+            return await _meta(jobs.fail, job, f"unknown job kind {job['kind']!r}", retryable=False)
+
+        async def progress(p: dict) -> None:
+            await _meta(jobs.heartbeat, job, _jsonable(p))
+
+        done = asyncio.Event()
+
+        async def _beat() -> None:
+            # stopped via `done` rather than cancel(), so a heartbeat is never cut off mid-write
+            while not done.is_set():
+                try:
+                    await asyncio.wait_for(done.wait(), timeout=HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    await _meta(jobs.heartbeat, job)
+
+        beat = asyncio.create_task(_beat())
+        try:
+            params = job["params"] or {}
+            try:
+                inspect.signature(fn).bind(session, **params)
+            except TypeError as e:
+                raise jobs.PermanentJobError(f"bad params: {e}") from None
+            if is_async:
+                result = await fn(session, **params, progress=progress)
+            else:
+                thread = asyncio.ensure_future(asyncio.to_thread(fn, session, **params))
+                try:
+                    result = await asyncio.shield(thread)
+                except asyncio.CancelledError:
+                    # a thread can't be interrupted and owns `session`: let it finish and
+                    # record how it ended (instead of requeueing a job that is still running)
+                    stopping = True
+                    result = await thread
+        finally:
+            done.set()
+            await asyncio.gather(beat, return_exceptions=True)
+        status = await _meta(jobs.complete, job, _jsonable(result))
+    except asyncio.CancelledError:
+        # shutting down mid-job: hand it back to the queue
+        await _rollback()
+        await _meta(jobs.fail, job, "worker stopped")
+        raise
+    except jobs.PermanentJobError as e:
+        # bad input (missing donor, bad params): retrying will not help; anything else backs off
+        await _rollback()
+        status = await _meta(jobs.fail, job, f"{type(e).__name__}: {e}", retryable=False)
+    except Exception as e:
+        await _rollback()
+        traceback.print_exc()
+        status = await _meta(jobs.fail, job, f"{type(e).__name__}: {e}")
+    finally:
+        if is_async:
+            await session.close()
+        else:
+            session.close()
+        await meta.close()
+    if stopping:
+        raise asyncio.CancelledError
+    return status
+
+
+async def _slot(worker_id: str, kinds: list[str] | None, poll_s: float, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        async with AsyncSessionLocal() as session:
+            job = await session.run_sync(jobs.claim, worker_id, kinds)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_s)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        status = await run_job(job)
+        print(f"[worker {worker_id}] job {job['id']} ({job['kind']}) attempt {job['attempts']}: {status}")
+
+
+async def _reaper(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        async with AsyncSessionLocal() as session:
+            n = await session.run_sync(jobs.requeue_stale)
+        if n:
+            print(f"[worker] reaped {n} stale job(s) (requeued, or failed when out of attempts)")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=60)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main(concurrency: int, kinds: list[str] | None, poll_s: float) -> None:
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = asyncio.Event()
+    await http_clients.startup()
+    tasks = [asyncio.create_task(_slot(f"{worker_id}/{i}", kinds, poll_s, stop)) for i in range(concurrency)]
+    tasks.append(asyncio.create_task(_reaper(stop)))
+    print(f"[worker {worker_id}] {concurrency} slot(s), kinds={kinds or 'all'}")
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        stop.set()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await http_clients.shutdown()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "4")))
+    ap.add_argument("--kinds", default="", help=f"comma list of {', '.join(TASKS)} (default: all)")
+    ap.add_argument("--poll", type=float, default=1.0, help="idle poll interval, seconds")
+    args = ap.parse_args()
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()] or None
+    try:
+        asyncio.run(main(args.concurrency, kinds, args.poll))
+    except KeyboardInterrupt:
+        pass
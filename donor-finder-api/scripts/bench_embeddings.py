@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: legacy list-based embedding path vs the numpy batch path.
+
+Compares, for the hashing fallback (no model download needed):
+  - embed: per-text `random`-seeded lists  vs  one vectorized float32 matrix
+  - encode: '[0.01,...]' text literals     vs  pgvector binary payloads
+
+Run from donor-finder-api/:
+    python -m scripts.bench_embeddings --n 2000
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import math
+import random
+import struct
+import time
+
+import numpy as np
+
+from app.embeddings import _hash_embed_batch, to_pgvector
+
+
+def _legacy_hash_embed(text: str, dim: int = 384) -> list[float]:
+    h = hashlib.sha256(text.encode("utf-8")).digest()
+    random.seed(h)
+    v = [random.random() - 0.5 for _ in range(dim)]
+    s = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / s for x in v]
+
+
+def _pgvector_binary(vec: np.ndarray) -> bytes:
+    # pgvector wire format: uint16 dim, uint16 unused, big-endian float32s
+    return struct.pack(">HH", vec.shape[0], 0) + vec.astype(">f4", copy=False).tobytes()
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    docs = [f"Example Foundation {i} | early childhood education | Los Angeles, CA" for i in range(args.n)]
+
+    t_list = _timeit(lambda: [_legacy_hash_embed(d) for d in docs], args.repeat)
+    t_np = _timeit(lambda: _hash_embed_batch(docs), args.repeat)
+
+    lists = [_legacy_hash_embed(d) for d in docs]
+    mat = _hash_embed_batch(docs)
+    t_text = _timeit(lambda: [to_pgvector(v) for v in lists], args.repeat)
+    t_bin = _timeit(lambda: [_pgvector_binary(v) for v in mat], args.repeat)
+
+    print(f"n={args.n} dim={mat.shape[1]}")
+    print(f"embed   list {t_list * 1e3:9.1f} ms   numpy  {t_np * 1e3:9.1f} ms   x{t_list / t_np:.1f}")
+    print(f"encode  text {t_text * 1e3:9.1f} ms   binary {t_bin * 1e3:9.1f} ms   x{t_text / t_bin:.1f}")
+    print(f"payload text {sum(len(to_pgvector(v)) for v in lists[:100]) / 100:.0f} B/vec   "
+          f"binary {len(_pgvector_binary(mat[0]))} B/vec")
+
+
+if __name__ == "__main__":
+    main()
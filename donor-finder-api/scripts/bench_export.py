@@ -0,0 +1,82 @@
+"""
+Export throughput (rows/s) and peak memory per format and export size.
+
+By default rows are synthetic (shaped like app.export.EXPORT_COLUMNS) and
+fed through the encoders in cursor-sized chunks, so this runs offline; with
+--db the rows come from the real server-side cursor (DATABASE_URL as for
+the API) and --rows is ignored. Peak memory is tracemalloc's high-water
+mark while draining the stream; it should not grow with the row count.
+
+Run from donor-finder-api/:
+    python -m scripts.bench_export --rows 100,100000,1000000 --formats csv,ndjson,parquet
+    python -m scripts.bench_export --db --formats csv,parquet
+"""
+from __future__ import annotations
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+from app import export
+
+
+def _synthetic(n: int, chunk_size: int):
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    for start in range(0, n, chunk_size):
+        yield [
+            (i, str(900000000 + i), f"Example Family Foundation {i}", "CA", "San Francisco",
+             "Education and youth development grants.", "B82", Decimal(1_000_000 + i), None,
+             f"example{i}.org", now, "Jane Doe", "Executive Director", f"jane@example{i}.org", None,
+             2, 3, "company_profile;page_markdown", now)
+            for i in range(start, min(start + chunk_size, n))
+        ]
+
+
+def _drain(stream) -> int:
+    size = 0
+    for part in stream:
+        size += len(part)
+    return size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="100,100000,1000000", help="comma list of synthetic export sizes")
+    ap.add_argument("--formats", default="csv,ndjson,parquet")
+    ap.add_argument("--chunk-size", type=int, default=export.DEFAULT_CHUNK)
+    ap.add_argument("--db", action="store_true", help="export every donor from DATABASE_URL instead")
+    args = ap.parse_args()
+
+    formats = [f for f in args.formats.split(",") if f]
+    if "parquet" in formats and not export.parquet_available():
+        print("pyarrow not installed; skipping parquet")
+        formats.remove("parquet")
+    sizes = [None] if args.db else [int(n) for n in args.rows.split(",")]
+
+    for fmt in formats:
+        for n in sizes:
+            if args.db:
+                chunks = export.iter_chunks(export.export_sql([]), {}, args.chunk_size)
+            else:
+                chunks = _synthetic(n, args.chunk_size)
+            rows = 0
+
+            def counted(chunks):
+                nonlocal rows
+                for chunk in chunks:
+                    rows += len(chunk)
+                    yield chunk
+
+            tracemalloc.start()
+            t = time.perf_counter()
+            size = _drain(export.ENCODERS[fmt](counted(chunks)))
+            elapsed = time.perf_counter() - t
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{fmt:<8} {rows:>9} rows  {size / 2**20:9.1f} MB  {rows / elapsed:10.0f} rows/s"
+                  f"  peak {peak / 2**20:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: per-page HTML extraction, legacy BeautifulSoup passes vs the
+single-parse lxml engine (app/html_extract.py).
+
+Legacy = what crawl_site did per page: one soup for text, one for
+extract_names_and_roles, one for absolute_links, plus EMAIL_RE over the text.
+
+Run from donor-finder-api/ (needs beautifulsoup4 for the legacy side):
+    python -m scripts.bench_extract --dir scripts/fixtures/html --repeat 20
+"""
+from __future__ import annotations
+import argparse
+import pathlib
+import time
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from app.html_extract import EMAIL_RE, extract_page
+
+BASE = "https://sunrisefdn.org/"
+
+
+def _legacy(html: str) -> dict:
+    text = BeautifulSoup(html, "lxml").get_text(" ", strip=True)
+    emails = sorted(set(EMAIL_RE.findall(text)))
+
+    soup = BeautifulSoup(html, "lxml")
+    people = []
+    for sel in ["h1", "h2", "h3", ".team-member", ".person", ".staff", "li"]:
+        for el in soup.select(sel):
+            t = " ".join(el.get_text(" ", strip=True).split())
+            if 5 <= len(t) <= 80 and " " in t:
+                people.append({"name": t})
+        if len(people) > 20:
+            break
+
+    soup = BeautifulSoup(html, "lxml")
+    links = []
+    for a in soup.find_all("a", href=True):
+        url = urljoin(BASE, a["href"])
+        if url not in links and urlparse(url).netloc == urlparse(BASE).netloc:
+            links.append(url)
+        if len(links) >= 20:
+            break
+    return {"text": text, "emails": emails, "people": people, "links": links}
+
+
+def _bench(fn, docs: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for html in docs:
+            fn(html)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default="scripts/fixtures/html")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    paths = sorted(pathlib.Path(args.dir).glob("*.html"))
+    docs = [p.read_text(encoding="utf-8", errors="replace") for p in paths]
+    if not docs:
+        raise SystemExit(f"no .html fixtures in {args.dir}")
+    kb = sum(len(d) for d in docs) / 1024
+
+    t_legacy = _bench(_legacy, docs, args.repeat)
+    t_new = _bench(lambda h: extract_page(h, BASE), docs, args.repeat)
+
+    print(f"{len(docs)} pages, {kb:.0f} KB")
+    print(f"legacy (3x BeautifulSoup) {t_legacy / len(docs) * 1e3:8.2f} ms/page")
+    print(f"single-parse lxml         {t_new / len(docs) * 1e3:8.2f} ms/page   x{t_legacy / t_new:.1f}")
+    for p, html in zip(paths, docs):
+        old, new = _legacy(html), extract_page(html, BASE)
+        print(f"  {p.name:<14} emails {len(old['emails'])}/{len(new['emails'])}  "
+              f"people {len(old['people'])}/{len(new['people'])}  text chars {len(old['text'])}/{len(new['text'])}")
+
+
+if __name__ == "__main__":
+    main()
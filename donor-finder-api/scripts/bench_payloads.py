@@ -0,0 +1,94 @@
+"""
+Payload size and serialization cost of a GET /donors page.
+
+Compares the old response path (every column incl. the ProPublica `source`
+blob, FastAPI's jsonable_encoder + stdlib json) with the lean column set and
+app.responses.dumps (orjson when installed). Rows are synthetic but shaped
+like ingested donors: NUMERIC -> Decimal, TIMESTAMP -> datetime, and a
+`source` with the org detail plus `--filings` filings of ~120 fields each.
+
+Run from donor-finder-api/:
+    python -m scripts.bench_payloads --rows 25 --repeat 200
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app import responses
+from app.routes.donors import DONOR_FIELDS, HEAVY_FIELDS
+
+
+def _source(i: int, filings: int) -> dict:
+    org = {f"org_field_{k}": f"value {k} for org {i}" for k in range(40)}
+    return {
+        "organization": {**org, "ein": 900000000 + i, "subseccd": 3},
+        "filings_with_data": [
+            {"tax_prd_yr": 2023 - y, **{f"line_{k}": (i * 1000 + k) * 17 for k in range(120)}}
+            for y in range(filings)
+        ],
+    }
+
+
+def _row(i: int, filings: int) -> dict:
+    now = datetime(2025, 1, 1, 12, 0, i % 60, 123456)
+    return {
+        "id": i, "ein": str(900000000 + i), "name": f"Example Family Foundation {i}",
+        "state": "CA", "city": "San Francisco", "mission": "Education and youth development grants.",
+        "ntee_code": "B82", "assets_total": Decimal(1_000_000 + i * 37), "grants_total": Decimal("125000.50"),
+        "irs_subsection": 3, "website": f"example{i}.org", "source": _source(i, filings),
+        "created_at": now, "updated_at": now,
+    }
+
+
+def _fastapi_default(payload) -> bytes:
+    # what JSONResponse does after FastAPI's serialize_response
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _timeit(fn, payload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=25, help="rows per page (GET /donors default limit)")
+    ap.add_argument("--filings", type=int, default=8, help="filings per ProPublica source blob")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    rows = [_row(i, args.filings) for i in range(args.rows)]
+    lean = [{k: r[k] for k in DONOR_FIELDS if k not in HEAVY_FIELDS} for r in rows]
+
+    def page(items):
+        return {"items": items, "total": 1000, "total_is_estimate": False, "next_cursor": "abc"}
+
+    cases = [
+        ("all columns, FastAPI default", _fastapi_default, page(rows)),
+        ("all columns, FastJSONResponse", responses.dumps, page(rows)),
+        ("lean columns, FastAPI default", _fastapi_default, page(lean)),
+        ("lean columns, FastJSONResponse", responses.dumps, page(lean)),
+    ]
+    engine = "orjson" if responses.orjson is not None else "stdlib json"
+    print(f"{args.rows} rows/page, {args.filings} filings/source, FastJSONResponse via {engine}")
+    base = None
+    for label, fn, payload in cases:
+        size = len(fn(payload))
+        secs = _timeit(fn, payload, args.repeat)
+        base = base or secs
+        print(f"  {label:<32} {size / 1024:9.1f} KB  {secs * 1000:8.3f} ms  x{base / secs:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
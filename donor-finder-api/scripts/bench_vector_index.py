@@ -0,0 +1,82 @@
+"""
+Recall vs latency for the ANN index on donor_embeddings, against exact search.
+
+Uses stored embeddings as queries, computes exact top-k with index scans
+disabled, then measures recall@k and latency for each ef_search (hnsw) or
+probes (ivfflat) setting. Build the index first: POST /admin/vector-index.
+
+Run from donor-finder-api/ (DATABASE_URL as for the API):
+    python -m scripts.bench_vector_index --queries 100 --k 10 --settings 10,20,40,80,200
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.db import SessionLocal
+from app.vector_store import index_info
+
+TOPK = text("""
+    SELECT donor_id FROM donor_embeddings
+    ORDER BY embedding <=> CAST(:q AS vector)
+    LIMIT :k
+""")
+
+
+def _run(session, q: str, k: int, settings: dict[str, str]) -> tuple[list[int], float]:
+    for name, value in settings.items():
+        session.execute(text("SELECT set_config(:n, :v, true)"), {"n": name, "v": value})
+    t = time.perf_counter()
+    ids = [r[0] for r in session.execute(TOPK, {"q": q, "k": k})]
+    elapsed = time.perf_counter() - t
+    session.rollback()
+    return ids, elapsed
+
+
+def _pct(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--settings", default="10,20,40,80,200")
+    args = ap.parse_args()
+
+    session = SessionLocal()
+    info = index_info(session, refresh=True)
+    if not info:
+        raise SystemExit("no ANN index; POST /admin/vector-index first")
+    knob = "hnsw.ef_search" if info["method"] == "hnsw" else "ivfflat.probes"
+
+    queries = [r[0] for r in session.execute(text(
+        "SELECT embedding::text FROM donor_embeddings ORDER BY random() LIMIT :n"
+    ), {"n": args.queries})]
+    session.rollback()
+
+    exact, exact_lat = [], []
+    for q in queries:
+        ids, dt = _run(session, q, args.k, {"enable_indexscan": "off"})
+        exact.append(set(ids))
+        exact_lat.append(dt)
+
+    print(f"index={info['method']} queries={len(queries)} k={args.k}")
+    print(f"{'setting':>18} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'exact':>18} {1.0:8.3f} {statistics.median(exact_lat) * 1e3:8.2f} {_pct(exact_lat, .95) * 1e3:8.2f}")
+    for value in args.settings.split(","):
+        recalls, lat = [], []
+        for q, truth in zip(queries, exact):
+            ids, dt = _run(session, q, args.k, {knob: value})
+            recalls.append(len(truth & set(ids)) / max(len(truth), 1))
+            lat.append(dt)
+        print(f"{knob + '=' + value:>18} {statistics.mean(recalls):8.3f} "
+              f"{statistics.median(lat) * 1e3:8.2f} {_pct(lat, .95) * 1e3:8.2f}")
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Local mock of the Firecrawl v1 endpoints used by app/services/firecrawl.py.
+
+    python -m scripts.mock_firecrawl --port 8799 --latency 1.0 --unsupported crawl
+    FIRECRAWL_BASE_URL=http://127.0.0.1:8799/v1 FIRECRAWL_API_KEY=test uvicorn app.main:app
+
+Every call sleeps `--latency` seconds, so sequential vs concurrent fan-out is
+visible in the route's `timings`. Endpoints listed in `--unsupported` answer
+404 (as on a plan without them). POST /v1/batch/scrape starts a job that
+finishes BATCH_RATE URLs per `--latency` seconds (GET /v1/batch/scrape/<id> reports
+progress, paged via `next`). GET /_stats returns per-endpoint call counts.
+"""
+from __future__ import annotations
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CALLS: Counter = Counter()
+JOBS: dict = {}  # id -> {"urls": [...], "started": t}
+PAGE_SIZE = 25
+BATCH_RATE = 20
+_lock = threading.Lock()
+
+
+def _profile(urls: list[str]) -> dict:
+    return {
+        "org_name": "Mock Foundation",
+        "about": f"Profile built from {len(urls)} pages.",
+        "mission": "Supporting early childhood education.",
+        "program_areas": ["education"],
+        "leadership": [{"name": "Jane Doe", "title": "Executive Director"}],
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    unsupported: set = set()
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _batch_status(self, job_id: str, skip: int) -> None:
+        job = JOBS.get(job_id)
+        if job is None:
+            return self._send(404, {"success": False, "error": "job not found"})
+        done = min(len(job["urls"]), int((time.monotonic() - job["started"]) / max(self.latency, 1e-3) * BATCH_RATE))
+        docs = [
+            {"markdown": f"# {u}\n\nMock page body.", "metadata": {"sourceURL": u, "statusCode": 200}}
+            for u in job["urls"][:done]
+        ]
+        body = {
+            "success": True,
+            "status": "completed" if done == len(job["urls"]) else "scraping",
+            "total": len(job["urls"]),
+            "completed": done,
+            "data": docs[skip:skip + PAGE_SIZE],
+        }
+        if skip + PAGE_SIZE < len(docs):
+            host = self.headers.get("Host")
+            body["next"] = f"http://{host}/v1/batch/scrape/{job_id}?skip={skip + PAGE_SIZE}"
+        self._send(200, body)
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            with _lock:
+                return self._send(200, dict(CALLS))
+        if self.path.startswith("/v1/batch/scrape/"):
+            with _lock:
+                CALLS["batch_scrape_status"] += 1
+            path, _, query = self.path.partition("?")
+            skip = int(query.split("=", 1)[1]) if query.startswith("skip=") else 0
+            return self._batch_status(path.rsplit("/", 1)[-1], skip)
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        endpoint = self.path.rstrip("/").split("/v1/", 1)[-1].replace("/", "_")
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with _lock:
+            CALLS[endpoint] += 1
+        time.sleep(self.latency)
+
+        if endpoint in self.unsupported:
+            return self._send(404, {"success": False, "error": f"/{endpoint} not available on this plan"})
+        if endpoint == "batch_scrape":
+            job_id = str(uuid.uuid4())
+            JOBS[job_id] = {"urls": payload.get("urls") or [], "started": time.monotonic()}
+            return self._send(200, {"success": True, "id": job_id})
+        if endpoint == "crawl":
+            url = payload.get("url", "")
+            return self._send(200, {"success": True, "data": [{"markdown": f"# {url}\n\nMock page body."}]})
+        if endpoint == "extract":
+            urls = payload.get("urls") or []
+            if "markdown" in ((payload.get("schema") or {}).get("properties") or {}):
+                return self._send(200, {"success": True, "data": {"markdown": f"# {urls[0]}\n\nMock page body."}})
+            return self._send(200, {"success": True, "data": _profile(urls)})
+        self._send(404, {"success": False, "error": "unknown endpoint"})
+
+    def log_message(self, *args):
+        pass
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency", type=float, default=0.5, help="seconds per call")
+    ap.add_argument("--unsupported", default="", help="comma list, e.g. 'crawl' or 'batch_scrape'")
+    args = ap.parse_args()
+
+    Handler.latency = args.latency
+    Handler.unsupported = {e.strip() for e in args.unsupported.split(",") if e.strip()}
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"mock firecrawl on http://127.0.0.1:{args.port}/v1 (unsupported: {sorted(Handler.unsupported)})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
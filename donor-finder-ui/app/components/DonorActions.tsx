@@ -3,6 +3,7 @@
 
 import { useTransition } from "react";
 import { useRouter } from "next/navigation";
+import { waitForJob } from "@/app/lib/api";
 
 export default function DonorActions({ donorId }: { donorId: number }) {
   const [pending, start] = useTransition();
@@ -16,6 +17,8 @@ export default function DonorActions({ donorId }: { donorId: number }) {
         if (!res.ok) {
           alert(`${label} failed`);
         } else {
+          const { job_id } = await res.json();
+          await waitForJob(job_id); // the worker runs it; wait before re-reading
           router.refresh(); // re-fetch server component data
         }
       } catch {
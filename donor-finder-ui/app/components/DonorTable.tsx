@@ -2,19 +2,22 @@
 
 import Link from "next/link";
 import useSWR from "swr";
-import { getDonors } from "@/app/lib/api";
+import { listDonors } from "@/app/lib/api";
 import { DonorListResponse } from "@/app/lib/types";
 import { useState } from "react";
 
-const fetcher = ([_key, params]: any) => getDonors(params);
+const fetcher = ([_key, params]: any) => listDonors(params);
 
 export default function DonorTable() {
   const [state, setState] = useState("CA");
   const [q, setQ] = useState("");
   const [limit] = useState(25);
+  // cursors for the pages we've visited; the last one is the current page
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
+  const cursor = cursors[cursors.length - 1];
 
   const { data, isLoading, error, mutate } = useSWR<DonorListResponse>(
-    ["donors", { state, q, limit }],
+    ["donors", { state, q, limit, cursor }],
     fetcher
   );
 
@@ -23,11 +26,11 @@ export default function DonorTable() {
       <div className="flex gap-3 items-end">
         <div>
           <label className="block text-sm">State</label>
-          <input value={state} onChange={e => setState(e.target.value)} className="border px-2 py-1 rounded w-24" />
+          <input value={state} onChange={e => { setState(e.target.value); setCursors([null]); }} className="border px-2 py-1 rounded w-24" />
         </div>
         <div className="flex-1">
           <label className="block text-sm">Search</label>
-          <input value={q} onChange={e => setQ(e.target.value)} placeholder="keyword in name / mission"
+          <input value={q} onChange={e => { setQ(e.target.value); setCursors([null]); }} placeholder="keyword in name / mission"
                  className="border px-2 py-1 rounded w-full" />
         </div>
         <button onClick={() => mutate()} className="bg-black text-white px-3 py-2 rounded">Search</button>
@@ -61,8 +64,15 @@ export default function DonorTable() {
         </tbody>
       </table>
 
-      <div className="text-sm text-gray-600">
-        {data ? `${data.items.length} shown` : ""} {data?.total ? `• ${data.total} total` : ""}
+      <div className="flex items-center gap-3 text-sm text-gray-600">
+        <span>
+          {data ? `${data.items.length} shown` : ""}{" "}
+          {data?.total ? `• ${data.total_is_estimate ? "~" : ""}${data.total} total` : ""}
+        </span>
+        <button disabled={cursors.length < 2} onClick={() => setCursors(cs => cs.slice(0, -1))}
+                className="border px-2 py-1 rounded disabled:opacity-50">Prev</button>
+        <button disabled={!data?.next_cursor} onClick={() => setCursors(cs => [...cs, data!.next_cursor!])}
+                className="border px-2 py-1 rounded disabled:opacity-50">Next</button>
       </div>
     </div>
   );
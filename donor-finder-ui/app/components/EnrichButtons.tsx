@@ -1,20 +1,31 @@
 "use client";
 
-import { postCrawl, postEnrich } from "@/app/lib/api";
+import { postCrawl, postEnrich, waitForJob } from "@/app/lib/api";
+import type { Job } from "@/app/lib/types";
 import { useState } from "react";
 
+function label(job: Job | null): string {
+  if (!job) return "Queued…";
+  if (job.status === "queued") return job.attempts > 0 ? "Retrying…" : "Queued…";
+  const p = job.progress;
+  return p?.total ? `Running ${p.done ?? 0}/${p.total}…` : "Running…";
+}
+
 export default function EnrichButtons({ id, onDone }: { id: number; onDone?: () => void }) {
   const [busy, setBusy] = useState<"enrich"|"crawl"|null>(null);
+  const [job, setJob] = useState<Job | null>(null);
   const run = async (which: "enrich"|"crawl") => {
     try {
       setBusy(which);
-      if (which === "enrich") await postEnrich(id);
-      else await postCrawl(id);
+      setJob(null);
+      const { job_id } = which === "enrich" ? await postEnrich(id) : await postCrawl(id);
+      await waitForJob(job_id, setJob);
       onDone?.();
     } catch (e) {
       alert((e as Error).message);
     } finally {
       setBusy(null);
+      setJob(null);
     }
   };
 
@@ -22,11 +33,11 @@ export default function EnrichButtons({ id, onDone }: { id: number; onDone?: ()
     <div className="flex gap-2">
       <button disabled={busy!==null} onClick={() => run("enrich")}
         className="px-3 py-2 rounded bg-black text-white disabled:opacity-50">
-        {busy==="enrich" ? "Enriching…" : "Enrich (Apollo)"}
+        {busy==="enrich" ? `Enriching: ${label(job)}` : "Enrich (Apollo)"}
       </button>
       <button disabled={busy!==null} onClick={() => run("crawl")}
         className="px-3 py-2 rounded border">
-        {busy==="crawl" ? "Crawling…" : "Crawl (Firecrawl)"}
+        {busy==="crawl" ? `Crawling: ${label(job)}` : "Crawl (Firecrawl)"}
       </button>
     </div>
   );
@@ -1,5 +1,5 @@
 // app/lib/api.ts
-import { Donor, DonorDetail } from "./types";
+import { Donor, DonorDetail, DonorListResponse, Job, JobRef } from "./types";
 
 const BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -27,16 +27,20 @@ export async function listDonors(params: {
   max_assets?: string | number;
   limit?: number;
   offset?: number;
-}): Promise<{ items: Donor[]; total: number }> {
+  cursor?: string | null; // next_cursor from the previous page
+  count?: "exact" | "estimate" | "none";
+}): Promise<DonorListResponse> {
   const usp = new URLSearchParams();
   if (params.state) usp.set("state", params.state);
   if (params.q) usp.set("q", params.q);
   if (params.min_assets) usp.set("min_assets", String(params.min_assets));
   if (params.max_assets) usp.set("max_assets", String(params.max_assets));
   usp.set("limit", String(params.limit ?? 25));
-  if (params.offset) usp.set("offset", String(params.offset));
+  if (params.cursor) usp.set("cursor", params.cursor);
+  else if (params.offset) usp.set("offset", String(params.offset));
+  if (params.count) usp.set("count", params.count);
 
-  return json<{ items: Donor[]; total: number }>(`${BASE}/donors?${usp.toString()}`);
+  return json<DonorListResponse>(`${BASE}/donors?${usp.toString()}`);
 }
 
 // Semantic search (LLM/pgvector)
@@ -60,11 +64,71 @@ export async function semanticSearch(params: {
   });
 }
 
+// Hybrid search: keyword + semantic fused server-side (reciprocal rank fusion)
+export async function hybridSearch(params: {
+  query: string;
+  state?: string;
+  min_assets?: number;
+  max_assets?: number;
+  limit?: number;
+}): Promise<{ items: Donor[]; count: number }> {
+  return json<{ items: Donor[]; count: number }>(`${BASE}/donors/search/hybrid`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      query: params.query,
+      state: params.state,
+      min_assets: params.min_assets,
+      max_assets: params.max_assets,
+      limit: params.limit ?? 10,
+    }),
+  });
+}
+
 // Donor detail (includes enrichments + contacts + grants)
 export async function fetchDonorDetail(id: number): Promise<DonorDetail> {
   return json<DonorDetail>(`${BASE}/donors/${id}`);
 }
 
+/* --------------------------
+ * Background jobs (enrich / crawl run on the worker)
+ * -------------------------- */
+
+// Queue Apollo enrichment for one donor
+export async function postEnrich(id: number): Promise<JobRef> {
+  return json<JobRef>(`${BASE}/donors/${id}/enrich`, { method: "POST" });
+}
+
+// Queue a Firecrawl crawl for one donor
+export async function postCrawl(id: number): Promise<JobRef> {
+  return json<JobRef>(`${BASE}/donors/${id}/crawl`, { method: "POST" });
+}
+
+export async function getJob(jobId: number): Promise<Job> {
+  return json<Job>(`${BASE}/jobs/${jobId}`);
+}
+
+// Poll a job until it finishes (1s, backing off to 5s); throws if it failed
+export async function waitForJob(
+  jobId: number,
+  onUpdate?: (job: Job) => void,
+  timeoutMs = 10 * 60 * 1000,
+): Promise<Job> {
+  const started = Date.now();
+  let delay = 1000;
+  for (;;) {
+    const job = await getJob(jobId);
+    onUpdate?.(job);
+    if (job.status === "succeeded") return job;
+    if (job.status === "failed" || job.status === "cancelled") {
+      throw new Error(`Job ${jobId} ${job.status}${job.error ? `: ${job.error}` : ""}`);
+    }
+    if (Date.now() - started > timeoutMs) throw new Error(`Job ${jobId} still ${job.status}`);
+    await new Promise((r) => setTimeout(r, delay));
+    delay = Math.min(delay * 1.5, 5000);
+  }
+}
+
 /* --------------------------
  * “Seed” convenience for local dev
  * -------------------------- */
@@ -75,11 +139,11 @@ export async function seedIfEmpty(): Promise<void> {
   const check = await listDonors({ state: "CA", limit: 1, offset: 0 }).catch(() => ({ total: 0 }));
   if ((check?.total ?? 0) > 0) return;
 
-  // 1) Ingest a small set from ProPublica
-  await json(`${BASE}/donors/ingest/propublica?state=CA&ntee_major=2&limit=35`, { method: "POST" });
+  // 1) Ingest a small set from ProPublica (inline, so step 2 sees the rows)
+  await json(`${BASE}/donors/ingest/propublica?state=CA&ntee_major=2&limit=35&background=false`, { method: "POST" });
 
   // 2) Build embeddings for semantic search
-  await json(`${BASE}/donors/embeddings/build?batch_size=32&max_rows=500`, { method: "POST" });
+  await json(`${BASE}/donors/embeddings/build?batch_size=32&max_rows=500&background=false`, { method: "POST" });
 
   // 3) Try to backfill missing websites via Apollo (best-effort)
   // ok if it fails silently — it’s just enrichment
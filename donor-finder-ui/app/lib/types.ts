@@ -13,7 +13,7 @@ export type Donor = {
   grants_total?: number | null;
   irs_subsection?: number | null;
   website?: string | null;
-  source?: any; // raw JSON from ProPublica seed
+  source?: any; // raw JSON from ProPublica seed (only with fields=/include=source)
   updated_at?: string;
   created_at?: string;
 };
@@ -28,6 +28,16 @@ export type Grant = {
   recipient_ein?: string | null;
 };
 
+// One 990 filing (latest 5 come with GET /donors/:id)
+export type Filing = {
+  tax_period: number;           // YYYYMM
+  tax_year?: number | null;
+  form_type?: number | null;    // 0 = 990, 1 = 990-EZ, 2 = 990-PF
+  total_assets?: number | null;
+  grants_paid?: number | null;
+  total_revenue?: number | null;
+};
+
 // Contact captured from Apollo/Firecrawl
 export type Contact = {
   id?: number;
@@ -54,6 +64,7 @@ export type Enrichment = {
 // Full detail payload from GET /donors/:id
 export type DonorDetail = {
   donor: Donor;
+  filings?: Filing[];
   grants: Grant[];
   contacts: Contact[];
   enrichments: Enrichment[];
@@ -62,7 +73,9 @@ export type DonorDetail = {
 // List response from GET /donors
 export type DonorListResponse = {
   items: Donor[];
-  total: number;
+  total: number | null;
+  total_is_estimate?: boolean;
+  next_cursor?: string | null; // pass back as `cursor` for the next page
 };
 
 // Semantic search response from POST /donors/search/semantic
@@ -70,3 +83,25 @@ export type SemanticSearchResponse = {
   items: (Donor & { distance?: number; doc?: string })[];
   count: number;
 };
+
+// Returned by endpoints that queue work (enrich, crawl, ingest, ...)
+export type JobRef = {
+  job_id: number;
+  kind: string;
+  deduplicated: boolean; // an identical job was already queued/running
+};
+
+// GET /jobs/:id
+export type Job = {
+  id: number;
+  kind: string;
+  status: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  attempts: number;
+  max_attempts: number;
+  progress?: { done?: number; total?: number } | null;
+  result?: any;
+  error?: string | null;
+  created_at?: string;
+  updated_at?: string;
+  finished_at?: string | null;
+};